@@ -8,52 +8,153 @@ Admin API to inspect an account deeply:
 - Risk history audit trail
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db import get_db
-from app.models import Account, Transaction, AccountLink, RiskAudit
+from app.models import Account, AccountStats, Transaction, AccountLink, RiskAudit
+from app.services.account_resolver import account_resolver
+from app.services.network_risk import network_scores
+from app.services.pagination import encode_cursor, keyset_page
+from app.services.response_cache import account_cache
 
 router = APIRouter()
 
 
+# ----------------------------
+# Helpers
+# ----------------------------
+def _transaction_page(db: Session, account_id: str, size: int, cursor: str = None):
+    """
+    Newest-first page of the account's transactions, both directions.
+
+    Each direction is its own keyset query on (account, timestamp), so the
+    cost is two index range scans of size + 1 rows whatever the history size.
+    """
+    sides = [
+        db.query(Transaction).filter(Transaction.from_account == account_id),
+        db.query(Transaction).filter(Transaction.to_account == account_id),
+    ]
+
+    rows = {}
+    more = False
+    for query in sides:
+        page, next_cursor = keyset_page(query, Transaction.timestamp, Transaction.id, size, cursor)
+        more = more or next_cursor is not None
+        # Self-transfers come back from both sides
+        rows.update((t.id, t) for t in page)
+
+    merged = sorted(rows.values(), key=lambda t: (t.timestamp, t.id), reverse=True)
+    page = merged[:size]
+    if (more or len(merged) > size) and page:
+        return page, encode_cursor(page[-1].timestamp, page[-1].id)
+    return page, None
+
+
+def _linked_accounts(db: Session, account_id: str, limit: int) -> list[str]:
+    """
+    Strongest linked accounts (either direction), at most `limit`.
+    """
+    if limit <= 0:
+        return []
+
+    outgoing = (
+        db.query(AccountLink.account_b, AccountLink.link_strength)
+        .filter(AccountLink.account_a == account_id)
+        .order_by(AccountLink.link_strength.desc())
+        .limit(limit)
+        .all()
+    )
+    incoming = (
+        db.query(AccountLink.account_a, AccountLink.link_strength)
+        .filter(AccountLink.account_b == account_id)
+        .order_by(AccountLink.link_strength.desc())
+        .limit(limit)
+        .all()
+    )
+
+    strength = {}
+    for other, value in outgoing + incoming:
+        if other != account_id:
+            strength[other] = strength.get(other, 0) + (value or 0)
+
+    return sorted(strength, key=strength.get, reverse=True)[:limit]
+
+
+def _stats_dict(stats) -> dict:
+    if stats is None:
+        return {
+            "tx_out_count": 0,
+            "tx_in_count": 0,
+            "volume_out": 0.0,
+            "volume_in": 0.0,
+            "distinct_receivers": 0,
+            "distinct_senders": 0,
+            "first_activity": None,
+            "last_activity": None,
+        }
+    return {
+        "tx_out_count": stats.tx_out_count,
+        "tx_in_count": stats.tx_in_count,
+        "volume_out": stats.volume_out,
+        "volume_in": stats.volume_in,
+        "distinct_receivers": stats.distinct_receivers,
+        "distinct_senders": stats.distinct_senders,
+        "first_activity": stats.first_activity,
+        "last_activity": stats.last_activity,
+    }
+
+
 # -----------------------------------------------------
 # GET /accounts/{account_id}
 # Full account inspection
 # -----------------------------------------------------
 @router.get("/accounts/{account_id}")
-def get_account_details(account_id: str, db: Session = Depends(get_db)):
+def get_account_details(
+    account_id: str,
+    size: int = Query(50, ge=1, le=500, description="Transactions per page"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    links_limit: int = Query(100, ge=0, le=1000, description="Max linked accounts returned"),
+    db: Session = Depends(get_db),
+):
+    """
+    Account, aggregate counters (account_stats), strongest linked accounts,
+    graph job results (network) and one page of transactions, newest first.
+
+    Responses are cached per account for ACCOUNT_CACHE_TTL_SEC and dropped
+    as soon as the account ingests a new transaction.
+    """
+    cache_key = (size, cursor, links_limit)
+    cached = account_cache.get(account_id, cache_key)
+    if cached is not None:
+        return cached
+
+    if account_resolver.is_missing(account_id):
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    token = account_cache.token()
 
     account = db.query(Account).filter(Account.id == account_id).first()
 
     if not account:
+        account_resolver.mark_missing(account_id)
         raise HTTPException(status_code=404, detail="Account not found")
 
-    # All transactions of this account
-    transactions = db.query(Transaction).filter(
-        (Transaction.from_account == account_id) |
-        (Transaction.to_account == account_id)
-    ).all()
-
-    # Linked accounts from graph
-    links = db.query(AccountLink).filter(
-        (AccountLink.account_a == account_id) |
-        (AccountLink.account_b == account_id)
-    ).all()
-
-    linked_accounts = set()
-    for l in links:
-        if l.account_a != account_id:
-            linked_accounts.add(l.account_a)
-        if l.account_b != account_id:
-            linked_accounts.add(l.account_b)
+    stats = _stats_dict(db.get(AccountStats, account_id))
 
-    return {
+    try:
+        transactions, next_cursor = _transaction_page(db, account_id, size, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    response = {
         "account_id": account.id,
         "name": account.name,
         "risk_score": account.risk_score,
-        "total_transactions": len(transactions),
-        "linked_accounts": list(linked_accounts),
+        "total_transactions": stats["tx_out_count"] + stats["tx_in_count"],
+        "stats": stats,
+        "linked_accounts": _linked_accounts(db, account_id, links_limit),
+        "network": network_scores.describe(account_id),
         "transactions": [
             {
                 "id": t.id,
@@ -64,8 +165,12 @@ def get_account_details(account_id: str, db: Session = Depends(get_db)):
             }
             for t in transactions
         ],
+        "next_cursor": next_cursor,
     }
 
+    account_cache.put(account_id, cache_key, response, token)
+    return response
+
 
 # -----------------------------------------------------
 # GET /accounts/{account_id}/risk-history
@@ -0,0 +1,104 @@
+"""
+admin.py
+
+Operational endpoints for running the service:
+- Database engine profile and connection pool status
+- Prometheus scrape endpoint (GET /metrics)
+- Rule registry: list rules, enable / disable them without a restart
+- Link graph memory of this process, graph job components
+"""
+
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.db import get_db, pool_status
+from app.models import GraphComponent
+from app.schemas import RuleResponse, RuleUpdate
+from app.services import metrics
+from app.services.graph_service import link_graph
+from app.services.rule_registry import rule_registry
+
+router = APIRouter(tags=["Admin"])
+
+
+# -----------------------------------------------------
+# GET /admin/db/pool
+# Connection pool occupancy and counters
+# -----------------------------------------------------
+@router.get("/admin/db/pool")
+def get_pool_status():
+    return pool_status()
+
+
+# -----------------------------------------------------
+# GET /admin/graph/memory
+# Size of this process' link graph (CSR arrays, interning,
+# delta buffer) and of its recent-transfer index
+# -----------------------------------------------------
+@router.get("/admin/graph/memory")
+def get_graph_memory():
+    return link_graph.memory_usage()
+
+
+# -----------------------------------------------------
+# GET /admin/graph/components
+# Largest strongly connected components of the last
+# graph job run (python -m app.services.graph_analytics)
+# -----------------------------------------------------
+@router.get("/admin/graph/components")
+def list_graph_components(
+    limit: int = Query(20, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    components = db.query(GraphComponent).order_by(GraphComponent.id.asc()).limit(limit).all()
+    return [
+        {
+            "id": c.id,
+            "size": c.size,
+            "internal_links": c.internal_links,
+            "internal_transfers": c.internal_transfers,
+            "volume_out": c.volume_out,
+            "flagged_accounts": c.flagged_accounts,
+            "max_network_risk": c.max_network_risk,
+            "computed_at": c.computed_at,
+        }
+        for c in components
+    ]
+
+
+# -----------------------------------------------------
+# GET /metrics
+# Prometheus text format: ingest stage timings, rule hits,
+# request latency / DB queries, queue depth and lag
+# -----------------------------------------------------
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# -----------------------------------------------------
+# GET /admin/rules
+# Registered rules with severity, cost, features and state
+# -----------------------------------------------------
+@router.get("/admin/rules", response_model=List[RuleResponse])
+def list_rules():
+    return rule_registry.describe()
+
+
+# -----------------------------------------------------
+# PUT /admin/rules/{name}
+# Enable / disable a rule in this process (names may contain "/")
+# -----------------------------------------------------
+@router.put("/admin/rules/{name:path}", response_model=RuleResponse)
+def update_rule(name: str, payload: RuleUpdate):
+    try:
+        rule_registry.set_enabled(name, payload.enabled)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown rule: {name}")
+
+    return next(r for r in rule_registry.describe() if r["name"] == rule_registry.get(name).name)
@@ -1,27 +1,71 @@
 # app/api/ai.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.models import Alert
-from app.services.ai_services import explain_alert
+from app.schemas import ExplanationBatchRequest, ExplanationBatchResponse
+from app.services.explanation_service import (
+    EXPLAIN_BATCH_LIMIT,
+    EXPLAIN_TIMEOUT_SEC,
+    IN_CLAUSE_CHUNK,
+    explain_cached,
+    explain_many,
+)
 
 router = APIRouter(tags=["AI Investigator"])
 
 @router.get("/ai/alert/{alert_id}")
-def get_ai_alert_explanation(alert_id: str, db: Session = Depends(get_db)):
+def get_ai_alert_explanation(
+    alert_id: str,
+    refresh: bool = Query(False, description="Ignore the cached explanation"),
+    db: Session = Depends(get_db),
+):
     """
     Fetch a human-readable AI explanation for a given alert.
+    Served from the explanation cache when the same alert content was explained before.
     """
     alert = db.query(Alert).filter(Alert.id == alert_id).first()
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
 
-    explanation = explain_alert({
-        "transaction_id": alert.transaction_id,
-        "rule_triggered": alert.rule_triggered,
-        "severity": alert.severity,
-        "reason": getattr(alert, "reason", "No reason provided"),
-    })
+    result = explain_cached(db, alert, refresh=refresh)
+    if result["status"] == "timeout":
+        raise HTTPException(status_code=504, detail=f"Explanation not ready within {EXPLAIN_TIMEOUT_SEC}s")
+    if result["status"] == "error":
+        raise HTTPException(status_code=502, detail="Explanation backend failed")
 
-    return {"alert_id": alert.id, "explanation": explanation}
\ No newline at end of file
+    return {"alert_id": alert.id, "explanation": result["explanation"], "cached": result["status"] == "cached"}
+
+
+@router.post("/ai/alerts/explain", response_model=ExplanationBatchResponse)
+def explain_alerts_batch(
+    payload: ExplanationBatchRequest,
+    refresh: bool = Query(False, description="Ignore cached explanations"),
+    db: Session = Depends(get_db),
+):
+    """
+    Explains many alerts at once (triage queues). Cached explanations are
+    returned directly, the rest run concurrently on a bounded worker pool
+    with a per-call timeout. Results are in request order; one failure or
+    timeout does not fail the batch.
+    """
+    if len(payload.alert_ids) > EXPLAIN_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payload.alert_ids)} alerts (max {EXPLAIN_BATCH_LIMIT})",
+        )
+
+    ids = list(dict.fromkeys(payload.alert_ids))
+    alerts = {}
+    for i in range(0, len(ids), IN_CLAUSE_CHUNK):
+        alerts.update((a.id, a) for a in db.query(Alert).filter(Alert.id.in_(ids[i:i + IN_CLAUSE_CHUNK])))
+
+    found = [alert_id for alert_id in ids if alert_id in alerts]
+    explained = dict(zip(found, explain_many(db, [alerts[a] for a in found], refresh=refresh)))
+
+    results = [
+        {"alert_id": alert_id, **explained.get(alert_id, {"status": "not_found", "explanation": None})}
+        for alert_id in payload.alert_ids
+    ]
+    return {"count": len(results), "results": results}
@@ -4,21 +4,50 @@ alerts.py
 Admin API for alerts management.
 - View alerts
 - Filter by account, severity, time
-- Pagination support
+- Pagination support (offset or keyset cursor)
+- Streaming NDJSON / CSV export
+- Aggregated counts from the daily rollup (/alerts/stats)
 """
 
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import select
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 from app.db import get_db
-from app.models import Alert, Transaction, Account
+from app.models import Alert
+from app.services.pagination import keyset_page
+from app.services.alert_summary import alert_stats
+from app.services.export_service import stream_export, MEDIA_TYPES
 
 router = APIRouter()
 
 
+# -----------------------------------------------------
+# Shared filters for listing / export
+# -----------------------------------------------------
+def _filter_alerts(query, account_id=None, severity=None, start_time=None, end_time=None):
+    # Filter by account_id if provided (sender or receiver, denormalized on the alert)
+    if account_id:
+        query = query.filter(
+            (Alert.account_id == account_id) |
+            (Alert.counterparty_id == account_id)
+        )
+
+    # Filter by severity
+    if severity:
+        query = query.filter(Alert.severity == severity.upper())
+
+    # Filter by time range
+    if start_time:
+        query = query.filter(Alert.created_at >= start_time)
+    if end_time:
+        query = query.filter(Alert.created_at <= end_time)
+
+    return query
+
+
 # -----------------------------------------------------
 # GET /alerts  → View all alerts with filters & pagination
 # -----------------------------------------------------
@@ -29,51 +58,86 @@ def list_alerts(
     severity: Optional[str] = Query(None, description="Filter by severity: LOW/MEDIUM/HIGH"),
     start_time: Optional[datetime] = Query(None, description="Start time filter (ISO format)"),
     end_time: Optional[datetime] = Query(None, description="End time filter (ISO format)"),
-    skip: int = 0,
-    limit: int = 50,
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page (keyset pagination)"
+    ),
+    skip: int = Query(0, ge=0, description="Rows to skip (OFFSET pagination)"),
+    limit: int = Query(50, ge=1, le=500, description="Alerts per page"),
 ):
-    query = db.query(Alert)
+    query = _filter_alerts(db.query(Alert), account_id, severity, start_time, end_time)
 
-    # Filter by account_id if provided
-    if account_id:
-        txn_ids = (
-            select(Transaction.id)
-            .where(
-                (Transaction.from_account == account_id) |
-                (Transaction.to_account == account_id)
-            )
+    # Pagination: keyset on (created_at, id); OFFSET only when skip is used
+    if skip and not cursor:
+        alerts = (
+            query.order_by(Alert.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
         )
-        query = query.filter(Alert.transaction_id.in_(txn_ids))
+        next_cursor = None
+    else:
+        try:
+            alerts, next_cursor = keyset_page(query, Alert.created_at, Alert.id, limit, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    # Filter by severity
-    if severity:
-        query = query.filter(Alert.severity == severity.upper())
+    # Same envelope as GET /transactions and GET /accounts/{id}
+    return {
+        "next_cursor": next_cursor,
+        "data": [
+            {
+                "id": a.id,
+                "transaction_id": a.transaction_id,
+                "rule_triggered": a.rule_triggered,
+                "severity": a.severity,
+                "reason": getattr(a, "reason", ""),
+                "created_at": a.created_at,
+            }
+            for a in alerts
+        ],
+    }
 
-    # Filter by time range
-    if start_time:
-        query = query.filter(Alert.created_at >= start_time)
-    if end_time:
-        query = query.filter(Alert.created_at <= end_time)
 
-    # Pagination
-    alerts = (
-        query.order_by(Alert.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+# -----------------------------------------------------
+# GET /alerts/export  → Streaming NDJSON / CSV export
+# -----------------------------------------------------
+@router.get("/alerts/export")
+def export_alerts(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    account_id: Optional[str] = Query(None, description="Filter by account ID"),
+    severity: Optional[str] = Query(None, description="Filter by severity: LOW/MEDIUM/HIGH"),
+    start_time: Optional[datetime] = Query(None, description="Start time filter (ISO format)"),
+    end_time: Optional[datetime] = Query(None, description="End time filter (ISO format)"),
+):
+    body = stream_export(
+        lambda db: _filter_alerts(db.query(Alert), account_id, severity, start_time, end_time),
+        Alert.created_at,
+        Alert.id,
+        ["id", "transaction_id", "rule_triggered", "severity", "reason", "created_at"],
+        format,
+    )
+
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="alerts.{format}"'},
     )
 
-    return [
-        {
-            "id": a.id,
-            "transaction_id": a.transaction_id,
-            "rule_triggered": a.rule_triggered,
-            "severity": a.severity,
-            "reason": getattr(a, "reason", ""),
-            "created_at": a.created_at,
-        }
-        for a in alerts
-    ]
+
+# -----------------------------------------------------
+# GET /alerts/stats  → Counts by severity / rule / day (rollup, no alerts scan)
+# -----------------------------------------------------
+@router.get("/alerts/stats")
+def get_alert_stats(
+    db: Session = Depends(get_db),
+    account_id: Optional[str] = Query(None, description="Account charged with the alerts (sender)"),
+    start_date: Optional[date] = Query(None, description="First UTC day (default: 30 days before end_date)"),
+    end_date: Optional[date] = Query(None, description="Last UTC day (default: today)"),
+):
+    try:
+        return alert_stats(db, account_id, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # -----------------------------------------------------
@@ -7,29 +7,50 @@ Real Transaction Ingestion API with:
 - Graph update
 - Alert generation
 - Risk audit trail
-- Admin transaction view with pagination & filters
+- Single ingestion as one unit of work, optionally group-committed
+- Batch ingestion (one unit of work per batch)
+- Async ingestion through a bounded in-process pipeline
+- Admin transaction view with cursor pagination & filters
+- Streaming NDJSON / CSV export
 """
 
-from fastapi import APIRouter, Depends, Query
+import uuid
+
+from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from app.schemas import TransactionCreate, TransactionResponse
-from app.db import get_db
-from app.models import (
-    Transaction,
-    Account,
-    AccountLink,
-    Alert,
-    RiskAudit,
+from app.schemas import (
+    TransactionCreate,
+    TransactionResponse,
+    TransactionBatchCreate,
+    TransactionBatchResponse,
+    AsyncIngestResponse,
+    AsyncIngestStatus,
 )
-
-from app.services.rule_engine import evaluate_rules
-from app.services.graph_service import check_money_loop
-from app.services.alert_service import (
-    generate_alerts,
-    risk_increase_from_severity,
+from app.db import get_db, write_lock
+from app.models import Transaction
+from app.models.transaction import STATUS_PROCESSED
+
+from app.services.account_resolver import account_resolver
+from app.services.ingest_service import (
+    ingest_batch,
+    score_transactions,
+    persist_scored,
+    transaction_record,
+    MemoryJournal,
+    discard_memory_state,
+    invalidate_account_views,
+    MAX_BATCH_SIZE,
 )
+from app.services.network_risk import network_scores
+from app.services.group_commit import GROUP_COMMIT_ENABLED, group_committer
+from app.services.ingest_pipeline import ingest_pipeline, PipelineFull
+from app.services.pagination import exact_count, approximate_count
+from app.services.cold_storage import cold_count, cold_overlaps, tiered_page
+from app.services.export_service import stream_export, MEDIA_TYPES
+from app.services.metrics import stage_timer
 
 router = APIRouter()
 
@@ -42,118 +63,210 @@ def ingest_transaction(payload: TransactionCreate, db: Session = Depends(get_db)
     """
     Main entry point where transactions enter the AML system.
     This function simulates how banks process live transactions.
-    """
-
-    # STEP 1 — Ensure both accounts exist
-    for acc_id in [payload.from_account, payload.to_account]:
-        acc_id_str = str(acc_id)
-
-        account = db.query(Account).filter(Account.id == acc_id_str).first()
-        if not account:
-            account = Account(id=acc_id_str, name=f"User-{acc_id_str[:4]}")
-            db.add(account)
 
-    db.commit()
+    All steps form one unit of work, committed once at the end: a failure
+    at any step leaves neither the transaction nor its links / alerts.
+    With GROUP_COMMIT enabled the pipeline runs on the group committer
+    instead and this request waits for the shared commit.
+    """
+    if GROUP_COMMIT_ENABLED:
+        try:
+            result = group_committer.submit(payload)
+        except TimeoutError:
+            # Withdrawn before any commit picked it up: nothing was stored
+            raise HTTPException(status_code=503, detail="Commit did not start in time, retry later")
+        return TransactionResponse(**{k: v for k, v in result.items() if k != "alerts"})
 
-    # STEP 2 — Save the transaction
     transaction = Transaction(
+        id=str(uuid.uuid4()),
         from_account=str(payload.from_account),
         to_account=str(payload.to_account),
         amount=payload.amount,
         timestamp=datetime.utcnow(),
+        status=STATUS_PROCESSED,
     )
 
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
-
-    # STEP 3 — Update account relationship graph (adjacency list)
-    link = db.query(AccountLink).filter(
-        AccountLink.account_a == str(payload.from_account),
-        AccountLink.account_b == str(payload.to_account),
-    ).first()
-
-    if link:
-        link.link_strength += 1
-    else:
-        link = AccountLink(
-            account_a=str(payload.from_account),
-            account_b=str(payload.to_account),
+    journal = MemoryJournal()
+    try:
+        # STEP 1 — Rules, money loops and layering over in-memory state
+        # (sender features + link graph). Only reads, so no write lock is
+        # held while they run.
+        scored = score_transactions(
+            db, [transaction_record(transaction)], journal=journal, network=network_scores
         )
-        db.add(link)
 
-    db.commit()
+        # Writers of this process take turns from the first write to the commit
+        with write_lock(db):
+            try:
+                # STEP 2 — Ensure both accounts exist
+                # (no query for cached accounts, else one INSERT ... ON CONFLICT DO NOTHING)
+                with stage_timer("accounts"):
+                    account_resolver.ensure(db, [transaction.from_account, transaction.to_account])
+
+                # STEP 3 — Save the transaction (INSERT timed on its own), then
+                # graph link, account counters, alerts and risk (persist_scored)
+                with stage_timer("insert"):
+                    db.add(transaction)
+                    db.flush()
+                persist_scored(db, [transaction], scored, path="single")
+
+                # Built before the commit, which expires the row
+                response = TransactionResponse(
+                    id=transaction.id,
+                    from_account=transaction.from_account,
+                    to_account=transaction.to_account,
+                    amount=transaction.amount,
+                    timestamp=transaction.timestamp,
+                    status=transaction.status,
+                )
+
+                # STEP 4 — One commit for the whole unit of work
+                with stage_timer("commit"):
+                    db.commit()
+            except Exception:
+                # Roll back before another writer gets the lock
+                db.rollback()
+                raise
+    except Exception:
+        db.rollback()
+        discard_memory_state(journal)
+        raise
+
+    invalidate_account_views([transaction])
+
+    return response
 
-    # STEP 4 — Collect past transactions for rule engine
-    past_txns = db.query(Transaction).filter(
-        Transaction.from_account == str(payload.from_account)
-    ).all()
 
-    txn_times = [t.timestamp for t in past_txns]
-    triggered_rules = evaluate_rules(payload.amount, txn_times)
+# -----------------------------------------------------
+# POST /transactions/batch  → Ingest many transactions at once
+# -----------------------------------------------------
+@router.post("/transactions/batch", response_model=TransactionBatchResponse)
+def ingest_transaction_batch(payload: TransactionBatchCreate, db: Session = Depends(get_db)):
+    """
+    Bulk entry point for upstream feeds that deliver transactions in bursts.
+    All items are stored and evaluated in a single DB transaction and
+    results are returned in request order.
+    """
+    if len(payload.transactions) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {MAX_BATCH_SIZE} transactions)",
+        )
 
-    # STEP 5 — Graph analysis for money loops
-    links = db.query(AccountLink).all()
-    link_pairs = [(l.account_a, l.account_b) for l in links]
+    results = ingest_batch(db, payload.transactions)
 
-    if check_money_loop(link_pairs):
-        triggered_rules.append("Money Loop Detected")
+    return {"count": len(results), "results": results}
 
-    # STEP 6 — Generate alerts + update risk score + store audit trail
-    alerts = generate_alerts(transaction.id, triggered_rules)
 
-    for a in alerts:
-        alert = Alert(
-            transaction_id=a["transaction_id"],
-            rule_triggered=a["rule_triggered"],
-            severity=a["severity"],
-            reason=a["reason"],
+# -----------------------------------------------------
+# POST /transactions/async  → Accept now, process in background
+# -----------------------------------------------------
+@router.post("/transactions/async", response_model=AsyncIngestResponse, status_code=202)
+async def ingest_transaction_async(payload: TransactionCreate):
+    """
+    Validates and enqueues the transaction without touching the DB, so
+    HTTP latency does not depend on rule evaluation cost.
+    Returns 429 when the pipeline queue is full.
+    """
+    try:
+        tracking_id = ingest_pipeline.submit(payload)
+    except PipelineFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Ingest pipeline is full, retry later",
+            headers={"Retry-After": "1"},
         )
-        db.add(alert)
 
-        # ---- Risk score update with audit history ----
-        account = db.query(Account).filter(
-            Account.id == str(payload.from_account)
-        ).first()
+    return {"tracking_id": tracking_id, "status": "queued"}
 
-        old_score = account.risk_score
-        increase = risk_increase_from_severity(a["severity"])
-        new_score = old_score + increase
 
-        account.risk_score = new_score
+# -----------------------------------------------------
+# GET /transactions/async/{tracking_id}  → Poll async ingest status
+# -----------------------------------------------------
+@router.get("/transactions/async/{tracking_id}", response_model=AsyncIngestStatus)
+async def get_async_ingest_status(tracking_id: str):
+    status = ingest_pipeline.status(tracking_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown tracking id")
+
+    return {"tracking_id": tracking_id, **status}
+
 
-        audit = RiskAudit(
-            account_id=account.id,
-            old_score=old_score,
-            new_score=new_score,
-            reason=a["reason"],
+# -----------------------------------------------------
+# Shared filters for listing / export
+# -----------------------------------------------------
+def _filter_transactions(query, account_id=None, start_time=None, end_time=None):
+    # -----------------------------
+    # Account filter
+    # -----------------------------
+    if account_id:
+        query = query.filter(
+            (Transaction.from_account == account_id) |
+            (Transaction.to_account == account_id)
         )
 
-        db.add(audit)
+    # -----------------------------
+    # Time filters
+    # -----------------------------
+    if start_time:
+        query = query.filter(Transaction.timestamp >= start_time)
 
-    db.commit()
+    if end_time:
+        query = query.filter(Transaction.timestamp <= end_time)
+
+    return query
+
+
+# -----------------------------------------------------
+# GET /transactions/export  → Streaming NDJSON / CSV export
+# -----------------------------------------------------
+@router.get("/transactions/export")
+def export_transactions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    account_id: str | None = Query(None, description="Sender or receiver account"),
+    start_time: datetime | None = Query(None, description="Transactions after this time (ISO format)"),
+    end_time: datetime | None = Query(None, description="Transactions before this time (ISO format)"),
+):
+    """
+    Streams every matching transaction, oldest first, in chunks.
+    """
+    body = stream_export(
+        lambda db: _filter_transactions(db.query(Transaction), account_id, start_time, end_time),
+        Transaction.timestamp,
+        Transaction.id,
+        ["id", "from_account", "to_account", "amount", "timestamp", "status"],
+        format,
+    )
 
-    # STEP 7 — Return transaction response
-    return TransactionResponse(
-        id=transaction.id,
-        from_account=transaction.from_account,
-        to_account=transaction.to_account,
-        amount=transaction.amount,
-        timestamp=transaction.timestamp,
-        status=transaction.status,
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
     )
 
 
 # -----------------------------------------------------
-# GET /transactions  → Admin view with pagination, filters, time range, sorting
+# GET /transactions  → Admin view with cursor pagination, filters, time range, sorting
 # -----------------------------------------------------
 @router.get("/transactions")
 def list_transactions(
     db: Session = Depends(get_db),
 
     # Pagination
-    page: int = Query(1, ge=1, description="Page number"),
+    cursor: str | None = Query(
+        None,
+        description="next_cursor from the previous page (keyset pagination)",
+    ),
+    page: int = Query(
+        1, ge=1,
+        description="Page number (OFFSET based, slow on deep pages, hot tier only; prefer cursor)",
+    ),
     size: int = Query(10, ge=1, le=100, description="Records per page"),
+    total: str = Query(
+        "none",
+        pattern="^(none|exact|approx)$",
+        description="Total count: none (fastest), exact (full count) or approx",
+    ),
 
     # Filters
     account_id: str | None = Query(
@@ -177,49 +290,53 @@ def list_transactions(
         description="Sort by time: asc (oldest) or desc (newest)",
     ),
 ):
-    query = db.query(Transaction)
+    query = _filter_transactions(db.query(Transaction), account_id, start_time, end_time)
+    descending = sort != "asc"
 
     # -----------------------------
-    # Account filter
+    # Totals (optional)
     # -----------------------------
-    if account_id:
-        query = query.filter(
-            (Transaction.from_account == account_id) |
-            (Transaction.to_account == account_id)
+    count = None
+    estimated = False
+    if total == "exact":
+        if account_id and cold_overlaps(db, start_time, end_time):
+            # Would decompress every archived month of the range on each request
+            raise HTTPException(
+                status_code=400,
+                detail="total=exact with account_id is not supported over archived months; "
+                       "use total=approx or a start_time after the archived history",
+            )
+        count = exact_count(query) + cold_count(db, start_time, end_time)
+    elif total == "approx":
+        approx = approximate_count(
+            db, query, Transaction.__table__,
+            filtered=bool(account_id or start_time or end_time),
         )
-
-    # -----------------------------
-    # Time filters
-    # -----------------------------
-    if start_time:
-        query = query.filter(Transaction.timestamp >= start_time)
-
-    if end_time:
-        query = query.filter(Transaction.timestamp <= end_time)
-
-    # -----------------------------
-    # Sorting
-    # -----------------------------
-    if sort == "asc":
-        query = query.order_by(Transaction.timestamp.asc())
-    else:
-        query = query.order_by(Transaction.timestamp.desc())
-
-    total = query.count()
+        count, estimated = approx["total"], approx["estimated"]
 
     # -----------------------------
     # Pagination
     # -----------------------------
-    transactions = (
-        query
-        .offset((page - 1) * size)
-        .limit(size)
-        .all()
-    )
+    if cursor or page == 1:
+        # Keyset pages continue into archived months (see cold_storage)
+        try:
+            transactions, next_cursor = tiered_page(
+                db, query, size, cursor, descending,
+                account_id=account_id, start_time=start_time, end_time=end_time,
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        # Legacy OFFSET paging, kept for existing clients
+        order = Transaction.timestamp.desc() if descending else Transaction.timestamp.asc()
+        transactions = query.order_by(order).offset((page - 1) * size).limit(size).all()
+        next_cursor = None
 
     return {
-        "total": total,
+        "total": count,
+        "total_estimated": estimated,
         "page": page,
         "size": size,
+        "next_cursor": next_cursor,
         "data": transactions,
-    }
\ No newline at end of file
+    }
@@ -1,17 +1,204 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
+"""
+db.py
+
+Engine, session factory and declarative base.
+
+The engine is built from a backend profile picked from DATABASE_URL
+(or DB_PROFILE):
+- sqlite     : WAL journal, busy timeout, pragma tuning, thread-safe
+               connection pool for the multi-threaded FastAPI server;
+               write_lock() queues the writers of this process
+- postgresql : sized QueuePool with pre-ping / recycle and a server-side
+               statement timeout
+Every setting can be overridden through the environment (see CONFIG).
+"""
+
 import os
+import threading
+from contextlib import nullcontext
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, StaticPool
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Special config needed for SQLite
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# -----------------------------
+# CONFIG
+# -----------------------------
+DB_PROFILE = os.getenv("DB_PROFILE")                                    # sqlite | postgresql | default (from URL when unset)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))                     # persistent connections
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))               # extra connections under burst
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))             # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))             # seconds before a connection is replaced
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # PostgreSQL statement_timeout
+DB_ECHO = os.getenv("DB_ECHO", "").lower() in ("1", "true", "yes")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # wait on a locked DB instead of failing
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")              # readers do not block the writer
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "FULL")               # fsync per commit (NORMAL: opt-in, can lose acked commits)
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))     # page cache per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+# -----------------------------
+# Pool metrics
+# -----------------------------
+class PoolMetrics:
+    """
+    Counters fed by pool events; read with pool_status().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+            }
+
+
+def _track_pool(engine, metrics: PoolMetrics) -> None:
+    event.listen(engine, "connect", lambda *a: metrics.incr("connects"))
+    event.listen(engine, "checkout", lambda *a: metrics.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *a: metrics.incr("checkins"))
+    event.listen(engine, "invalidate", lambda *a: metrics.incr("invalidations"))
+
+
+# -----------------------------
+# Profiles
+# -----------------------------
+def _sqlite_profile(url) -> dict:
+    in_memory = url.database in (None, "", ":memory:")
+    kwargs = {
+        "connect_args": {
+            # Sessions are handed between threads by FastAPI / workers
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
+    }
+    if in_memory:
+        # One shared connection, otherwise every connection sees its own empty DB
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            poolclass=QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return kwargs
+
+
+def _sqlite_pragmas(engine, in_memory: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not in_memory:
+                cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+                cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+
+def _postgresql_profile(url) -> dict:
+    return {
+        "poolclass": QueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        # Drop connections killed by failovers / idle timeouts before use
+        "pool_pre_ping": True,
+        "connect_args": {
+            "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+            "application_name": os.getenv("DB_APPLICATION_NAME", "aml_system"),
+        },
+    }
+
+
+def make_engine(database_url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """
+    Builds an engine with the settings of its backend profile.
+
+    Args:
+        database_url (str): SQLAlchemy URL
+        profile (str): "sqlite", "postgresql" or "default" (plain
+            create_engine); derived from the URL when None
+
+    Returns:
+        Engine: with a `pool_metrics` attribute (PoolMetrics)
+    """
+    url = make_url(database_url)
+    profile = profile or url.get_backend_name()
+
+    if profile == "sqlite":
+        kwargs = _sqlite_profile(url)
+    elif profile == "postgresql":
+        kwargs = _postgresql_profile(url)
+    else:
+        kwargs = {}
+
+    engine = create_engine(url, echo=DB_ECHO, **kwargs)
+
+    if profile == "sqlite":
+        _sqlite_pragmas(engine, in_memory=kwargs.get("poolclass") is StaticPool)
+
+    engine.pool_metrics = PoolMetrics()
+    engine.profile = profile
+    _track_pool(engine, engine.pool_metrics)
+    return engine
+
+
+def pool_status(bind=None) -> dict:
+    """
+    Pool occupancy and event counters of `bind` (default: the app engine),
+    for the admin endpoint.
+    """
+    bind = bind or engine
+    pool = bind.pool
+    status = {
+        "profile": getattr(bind, "profile", None),
+        "dialect": bind.dialect.name,
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    metrics = getattr(bind, "pool_metrics", None)
+    if metrics is not None:
+        status.update(metrics.as_dict())
+    return status
+
+
+engine = make_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -22,10 +209,26 @@ SessionLocal = sessionmaker(
 Base = declarative_base()
 
 
+# SQLite has a single writer. Threads of this process wait for it here
+# (blocking, in arrival order) rather than in busy_timeout polling, which
+# can starve a waiter past the timeout when many threads share the GIL.
+_sqlite_write_lock = threading.Lock()
+
+
+def write_lock(db):
+    """
+    Context manager to hold from a unit of work's first write to its
+    commit / rollback. Serialises writers on SQLite, no-op elsewhere.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return _sqlite_write_lock
+    return nullcontext()
+
+
 # Dependency to get DB session in APIs
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,116 @@
+"""
+migrations.py
+
+Idempotent schema upgrades for existing databases.
+
+Base.metadata.create_all only creates missing tables, so databases created
+before a model gained an index (e.g. an old aml.db) never get it. upgrade()
+brings such a database in line with the models:
+- creates missing tables
+- adds nullable columns declared on the models but missing from their table
+- merges duplicate account_links rows so the pair can be unique
+- creates every index declared on the models that does not exist yet
+- fills account_stats from existing transactions when it is empty
+- copies sender / receiver onto alerts stored before Alert.account_id
+  and fills alert_daily_summary from existing alerts when it is empty
+
+Safe to run repeatedly:
+    python migrate.py
+"""
+
+from sqlalchemy import text
+
+from app.db import Base, engine as default_engine
+import app.models  # noqa: F401  (register all models on Base.metadata)
+from app.services.account_stats import backfill_account_stats
+from app.services.alert_summary import backfill_alert_accounts, backfill_alert_summary
+
+
+def dedupe_account_links(conn) -> int:
+    """
+    Collapses duplicate (account_a, account_b) rows into one, summing
+    link_strength. Returns the number of pairs merged.
+    """
+    dupes = conn.execute(text(
+        "SELECT account_a, account_b, MIN(id), SUM(COALESCE(link_strength, 1)) "
+        "FROM account_links GROUP BY account_a, account_b HAVING COUNT(*) > 1"
+    )).all()
+
+    for account_a, account_b, keep_id, strength in dupes:
+        conn.execute(
+            text("UPDATE account_links SET link_strength = :s WHERE id = :id"),
+            {"s": strength, "id": keep_id},
+        )
+        conn.execute(
+            text(
+                "DELETE FROM account_links "
+                "WHERE account_a = :a AND account_b = :b AND id != :id"
+            ),
+            {"a": account_a, "b": account_b, "id": keep_id},
+        )
+
+    return len(dupes)
+
+
+def add_missing_columns(conn) -> list[str]:
+    """
+    Adds nullable model columns missing from existing tables.
+    Returns them as "table.column".
+    """
+    from sqlalchemy import inspect
+
+    inspector = inspect(conn)
+    added = []
+
+    for table in Base.metadata.sorted_tables:
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+            added.append(f"{table.name}.{column.name}")
+
+    return added
+
+
+def create_missing_indexes(conn) -> list[str]:
+    """
+    Creates model indexes missing from the database. Returns their names.
+    """
+    from sqlalchemy import inspect
+
+    inspector = inspect(conn)
+    created = []
+
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                created.append(index.name)
+
+    return created
+
+
+def upgrade(engine=default_engine) -> dict:
+    """
+    Applies all pending upgrades in one transaction and reports what changed.
+    """
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        columns = add_missing_columns(conn)
+        merged = dedupe_account_links(conn)
+        indexes = create_missing_indexes(conn)
+        stats = backfill_account_stats(conn)
+        alert_accounts = backfill_alert_accounts(conn)
+        alert_summary = backfill_alert_summary(conn)
+
+    return {
+        "added_columns": columns,
+        "merged_link_pairs": merged,
+        "created_indexes": indexes,
+        "backfilled_account_stats": stats,
+        "backfilled_alert_accounts": alert_accounts,
+        "backfilled_alert_summary": alert_summary,
+    }
@@ -3,4 +3,9 @@ from .transaction import Transaction
 from .alert import Alert
 from .account_link import AccountLink
 from .risk_audit import RiskAudit
-from .txn_queue import TransactionQueue   
\ No newline at end of file
+from .txn_queue import TransactionQueue
+from .account_stats import AccountStats
+from .alert_explanation import AlertExplanation
+from .alert_summary import AlertDailySummary
+from .transaction_archive import TransactionArchive, ArchivedPairTotals
+from .graph_analytics import GraphComponent, AccountGraphScore
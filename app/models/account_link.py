@@ -7,12 +7,18 @@ Works with SQLite now and PostgreSQL later.
 """
 
 import uuid
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index
 from app.db import Base
 
 
 class AccountLink(Base):
     __tablename__ = "account_links"
+    __table_args__ = (
+        # One row per directed pair, so link updates can be a single upsert.
+        # A unique index (not a table constraint) so existing SQLite DBs can add it.
+        Index("uq_account_links_pair", "account_a", "account_b", unique=True),
+        Index("ix_account_links_account_b", "account_b"),
+    )
 
     # Use String for IDs so it works across SQLite and Postgres
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
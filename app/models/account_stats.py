@@ -0,0 +1,34 @@
+"""
+AccountStats model
+Per-account aggregates maintained at ingest time.
+
+Lets the account views answer counts / volumes / counterparties from one
+row instead of scanning the account's full transaction history.
+A self-transfer counts once, on the outgoing side only, so
+tx_out_count + tx_in_count is the account's number of transactions.
+"""
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from app.db import Base
+
+
+class AccountStats(Base):
+    __tablename__ = "account_stats"
+
+    account_id = Column(String, ForeignKey("accounts.id"), primary_key=True)
+
+    # Processed transactions sent / received
+    tx_out_count = Column(Integer, nullable=False, default=0)
+    tx_in_count = Column(Integer, nullable=False, default=0)
+
+    # Total amount sent / received
+    volume_out = Column(Float, nullable=False, default=0)
+    volume_in = Column(Float, nullable=False, default=0)
+
+    # Distinct accounts sent to / received from (directed account_links)
+    distinct_receivers = Column(Integer, nullable=False, default=0)
+    distinct_senders = Column(Integer, nullable=False, default=0)
+
+    # Earliest / latest transaction timestamp
+    first_activity = Column(DateTime)
+    last_activity = Column(DateTime)
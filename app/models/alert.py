@@ -4,20 +4,30 @@ Stores alerts triggered by rule engine or graph analysis.
 """
 
 import uuid
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index
 from datetime import datetime
 from app.db import Base
 
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        # Per-account alert lists, newest first
+        Index("ix_alerts_account_id_created_at", "account_id", "created_at"),
+        Index("ix_alerts_counterparty_id_created_at", "counterparty_id", "created_at"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    transaction_id = Column(String, nullable=False)
+    transaction_id = Column(String, nullable=False, index=True)
+
+    # Denormalized from the transaction: sender (charged with the risk) and receiver
+    account_id = Column(String)
+    counterparty_id = Column(String)
+
     rule_triggered = Column(String)
     severity = Column(String)
 
     # NEW: human-readable reason for analysts
     reason = Column(String)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
\ No newline at end of file
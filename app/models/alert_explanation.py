@@ -0,0 +1,24 @@
+"""
+AlertExplanation model
+Cache of AI Investigator explanations.
+
+Keyed by a hash of the alert content (rule, severity, reason, transaction)
+and the backend name, so re-opened or re-raised identical alerts reuse the
+stored explanation instead of calling the backend again.
+"""
+
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime
+from app.db import Base
+
+
+class AlertExplanation(Base):
+    __tablename__ = "alert_explanations"
+
+    # sha256 hex of backend name + alert content
+    content_hash = Column(String(64), primary_key=True)
+
+    backend = Column(String, nullable=False)
+    explanation = Column(Text, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,30 @@
+"""
+AlertDailySummary model
+Alert counts per account / day / rule / severity, maintained at alert-insert time.
+
+Rows with account_id = ALL_ACCOUNTS hold the totals over every account,
+so dashboard totals read a handful of rows instead of scanning alerts.
+Days are UTC dates of Alert.created_at.
+"""
+
+from sqlalchemy import Column, Date, Index, Integer, String
+from app.db import Base
+
+# account_id of the rows summing every account
+ALL_ACCOUNTS = "*"
+
+
+class AlertDailySummary(Base):
+    __tablename__ = "alert_daily_summary"
+    __table_args__ = (
+        # Dashboard totals by day across accounts
+        Index("ix_alert_daily_summary_day", "day"),
+    )
+
+    # Account charged with the alerts (Alert.account_id), or ALL_ACCOUNTS
+    account_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    rule_triggered = Column(String, primary_key=True)
+    severity = Column(String, primary_key=True)
+
+    alert_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,51 @@
+"""
+Results of the offline graph job (see services/graph_analytics.py).
+
+GraphComponent holds the strongly connected components of the account
+link graph with more than one account. AccountGraphScore has one row per
+account that is in such a component or received network risk from
+flagged accounts; accounts without a row are singletons with no
+exposure. Each run replaces both tables in one transaction.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, String
+from app.db import Base
+
+
+class GraphComponent(Base):
+    __tablename__ = "graph_components"
+
+    # Numbered by size, largest first; only stable within one run
+    id = Column(Integer, primary_key=True, autoincrement=False)
+
+    size = Column(Integer, nullable=False)
+
+    # Links inside the component and the transfers they carry (link_strength)
+    internal_links = Column(Integer, nullable=False, default=0)
+    internal_transfers = Column(Integer, nullable=False, default=0)
+
+    # Total amount sent by member accounts (account_stats.volume_out)
+    volume_out = Column(Float, nullable=False, default=0)
+
+    # Members that were risk seeds, and the highest network risk inside
+    flagged_accounts = Column(Integer, nullable=False, default=0)
+    max_network_risk = Column(Float, nullable=False, default=0)
+
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AccountGraphScore(Base):
+    __tablename__ = "account_graph_scores"
+
+    account_id = Column(String, primary_key=True)
+
+    # GraphComponent.id, NULL when the account is its own component
+    component_id = Column(Integer)
+    component_size = Column(Integer, nullable=False, default=1)
+
+    # Risk propagated from flagged accounts along money flow, 0..1
+    network_risk = Column(Float, nullable=False, default=0)
+
+    computed_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -5,13 +5,16 @@ Stores history of risk score changes for an account.
 """
 
 import uuid
-from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy import Column, String, Float, DateTime, Index
 from datetime import datetime
 from app.db import Base
 
 
 class RiskAudit(Base):
     __tablename__ = "risk_audits"
+    __table_args__ = (
+        Index("ix_risk_audits_account_id_timestamp", "account_id", "timestamp"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     account_id = Column(String, nullable=False)
@@ -6,13 +6,26 @@ DB-agnostic: works with SQLite now and PostgreSQL later.
 """
 
 import uuid
-from sqlalchemy import Column, Float, ForeignKey, String, DateTime
+from sqlalchemy import Column, Float, ForeignKey, String, DateTime, Index
 from datetime import datetime
 from app.db import Base
 
+# Transaction.status values
+STATUS_PROCESSED = "processed"   # rules + alerts done
+STATUS_QUEUED = "queued"         # stored, waiting for worker/transaction_worker.py
+STATUS_FAILED = "failed"         # worker gave up after MAX_RETRIES, never scored
+
+# Stored but not part of features / graph / aggregates
+UNPROCESSED_STATUSES = (STATUS_QUEUED, STATUS_FAILED)
+
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Sender / receiver history in time order (rules, account views)
+        Index("ix_transactions_from_account_timestamp", "from_account", "timestamp"),
+        Index("ix_transactions_to_account_timestamp", "to_account", "timestamp"),
+    )
 
     # Use String UUID so it works across DBs
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -25,7 +38,7 @@ class Transaction(Base):
     amount = Column(Float, nullable=False)
 
     # Timestamp of transaction
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
 
     # Processing status
-    status = Column(String, default="processed")
\ No newline at end of file
+    status = Column(String, default=STATUS_PROCESSED)
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Cold-tier models for archived transactions (see services/cold_storage.py).
+
+TransactionArchive is the catalog of cold partitions: one file per
+calendar month of transactions moved out of the transactions table.
+
+ArchivedPairTotals keeps what the rule engine's feature rebuild used to
+read from the archived rows (all-time counts, first activity, small
+transfers per counterparty), so archiving never changes rule outcomes.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, String
+from app.db import Base
+
+
+class TransactionArchive(Base):
+    __tablename__ = "transaction_archives"
+
+    # Partition covers period_start <= timestamp < period_end
+    period_start = Column(DateTime, primary_key=True)
+    period_end = Column(DateTime, nullable=False)
+
+    # File path and format ("parquet" or "ndjson.gz")
+    path = Column(String, nullable=False)
+    format = Column(String, nullable=False)
+
+    row_count = Column(Integer, nullable=False, default=0)
+    min_timestamp = Column(DateTime)
+    max_timestamp = Column(DateTime)
+
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedPairTotals(Base):
+    __tablename__ = "archived_pair_totals"
+
+    from_account = Column(String, primary_key=True)
+    to_account = Column(String, primary_key=True)
+
+    # All archived transfers from_account -> to_account
+    tx_count = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime)
+
+    # Archived transfers of at most rule_engine.SMURF_TXN_AMOUNT (at archive time)
+    small_count = Column(Integer, nullable=False, default=0)
+    small_sum = Column(Float, nullable=False, default=0.0)
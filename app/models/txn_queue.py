@@ -1,11 +1,15 @@
 import uuid
-from sqlalchemy import Column, String, Integer, TIMESTAMP
+from sqlalchemy import Column, String, Integer, TIMESTAMP, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.db import Base
 
 class TransactionQueue(Base):
     __tablename__ = "txn_queue"
+    __table_args__ = (
+        # Oldest-pending-first claims
+        Index("ix_txn_queue_status_created_at", "status", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     txn_id = Column(UUID(as_uuid=True), nullable=False)
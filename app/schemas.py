@@ -24,6 +24,36 @@ class TransactionResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class TransactionBatchCreate(BaseModel):
+    transactions: List[TransactionCreate]
+
+
+class BatchAlertSummary(BaseModel):
+    rule_triggered: str
+    severity: str
+
+
+class BatchItemResult(TransactionResponse):
+    alerts: List[BatchAlertSummary] = []
+
+
+class TransactionBatchResponse(BaseModel):
+    count: int
+    results: List[BatchItemResult]
+
+
+class AsyncIngestResponse(BaseModel):
+    tracking_id: str
+    status: str
+
+
+class AsyncIngestStatus(AsyncIngestResponse):
+    submitted_at: datetime
+    completed_at: Optional[datetime] = None
+    result: Optional[BatchItemResult] = None
+    error: Optional[str] = None
+
+
 # -----------------------------
 # Alert Schemas
 # -----------------------------
@@ -45,6 +75,42 @@ class AlertResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# -----------------------------
+# AI Investigator Schemas
+# -----------------------------
+class ExplanationBatchRequest(BaseModel):
+    alert_ids: List[str]
+
+
+class ExplanationResult(BaseModel):
+    alert_id: str
+    status: str  # cached | ok | timeout | error | not_found
+    explanation: Optional[str] = None
+
+
+class ExplanationBatchResponse(BaseModel):
+    count: int
+    results: List[ExplanationResult]
+
+
+# -----------------------------
+# Rule Registry Schemas
+# -----------------------------
+class RuleUpdate(BaseModel):
+    enabled: bool
+
+
+class RuleResponse(BaseModel):
+    name: str
+    severity: str
+    enabled: bool
+    groups: List[str]
+    cost: int
+    needs: List[str]
+    unless: List[str]
+    reason: str
+
+
 # -----------------------------
 # Account Schemas
 # -----------------------------
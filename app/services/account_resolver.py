@@ -0,0 +1,174 @@
+"""
+account_resolver.py
+
+Resolves account ids for ingest without a SELECT per account.
+
+- ensure(db, ids): ids already known to exist are skipped; the rest are
+  inserted in one INSERT ... ON CONFLICT (id) DO NOTHING RETURNING id
+  (SQLite and PostgreSQL), which both creates missing accounts and
+  confirms existing ones in a single round trip
+- known ids are kept in a bounded LRU set. Ids inserted by a session only
+  join it once that session commits (after_commit), so a rolled-back
+  insert can never leave a "known" account that does not exist
+- is_missing / mark_missing: short-lived negative cache for lookups of
+  accounts that do not exist (GET /accounts/{id} 404s), cleared as soon
+  as this process creates the account
+
+The cache is per process. Accounts are never deleted, so a known id
+never goes stale; a negative entry can hide an account created by
+another process for at most NEGATIVE_TTL_SEC.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Account
+from app.services.upserts import dialect_insert
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+ACCOUNT_CACHE_SIZE = int(os.getenv("ACCOUNT_CACHE_SIZE", "200000"))   # known account ids kept
+NEGATIVE_CACHE_SIZE = 10_000     # missing account ids kept
+NEGATIVE_TTL_SEC = 2             # how long a "does not exist" answer is trusted
+
+# Session.info key of ids inserted by a session and not yet committed
+_PENDING_KEY = "aml_pending_accounts"
+
+
+def default_account_name(account_id: str) -> str:
+    return f"User-{account_id[:4]}"
+
+
+class AccountResolver:
+    def __init__(self, max_known: int = ACCOUNT_CACHE_SIZE, max_missing: int = NEGATIVE_CACHE_SIZE,
+                 negative_ttl_sec: float = NEGATIVE_TTL_SEC):
+        self.max_known = max_known
+        self.max_missing = max_missing
+        self.negative_ttl_sec = negative_ttl_sec
+        self._known: OrderedDict = OrderedDict()     # account_id -> None, LRU order
+        self._missing: OrderedDict = OrderedDict()   # account_id -> expires_at
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ----------------------------
+    # Known accounts
+    # ----------------------------
+    def _remember(self, account_ids) -> None:
+        with self._lock:
+            for account_id in account_ids:
+                self._known[account_id] = None
+                self._known.move_to_end(account_id)
+                self._missing.pop(account_id, None)
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+
+    def is_known(self, account_id: str) -> bool:
+        with self._lock:
+            if account_id in self._known:
+                self._known.move_to_end(account_id)
+                return True
+            return False
+
+    def ensure(self, db: Session, account_ids) -> set:
+        """
+        Makes sure every account exists, inserting the missing ones with a
+        default name. Does not commit.
+
+        Args:
+            db (Session): DB session
+            account_ids (iterable[str]): account ids, duplicates allowed
+
+        Returns:
+            set: ids inserted by this call
+        """
+        pending = db.info.setdefault(_PENDING_KEY, set())
+
+        unresolved = []
+        with self._lock:
+            for account_id in dict.fromkeys(account_ids):
+                if account_id in self._known:
+                    self._known.move_to_end(account_id)
+                    self.hits += 1
+                elif account_id not in pending:
+                    unresolved.append(account_id)
+                    self.misses += 1
+
+        if not unresolved:
+            return set()
+
+        table = Account.__table__
+        stmt = (
+            dialect_insert(db, table)
+            .on_conflict_do_nothing(index_elements=[table.c.id])
+            .returning(table.c.id)
+        )
+        inserted = {
+            row[0]
+            for row in db.execute(stmt, [
+                {"id": account_id, "name": default_account_name(account_id)}
+                for account_id in unresolved
+            ])
+        }
+
+        # Conflicting ids were committed by someone else: known right away.
+        # Our own inserts only count once this session commits.
+        self._remember(a for a in unresolved if a not in inserted)
+        pending.update(inserted)
+        with self._lock:
+            for account_id in inserted:
+                self._missing.pop(account_id, None)
+        return inserted
+
+    # ----------------------------
+    # Negative cache
+    # ----------------------------
+    def is_missing(self, account_id: str) -> bool:
+        """
+        True if the account was recently looked up and did not exist.
+        """
+        with self._lock:
+            expires_at = self._missing.get(account_id)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._missing[account_id]
+                return False
+            return True
+
+    def mark_missing(self, account_id: str) -> None:
+        with self._lock:
+            if account_id in self._known:
+                return
+            self._missing[account_id] = time.monotonic() + self.negative_ttl_sec
+            self._missing.move_to_end(account_id)
+            while len(self._missing) > self.max_missing:
+                self._missing.popitem(last=False)
+
+    # ----------------------------
+    # Session hooks
+    # ----------------------------
+    def _on_commit(self, session: Session) -> None:
+        pending = session.info.pop(_PENDING_KEY, None)
+        if pending:
+            self._remember(pending)
+
+    def _on_rollback(self, session: Session) -> None:
+        session.info.pop(_PENDING_KEY, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._known.clear()
+            self._missing.clear()
+
+
+account_resolver = AccountResolver()
+
+event.listen(Session, "after_commit", account_resolver._on_commit)
+event.listen(Session, "after_rollback", account_resolver._on_rollback)
@@ -0,0 +1,130 @@
+"""
+account_stats.py
+
+Maintains the account_stats aggregates (see models/account_stats.py).
+
+process_transactions folds every batch into per-account deltas and applies
+them with one INSERT ... ON CONFLICT DO UPDATE, so counters are added
+atomically in the database and concurrent ingests cannot lose updates.
+Distinct counterparties grow only when upsert_links reports a new
+directed link.
+"""
+
+from sqlalchemy import case, text
+from sqlalchemy.orm import Session
+
+from app.models import AccountStats
+from app.services.upserts import dialect_insert
+
+COUNTERS = (
+    "tx_out_count",
+    "tx_in_count",
+    "volume_out",
+    "volume_in",
+    "distinct_receivers",
+    "distinct_senders",
+)
+
+
+def stats_deltas(transactions, new_links=()) -> dict:
+    """
+    Folds transactions (and newly created links) into per-account deltas.
+
+    Returns:
+        dict: account_id -> row dict for account_stats
+    """
+    deltas = {}
+
+    def row(account_id):
+        entry = deltas.get(account_id)
+        if entry is None:
+            entry = deltas[account_id] = {"account_id": account_id, **dict.fromkeys(COUNTERS, 0),
+                                          "first_activity": None, "last_activity": None}
+        return entry
+
+    for t in transactions:
+        sides = [(row(t.from_account), "tx_out_count", "volume_out")]
+        if t.to_account != t.from_account:
+            # A self-transfer is one transaction of the account, counted as outgoing
+            sides.append((row(t.to_account), "tx_in_count", "volume_in"))
+        for entry, count, volume in sides:
+            entry[count] += 1
+            entry[volume] += t.amount
+            if entry["first_activity"] is None or t.timestamp < entry["first_activity"]:
+                entry["first_activity"] = t.timestamp
+            if entry["last_activity"] is None or t.timestamp > entry["last_activity"]:
+                entry["last_activity"] = t.timestamp
+
+    for a, b in new_links:
+        row(a)["distinct_receivers"] += 1
+        row(b)["distinct_senders"] += 1
+
+    return deltas
+
+
+def apply_account_stats(db: Session, transactions, new_links=()) -> None:
+    """
+    Adds the deltas of `transactions` to account_stats in one statement.
+    Does not commit.
+
+    Args:
+        db (Session): DB session (accounts must already be flushed)
+        transactions (list[Transaction]): newly processed transactions
+        new_links (set): (account_a, account_b) pairs upsert_links created
+    """
+    deltas = stats_deltas(transactions, new_links)
+    if not deltas:
+        return
+
+    table = AccountStats.__table__
+    stmt = dialect_insert(db, table)
+    excluded = stmt.excluded
+
+    updates = {name: table.c[name] + excluded[name] for name in COUNTERS}
+    updates["first_activity"] = case(
+        (table.c.first_activity.is_(None), excluded.first_activity),
+        (excluded.first_activity < table.c.first_activity, excluded.first_activity),
+        else_=table.c.first_activity,
+    )
+    updates["last_activity"] = case(
+        (table.c.last_activity.is_(None), excluded.last_activity),
+        (excluded.last_activity > table.c.last_activity, excluded.last_activity),
+        else_=table.c.last_activity,
+    )
+
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.account_id], set_=updates)
+    db.execute(stmt, list(deltas.values()))
+
+
+def backfill_account_stats(conn) -> int:
+    """
+    Fills an empty account_stats table from existing transactions.
+    Returns the number of rows written (0 if the table already had data).
+    """
+    if conn.execute(text("SELECT 1 FROM account_stats LIMIT 1")).first():
+        return 0
+
+    processed = "COALESCE(status, 'processed') NOT IN ('queued', 'failed')"
+    # Self-transfers count on the outgoing side only
+    received = "CASE WHEN to_account != from_account THEN 1 ELSE 0 END"
+    result = conn.execute(text(f"""
+        INSERT INTO account_stats (
+            account_id, tx_out_count, tx_in_count, volume_out, volume_in,
+            distinct_receivers, distinct_senders, first_activity, last_activity
+        )
+        SELECT account_id, SUM(out_n), SUM(in_n), SUM(out_v), SUM(in_v),
+               SUM(receivers), SUM(senders), MIN(first_ts), MAX(last_ts)
+        FROM (
+            SELECT from_account AS account_id, COUNT(*) AS out_n, 0 AS in_n,
+                   SUM(amount) AS out_v, 0 AS in_v,
+                   COUNT(DISTINCT to_account) AS receivers, 0 AS senders,
+                   MIN(timestamp) AS first_ts, MAX(timestamp) AS last_ts
+            FROM transactions WHERE {processed} GROUP BY from_account
+            UNION ALL
+            SELECT to_account, 0, SUM({received}), 0, SUM({received} * amount),
+                   0, COUNT(DISTINCT from_account), MIN(timestamp), MAX(timestamp)
+            FROM transactions WHERE {processed} GROUP BY to_account
+        ) sides
+        GROUP BY account_id
+    """))
+    return result.rowcount
@@ -1,22 +1,49 @@
 # app/services/ai_services.py
+"""
+Explanation backends for the AI Investigator.
+
+A backend turns one alert dict (transaction_id, rule_triggered, severity,
+reason) into a human-readable explanation. StubBackend is local and
+deterministic (offline demos / tests); OpenAIBackend calls a chat model
+and needs the optional `openai` package. Swap backends with set_backend().
+Caching and batching live in explanation_service.py.
+"""
+
+import os
 from typing import Dict
-from datetime import datetime
 
 MOCK_MODE = True  # Keep True for now, set False to enable real AI
 
-def explain_alert(alert: Dict) -> str:
+
+class ExplanationBackend:
+    """
+    Interface for explanation backends.
+
+    `name` is part of the explanation cache key, so bump it (e.g. "openai:v2")
+    when prompts or models change and old explanations should not be reused.
+    """
+
+    name = "base"
+
+    def explain(self, alert: Dict, timeout: float = None) -> str:
+        raise NotImplementedError
+
+
+class StubBackend(ExplanationBackend):
     """
-    Generate a detailed, human-readable AI-style explanation for an AML alert.
-    Works fully in MOCK_MODE for demo purposes.
-    
-    Example output:
-    "Alert 'Rapid Transactions' triggered for txn 12345 (HIGH risk).
-    Reason: Multiple transactions detected within 60 seconds.
-    Related accounts: 456, 789.
-    Recommendation: Investigate account activity for potential smurfing or mule behavior."
+    Local, rule-based explanations. No network access.
     """
 
-    if MOCK_MODE:
+    name = "stub"
+
+    def explain(self, alert: Dict, timeout: float = None) -> str:
+        """
+        Example output:
+        "Alert 'Rapid Transactions' triggered for txn 12345 (HIGH risk).
+        Reason: Multiple transactions detected within 60 seconds.
+        Related accounts: 456, 789.
+        Recommendation: Investigate account activity for potential smurfing or mule behavior."
+        """
         explanation_lines = [
             f"Alert '{alert['rule_triggered']}' triggered for transaction {alert['transaction_id']}.",
             f"Severity Level: {alert['severity']}",
@@ -35,7 +62,7 @@ def explain_alert(alert: Dict) -> str:
                 "Pattern detected: High-value transaction exceeding normal threshold. "
                 "Verify source of funds and legitimacy."
             )
-        elif "money loop" in rule:
+        elif "money loop" in rule or "layering" in rule:
             explanation_lines.append(
                 "Pattern detected: Circular money flow between linked accounts. "
                 "Potential layering to obscure funds."
@@ -54,12 +81,51 @@ def explain_alert(alert: Dict) -> str:
 
         return "\n".join(explanation_lines)
 
-    # Placeholder for real AI integration (OpenAI GPT, etc.)
-    # import openai
-    # import os
-    # openai.api_key = os.getenv("OPENAI_API_KEY")
-    # response = openai.ChatCompletion.create(
-    #     model="gpt-4",
-    #     messages=[{"role": "user", "content": f"Explain this AML alert: {alert}"}]
-    # )
-    # return response.choices[0].message.content
\ No newline at end of file
+
+class OpenAIBackend(ExplanationBackend):
+    """
+    Chat-model explanations. Requires `pip install openai` and OPENAI_API_KEY.
+    """
+
+    def __init__(self, model: str = None):
+        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4")
+        self.name = f"openai:{self.model}"
+
+    def explain(self, alert: Dict, timeout: float = None) -> str:
+        try:
+            import openai
+        except ImportError as e:
+            raise RuntimeError("OpenAIBackend requires the 'openai' package") from e
+
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout)
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": f"Explain this AML alert: {alert}"}],
+        )
+        return response.choices[0].message.content
+
+
+_backend: ExplanationBackend = None
+
+
+def get_backend() -> ExplanationBackend:
+    """
+    Active backend: the one given to set_backend(), else stub / OpenAI per MOCK_MODE.
+    """
+    global _backend
+    if _backend is None:
+        _backend = StubBackend() if MOCK_MODE else OpenAIBackend()
+    return _backend
+
+
+def set_backend(backend: ExplanationBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def explain_alert(alert: Dict) -> str:
+    """
+    Generate a detailed, human-readable AI-style explanation for an AML alert
+    with the active backend (uncached; see explanation_service for caching).
+    """
+    return get_backend().explain(alert)
@@ -7,21 +7,15 @@ determining severity, and calculating risk score increases.
 This module is used by the transaction ingestion pipeline.
 """
 
-# ----------------------------
-# RULE SEVERITY MAPPING
-# ----------------------------
-# Map rule names to severity levels
-RULE_SEVERITY = {
-    "Large Transaction Amount": "HIGH",
-    "Rapid Transactions": "MEDIUM",
-    "Money Loop Detected": "HIGH",
-    "Mule Account Detected": "HIGH",
-    "OTP Scam Detected": "HIGH",
-    "Smurfing Pattern": "MEDIUM",
-    "False / Temp Account": "MEDIUM",
-    # Add more rules here as needed
-}
+from datetime import datetime
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
 
+from app.models import Account, Alert, RiskAudit
+from app.services.alert_summary import apply_alert_summary
+from app.services.metrics import count_rule_hits
+from app.services.rule_registry import rule_registry
 
 # ----------------------------
 # RISK SCORE INCREASE MAPPING
@@ -39,7 +33,7 @@ RISK_SCORE_INCREASE = {
 # ----------------------------
 def determine_severity(rule_name: str) -> str:
     """
-    Maps a rule name to a severity level.
+    Maps a rule name to a severity level, as declared in the rule registry.
     Defaults to "LOW" if rule name is unknown.
 
     Args:
@@ -48,7 +42,7 @@ def determine_severity(rule_name: str) -> str:
     Returns:
         str: Severity level ("LOW", "MEDIUM", "HIGH")
     """
-    return RULE_SEVERITY.get(rule_name, "LOW")
+    return rule_registry.severity(rule_name) or "LOW"
 
 
 # ----------------------------
@@ -108,4 +102,79 @@ def generate_alerts(txn_id, triggered_rules):
             "reason": reason
         })
 
-    return alerts
\ No newline at end of file
+    return alerts
+
+
+# ----------------------------
+# Persist alerts + risk score + audit trail
+# ----------------------------
+def persist_alerts(db: Session, alerts_by_account: dict, counterparties: dict = None) -> dict:
+    """
+    Stores alerts and applies their risk impact, one atomic increment per account.
+
+    The risk increase of all alerts of an account is summed and applied as
+    a single `UPDATE accounts SET risk_score = risk_score + :total ... RETURNING`,
+    so concurrent ingests for the same account cannot lose updates. Audit
+    rows (one per alert, chained old -> new) and alerts are bulk-inserted,
+    and the alert_daily_summary rollup is incremented. Does not commit.
+
+    Args:
+        db (Session): DB session (account rows must already be flushed)
+        alerts_by_account (dict): account_id -> list of alerts from
+            generate_alerts, in the order they were raised
+        counterparties (dict): transaction_id -> receiving account, stored
+            on the alerts for per-account filtering
+
+    Returns:
+        dict: account_id -> new risk score
+    """
+    alert_rows = []
+    audit_rows = []
+    new_scores = {}
+    counterparties = counterparties or {}
+    now = datetime.utcnow()
+
+    for account_id, alerts in alerts_by_account.items():
+        if not alerts:
+            continue
+
+        increases = [risk_increase_from_severity(a["severity"]) for a in alerts]
+        total = sum(increases)
+
+        new_score = db.execute(
+            update(Account)
+            .where(Account.id == account_id)
+            .values(risk_score=func.coalesce(Account.risk_score, 0) + total)
+            .returning(Account.risk_score)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+
+        score = new_score - total
+        for alert, increase in zip(alerts, increases):
+            audit_rows.append({
+                "account_id": account_id,
+                "old_score": score,
+                "new_score": score + increase,
+                "reason": alert["reason"],
+            })
+            score += increase
+
+            alert_rows.append({
+                "transaction_id": alert["transaction_id"],
+                "rule_triggered": alert["rule_triggered"],
+                "severity": alert["severity"],
+                "reason": alert["reason"],
+                "account_id": account_id,
+                "counterparty_id": counterparties.get(alert["transaction_id"]),
+                "created_at": now,
+            })
+
+        new_scores[account_id] = new_score
+
+    if alert_rows:
+        db.execute(insert(Alert), alert_rows)
+        db.execute(insert(RiskAudit), audit_rows)
+        apply_alert_summary(db, alert_rows)
+        count_rule_hits(alert_rows)
+
+    return new_scores
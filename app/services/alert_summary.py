@@ -0,0 +1,164 @@
+"""
+alert_summary.py
+
+Maintains the alert_daily_summary rollup (see models/alert_summary.py)
+and answers alert statistics from it.
+
+persist_alerts folds every batch of new alerts into (account, day, rule,
+severity) counts, plus the same counts under ALL_ACCOUNTS, and adds them
+with one INSERT ... ON CONFLICT DO UPDATE, so concurrent ingests cannot
+lose increments. alert_stats() then reads at most
+days x rules x severities rows for one account, however many alerts
+the account has.
+"""
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import AlertDailySummary
+from app.models.alert_summary import ALL_ACCOUNTS
+from app.services.upserts import dialect_insert
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+ALERT_STATS_DEFAULT_DAYS = 30   # window when no start date is given
+ALERT_STATS_MAX_DAYS = 366      # longest window one stats request may read
+
+
+def summary_deltas(alert_rows) -> Counter:
+    """
+    Folds alert rows (with account_id and created_at) into
+    (account_id, day, rule_triggered, severity) -> count.
+    """
+    deltas = Counter()
+    for row in alert_rows:
+        key = (row["created_at"].date(), row["rule_triggered"], row["severity"])
+        deltas[(ALL_ACCOUNTS, *key)] += 1
+        if row.get("account_id") is not None:
+            deltas[(row["account_id"], *key)] += 1
+    return deltas
+
+
+def apply_alert_summary(db: Session, alert_rows) -> None:
+    """
+    Adds new alerts to alert_daily_summary in one statement. Does not commit.
+    """
+    deltas = summary_deltas(alert_rows)
+    if not deltas:
+        return
+
+    table = AlertDailySummary.__table__
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.account_id, table.c.day, table.c.rule_triggered, table.c.severity],
+        set_={"alert_count": table.c.alert_count + stmt.excluded.alert_count},
+    )
+    db.execute(stmt, [
+        {"account_id": account_id, "day": day, "rule_triggered": rule, "severity": severity, "alert_count": count}
+        for (account_id, day, rule, severity), count in deltas.items()
+    ])
+
+
+# ----------------------------
+# Backfills (migrate.py)
+# ----------------------------
+def backfill_alert_accounts(conn) -> int:
+    """
+    Copies sender / receiver from transactions into alerts stored before
+    Alert.account_id existed. Returns the number of alerts updated.
+    """
+    result = conn.execute(text("""
+        UPDATE alerts SET
+            account_id = (SELECT from_account FROM transactions WHERE transactions.id = alerts.transaction_id),
+            counterparty_id = (SELECT to_account FROM transactions WHERE transactions.id = alerts.transaction_id)
+        WHERE account_id IS NULL
+          AND EXISTS (SELECT 1 FROM transactions WHERE transactions.id = alerts.transaction_id)
+    """))
+    return result.rowcount
+
+
+def backfill_alert_summary(conn) -> int:
+    """
+    Fills an empty alert_daily_summary from existing alerts.
+    Returns the number of rows written (0 if the table already had data).
+    """
+    if conn.execute(text("SELECT 1 FROM alert_daily_summary LIMIT 1")).first():
+        return 0
+
+    result = conn.execute(text("""
+        INSERT INTO alert_daily_summary (account_id, day, rule_triggered, severity, alert_count)
+        SELECT account_id, DATE(created_at), rule_triggered, severity, COUNT(*)
+        FROM alerts WHERE account_id IS NOT NULL
+        GROUP BY account_id, DATE(created_at), rule_triggered, severity
+        UNION ALL
+        SELECT :all_accounts, DATE(created_at), rule_triggered, severity, COUNT(*)
+        FROM alerts
+        GROUP BY DATE(created_at), rule_triggered, severity
+    """), {"all_accounts": ALL_ACCOUNTS})
+    return result.rowcount
+
+
+# ----------------------------
+# Reads
+# ----------------------------
+def alert_stats(db: Session, account_id: str = None, start_date: date = None, end_date: date = None) -> dict:
+    """
+    Alert counts by severity, rule and day from the rollup.
+
+    Args:
+        db (Session): DB session
+        account_id (str): account charged with the alerts; all accounts when None
+        start_date, end_date (date): inclusive UTC days; end defaults to today,
+            start to ALERT_STATS_DEFAULT_DAYS before end
+
+    Returns:
+        dict: account_id, start_date, end_date, total, by_severity, by_rule,
+            by_day ([{"day", "total", "by_severity"}], oldest first)
+
+    Raises:
+        ValueError: start after end, or a window over ALERT_STATS_MAX_DAYS
+    """
+    end_date = end_date or datetime.utcnow().date()
+    start_date = start_date or end_date - timedelta(days=ALERT_STATS_DEFAULT_DAYS - 1)
+    if start_date > end_date:
+        raise ValueError("start_date is after end_date")
+    if (end_date - start_date).days >= ALERT_STATS_MAX_DAYS:
+        raise ValueError(f"Window longer than {ALERT_STATS_MAX_DAYS} days")
+
+    rows = (
+        db.query(
+            AlertDailySummary.day,
+            AlertDailySummary.rule_triggered,
+            AlertDailySummary.severity,
+            AlertDailySummary.alert_count,
+        )
+        .filter(AlertDailySummary.account_id == (account_id or ALL_ACCOUNTS))
+        .filter(AlertDailySummary.day >= start_date, AlertDailySummary.day <= end_date)
+        .all()
+    )
+
+    by_severity, by_rule = Counter(), Counter()
+    by_day = {}
+    for day, rule, severity, count in rows:
+        by_severity[severity] += count
+        by_rule[rule] += count
+        entry = by_day.setdefault(day, {"day": day, "total": 0, "by_severity": Counter()})
+        entry["total"] += count
+        entry["by_severity"][severity] += count
+
+    return {
+        "account_id": account_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "total": sum(by_severity.values()),
+        "by_severity": dict(by_severity),
+        "by_rule": dict(by_rule.most_common()),
+        "by_day": [
+            {**entry, "by_severity": dict(entry["by_severity"])}
+            for _, entry in sorted(by_day.items())
+        ],
+    }
@@ -0,0 +1,526 @@
+"""
+cold_storage.py
+
+Hot / cold tiers for transaction history.
+
+The transactions table is the hot tier: ingest, the rule engine's
+feature rebuilds and the link graph warm-load only ever read it, and
+their windows (RAPID_TXN_WINDOW_SEC, NEW_ACCOUNT_AGE_HOURS, the
+layering / transfer windows) are far shorter than HOT_RETENTION_DAYS.
+
+The archiver moves whole calendar months older than the retention out
+of the table into one compressed file per month (Parquet with zstd when
+pyarrow is installed, gzip NDJSON otherwise), recorded in the
+transaction_archives catalog. In the same unit of work it folds the
+archived rows into archived_pair_totals, which the feature rebuild adds
+to what it reads from the hot table, so all-time features (transaction
+count, first activity, small transfers per counterparty) and therefore
+rule outcomes do not change when history is archived.
+
+Months are archived oldest first and only when none of their rows is
+still queued, so the tiers never overlap: every archived row is older
+than hot_boundary(), every hot row at least as new. Readers that page by
+(timestamp, id) - GET /transactions - can then walk the hot table and
+the cold files as one sequence (tiered_page).
+
+    python -m app.services.cold_storage --retention-days 90
+    python -m app.services.cold_storage --dry-run
+"""
+
+import argparse
+import gzip
+import importlib.util
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models import ArchivedPairTotals, Transaction, TransactionArchive
+from app.models.transaction import STATUS_FAILED, STATUS_PROCESSED, STATUS_QUEUED
+from app.services.pagination import decode_cursor, encode_cursor, iter_keyset, keyset_page
+from app.services.upserts import dialect_insert
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_FORMAT = os.getenv("ARCHIVE_FORMAT", "auto")            # parquet | ndjson.gz | auto
+HOT_RETENTION_DAYS = int(os.getenv("HOT_RETENTION_DAYS", "90"))  # history kept in the transactions table
+ARCHIVE_CHUNK = 10_000                                          # rows per read / write batch
+
+FORMAT_PARQUET = "parquet"
+FORMAT_NDJSON = "ndjson.gz"
+
+COLUMNS = ("id", "from_account", "to_account", "amount", "timestamp", "status")
+
+
+# ----------------------------
+# Periods / settings
+# ----------------------------
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start: datetime) -> datetime:
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def min_retention_days() -> int:
+    """
+    Shortest retention that keeps every rule window in the hot tier.
+    """
+    from app.services import graph_service, layering, rule_engine
+
+    longest_sec = max(
+        rule_engine.RAPID_TXN_WINDOW_SEC,
+        rule_engine.NEW_ACCOUNT_AGE_HOURS * 3600,
+        layering.LAYERING_WINDOW_SEC,
+        graph_service.TRANSFER_WINDOW_SEC,
+    )
+    return math.ceil(longest_sec / 86400) + 1
+
+
+def resolve_format(fmt: str = ARCHIVE_FORMAT) -> str:
+    if fmt == "auto":
+        return FORMAT_PARQUET if importlib.util.find_spec("pyarrow") else FORMAT_NDJSON
+    if fmt not in (FORMAT_PARQUET, FORMAT_NDJSON):
+        raise ValueError(f"Unknown archive format {fmt!r}")
+    return fmt
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet archives require the 'pyarrow' package") from e
+    return pyarrow, pyarrow.parquet
+
+
+def _naive_utc(moment):
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+# ----------------------------
+# Partition files
+# ----------------------------
+def _write_parquet(path: str, chunks) -> None:
+    pa, pq = _pyarrow()
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("from_account", pa.string()),
+        ("to_account", pa.string()),
+        ("amount", pa.float64()),
+        ("timestamp", pa.timestamp("us")),
+        ("status", pa.string()),
+    ])
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in chunks:
+            writer.write_table(pa.Table.from_pylist([dict(zip(COLUMNS, row)) for row in rows], schema=schema))
+
+
+def _write_ndjson(path: str, chunks) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for rows in chunks:
+            for row in rows:
+                record = dict(zip(COLUMNS, row))
+                record["timestamp"] = record["timestamp"].isoformat()
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def read_partition(entry: TransactionArchive, start_time: datetime = None, end_time: datetime = None,
+                   account_id: str = None) -> list[dict]:
+    """
+    Rows of one cold partition within [start_time, end_time], oldest first,
+    only those sent or received by account_id when given.
+    """
+    if entry.format == FORMAT_PARQUET:
+        _, pq = _pyarrow()
+        filters = []
+        if start_time is not None:
+            filters.append(("timestamp", ">=", start_time))
+        if end_time is not None:
+            filters.append(("timestamp", "<=", end_time))
+        if account_id is not None:
+            # Disjunctive normal form: (time and sender) or (time and receiver)
+            filters = [
+                filters + [("from_account", "=", account_id)],
+                filters + [("to_account", "=", account_id)],
+            ]
+        return pq.read_table(entry.path, filters=filters or None).to_pylist()
+
+    rows = []
+    with gzip.open(entry.path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+            if start_time is not None and record["timestamp"] < start_time:
+                continue
+            if end_time is not None and record["timestamp"] > end_time:
+                break
+            if _matches(record, account_id):
+                rows.append(record)
+    return rows
+
+
+# ----------------------------
+# Archiver
+# ----------------------------
+def _fold_pair_totals(db: Session, period_filter) -> None:
+    """
+    Adds the archived rows of a period to archived_pair_totals. Failed
+    rows were never scored, so they stay out of the totals.
+    """
+    from app.services.rule_engine import SMURF_TXN_AMOUNT
+
+    small = Transaction.amount <= SMURF_TXN_AMOUNT
+    rows = db.query(
+        Transaction.from_account,
+        Transaction.to_account,
+        func.count(Transaction.id),
+        func.min(Transaction.timestamp),
+        func.sum(case((small, 1), else_=0)),
+        func.sum(case((small, Transaction.amount), else_=0.0)),
+    ).filter(
+        *period_filter,
+        func.coalesce(Transaction.status, STATUS_PROCESSED) != STATUS_FAILED,
+    ).group_by(Transaction.from_account, Transaction.to_account).all()
+    if not rows:
+        return
+
+    table = ArchivedPairTotals.__table__
+    stmt = dialect_insert(db, table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.from_account, table.c.to_account],
+        set_={
+            "tx_count": table.c.tx_count + excluded.tx_count,
+            "first_seen": case(
+                (table.c.first_seen.is_(None), excluded.first_seen),
+                (excluded.first_seen < table.c.first_seen, excluded.first_seen),
+                else_=table.c.first_seen,
+            ),
+            "small_count": table.c.small_count + excluded.small_count,
+            "small_sum": table.c.small_sum + excluded.small_sum,
+        },
+    )
+    db.execute(stmt, [
+        {
+            "from_account": a, "to_account": b, "tx_count": count, "first_seen": first_seen,
+            "small_count": small_count or 0, "small_sum": small_sum or 0.0,
+        }
+        for a, b, count, first_seen, small_count, small_sum in rows
+    ])
+
+
+def archive_period(db: Session, period_start: datetime, archive_dir: str = ARCHIVE_DIR,
+                   fmt: str = ARCHIVE_FORMAT) -> dict:
+    """
+    Moves the transactions of one calendar month to a cold partition file
+    and commits. Returns the catalog entry as a dict (path None and
+    nothing written for a month without transactions).
+    """
+    fmt = resolve_format(fmt)
+    period_end = next_month(period_start)
+    period_filter = (Transaction.timestamp >= period_start, Transaction.timestamp < period_end)
+
+    if db.query(Transaction.id).filter(*period_filter).first() is None:
+        return {
+            "period_start": period_start,
+            "period_end": period_end,
+            "path": None,
+            "format": fmt,
+            "row_count": 0,
+            "min_timestamp": None,
+            "max_timestamp": None,
+        }
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"transactions-{period_start:%Y-%m}.{fmt}")
+    tmp_path = path + ".tmp"
+
+    query = db.query(
+        Transaction.id,
+        Transaction.from_account,
+        Transaction.to_account,
+        Transaction.amount,
+        Transaction.timestamp,
+        Transaction.status,
+    ).filter(*period_filter)
+
+    stats = {"row_count": 0, "min_timestamp": None, "max_timestamp": None}
+
+    def chunks():
+        for rows in iter_keyset(query, Transaction.timestamp, Transaction.id, ARCHIVE_CHUNK):
+            stats["row_count"] += len(rows)
+            stats["min_timestamp"] = stats["min_timestamp"] or rows[0].timestamp
+            stats["max_timestamp"] = rows[-1].timestamp
+            yield [tuple(row) for row in rows]
+
+    try:
+        (_write_parquet if fmt == FORMAT_PARQUET else _write_ndjson)(tmp_path, chunks())
+
+        _fold_pair_totals(db, period_filter)
+        db.query(Transaction).filter(*period_filter).delete(synchronize_session=False)
+        entry = TransactionArchive(
+            period_start=period_start,
+            period_end=period_end,
+            path=path,
+            format=fmt,
+            archived_at=datetime.utcnow(),
+            **stats,
+        )
+        db.add(entry)
+
+        os.replace(tmp_path, path)
+        db.commit()
+    except Exception:
+        db.rollback()
+        for leftover in (tmp_path, path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+
+    return {
+        "period_start": period_start,
+        "period_end": period_end,
+        "path": path,
+        "format": fmt,
+        **stats,
+    }
+
+
+def archivable_periods(db: Session, retention_days: int = HOT_RETENTION_DAYS, now: datetime = None) -> list:
+    """
+    Months that are entirely older than the retention and hold no queued
+    rows, oldest first, stopping at the first month that is not ready
+    (so archived history stays contiguous). Months without transactions
+    are skipped.
+
+    Raises:
+        ValueError: retention shorter than min_retention_days()
+    """
+    if retention_days < min_retention_days():
+        raise ValueError(f"Retention must be at least {min_retention_days()} days to cover the rule windows")
+
+    cutoff = month_start((now or datetime.utcnow()) - timedelta(days=retention_days))
+
+    periods = []
+    start = None
+    while True:
+        # Next month holding transactions
+        oldest = db.query(func.min(Transaction.timestamp))
+        if start is not None:
+            oldest = oldest.filter(Transaction.timestamp >= start)
+        oldest = oldest.scalar()
+        if oldest is None:
+            break
+        start = month_start(oldest)
+        if next_month(start) > cutoff:
+            break
+
+        queued = db.query(Transaction.id).filter(
+            Transaction.timestamp >= start,
+            Transaction.timestamp < next_month(start),
+            Transaction.status == STATUS_QUEUED,
+        ).first()
+        if queued is not None:
+            break
+        periods.append(start)
+        start = next_month(start)
+    return periods
+
+
+def archive_cold_partitions(db: Session, retention_days: int = HOT_RETENTION_DAYS, archive_dir: str = ARCHIVE_DIR,
+                            fmt: str = ARCHIVE_FORMAT, now: datetime = None) -> list[dict]:
+    """
+    Archives every ready month (see archivable_periods), one commit each.
+    """
+    return [
+        archive_period(db, start, archive_dir, fmt)
+        for start in archivable_periods(db, retention_days, now)
+    ]
+
+
+# ----------------------------
+# Reads across tiers
+# ----------------------------
+def hot_boundary(db: Session):
+    """
+    Every archived transaction is older than this; None when nothing is archived.
+    """
+    return db.query(func.max(TransactionArchive.period_end)).scalar()
+
+
+def cold_total(db: Session) -> int:
+    return db.query(func.coalesce(func.sum(TransactionArchive.row_count), 0)).scalar()
+
+
+def _matches(row: dict, account_id) -> bool:
+    return account_id is None or row["from_account"] == account_id or row["to_account"] == account_id
+
+
+def _partitions(db: Session, start_time: datetime = None, end_time: datetime = None):
+    """Catalog entries overlapping [start_time, end_time] (naive UTC)."""
+    query = db.query(TransactionArchive)
+    if start_time is not None:
+        query = query.filter(TransactionArchive.period_end > start_time)
+    if end_time is not None:
+        query = query.filter(TransactionArchive.period_start <= end_time)
+    return query
+
+
+def cold_overlaps(db: Session, start_time: datetime = None, end_time: datetime = None) -> bool:
+    """
+    True if some archived month overlaps [start_time, end_time].
+    """
+    return _partitions(db, _naive_utc(start_time), _naive_utc(end_time)).first() is not None
+
+
+def iter_cold_rows(db: Session, account_id: str = None, start_time: datetime = None, end_time: datetime = None,
+                   descending: bool = True):
+    """
+    Yields archived transactions as dicts in (timestamp, id) order,
+    reading only the partitions that overlap [start_time, end_time].
+    """
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+    query = _partitions(db, start_time, end_time)
+    order = TransactionArchive.period_start.desc() if descending else TransactionArchive.period_start.asc()
+
+    for entry in query.order_by(order).all():
+        rows = read_partition(entry, start_time, end_time, account_id)
+        rows.sort(key=lambda r: (r["timestamp"], r["id"]), reverse=descending)
+        yield from rows
+
+
+def cold_count(db: Session, start_time: datetime = None, end_time: datetime = None) -> int:
+    """
+    Archived transactions within [start_time, end_time]. Months the range
+    covers entirely are counted from the catalog; only the (at most two)
+    months it cuts are read.
+
+    The catalog has no per-account counts, so there is no account filter:
+    counting one account's archived rows would decompress every month
+    (GET /transactions rejects total=exact with account_id over them).
+    """
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+    count = 0
+    for entry in _partitions(db, start_time, end_time).all():
+        inside = (
+            (start_time is None or entry.period_start >= start_time)
+            and (end_time is None or entry.period_end <= end_time)
+        )
+        count += entry.row_count if inside else len(read_partition(entry, start_time, end_time))
+    return count
+
+
+def _cold_after(db: Session, account_id, start_time, end_time, after, descending: bool, limit: int) -> list[dict]:
+    if after is not None:
+        # Partitions beyond the cursor are never read
+        after_ts = _naive_utc(after[0])
+        if descending:
+            end_time = after_ts if end_time is None else min(_naive_utc(end_time), after_ts)
+        else:
+            start_time = after_ts if start_time is None else max(_naive_utc(start_time), after_ts)
+
+    rows = []
+    for row in iter_cold_rows(db, account_id, start_time, end_time, descending):
+        if after is not None:
+            key = (row["timestamp"], row["id"])
+            if (key >= after) if descending else (key <= after):
+                continue
+        rows.append(row)
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def tiered_page(db: Session, query, size: int, cursor: str = None, descending: bool = True,
+                account_id: str = None, start_time: datetime = None, end_time: datetime = None):
+    """
+    keyset_page over the hot query (already filtered) followed / preceded
+    by the cold partitions, as one (timestamp, id) ordered sequence.
+    Cold rows are dicts with the Transaction columns.
+
+    Returns:
+        (rows, next_cursor): next_cursor is None on the last page
+
+    Raises:
+        ValueError: malformed cursor
+    """
+    boundary = hot_boundary(db)
+    if boundary is None or (start_time is not None and _naive_utc(start_time) >= boundary):
+        return keyset_page(query, Transaction.timestamp, Transaction.id, size, cursor, descending)
+
+    after = decode_cursor(cursor) if cursor else None
+    cold = lambda limit: _cold_after(db, account_id, start_time, end_time, after, descending, limit)
+
+    if descending:
+        rows, next_cursor = keyset_page(query, Transaction.timestamp, Transaction.id, size, cursor, descending)
+        if next_cursor is not None:
+            return rows, next_cursor
+        need = size - len(rows)
+        older = cold(need + 1)
+        rows = list(rows) + older[:need]
+        if len(older) > need and rows:
+            last = rows[-1]
+            return rows, encode_cursor(_field(last, "timestamp"), _field(last, "id"))
+        return rows, None
+
+    # Ascending: cold partitions first, then the hot table
+    if after is None or after[0] < boundary:
+        older = cold(size + 1)
+        if len(older) > size:
+            last = older[size - 1]
+            return older[:size], encode_cursor(last["timestamp"], last["id"])
+        need = size - len(older)
+        if need == 0:
+            more = query.first() is not None
+            return older, (encode_cursor(older[-1]["timestamp"], older[-1]["id"]) if more else None)
+        rows, next_cursor = keyset_page(query, Transaction.timestamp, Transaction.id, need, None, descending)
+        return older + list(rows), next_cursor
+
+    return keyset_page(query, Transaction.timestamp, Transaction.id, size, cursor, descending)
+
+
+def _field(row, name: str):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def main(argv=None) -> list[dict]:
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archive cold transaction history to compressed partition files")
+    parser.add_argument("--retention-days", type=int, default=HOT_RETENTION_DAYS,
+                        help="history kept in the transactions table")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="directory of the partition files")
+    parser.add_argument("--format", default=ARCHIVE_FORMAT, choices=["auto", FORMAT_PARQUET, FORMAT_NDJSON])
+    parser.add_argument("--dry-run", action="store_true", help="only list the months that would be archived")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        try:
+            if args.dry_run:
+                result = [{"period_start": p} for p in archivable_periods(db, args.retention_days)]
+            else:
+                result = archive_cold_partitions(db, args.retention_days, args.dir, args.format)
+        except ValueError as e:
+            parser.error(str(e))
+    finally:
+        db.close()
+
+    print(json.dumps(result, indent=2, default=str))
+    return result
+
+
+if __name__ == "__main__":
+    main()
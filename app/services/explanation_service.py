@@ -0,0 +1,200 @@
+"""
+explanation_service.py
+
+Cached, concurrent alert explanations for the AI Investigator.
+
+- Explanations are stored in alert_explanations under a hash of the alert
+  content and the backend name, so the backend is called once per distinct
+  alert content, not once per click.
+- explain_many() answers cache hits with one query and sends only the
+  misses (deduplicated) to a shared, bounded thread pool. The whole call
+  has one deadline, EXPLAIN_TIMEOUT_SEC from the request: each backend call
+  gets the time left when it starts, and calls not done by the deadline
+  are reported as "timeout". Calls that never started are cancelled; ones
+  already running keep going and their result is still cached when it
+  arrives.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models import AlertExplanation
+from app.services.ai_services import get_backend
+from app.services.upserts import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+EXPLAIN_MAX_WORKERS = 8        # concurrent backend calls per process
+EXPLAIN_TIMEOUT_SEC = 20       # per explain_many() call, all backend calls included
+EXPLAIN_BATCH_LIMIT = 500      # alerts per batch request
+IN_CLAUSE_CHUNK = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPLAIN_MAX_WORKERS, thread_name_prefix="explain")
+        return _executor
+
+
+# ----------------------------
+# Cache
+# ----------------------------
+def alert_content(alert) -> dict:
+    """
+    The fields an explanation depends on, from an Alert row or dict.
+    """
+    get = alert.get if isinstance(alert, dict) else lambda k, d=None: getattr(alert, k, d)
+    return {
+        "transaction_id": get("transaction_id"),
+        "rule_triggered": get("rule_triggered"),
+        "severity": get("severity"),
+        "reason": get("reason") or "No reason provided",
+    }
+
+
+def content_key(content: dict, backend_name: str) -> str:
+    raw = json.dumps([backend_name, content], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cached_explanations(db: Session, keys) -> dict:
+    """
+    content_hash -> explanation for the keys already cached.
+    """
+    keys = list(keys)
+    found = {}
+    for i in range(0, len(keys), IN_CLAUSE_CHUNK):
+        rows = db.query(AlertExplanation.content_hash, AlertExplanation.explanation).filter(
+            AlertExplanation.content_hash.in_(keys[i:i + IN_CLAUSE_CHUNK])
+        )
+        found.update((k, e) for k, e in rows)
+    return found
+
+
+def store_explanations(db: Session, backend_name: str, explanations: dict, overwrite: bool = False) -> None:
+    """
+    Inserts content_hash -> explanation rows. Rows already stored (e.g. by a
+    concurrent request) are kept unless overwrite is set. Commits.
+    """
+    if not explanations:
+        return
+    stmt = dialect_insert(db, AlertExplanation.__table__)
+    if overwrite:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AlertExplanation.content_hash],
+            set_={"explanation": stmt.excluded.explanation, "created_at": stmt.excluded.created_at},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[AlertExplanation.content_hash])
+    db.execute(stmt, [
+        {"content_hash": k, "backend": backend_name, "explanation": e, "created_at": datetime.utcnow()}
+        for k, e in explanations.items()
+    ])
+    db.commit()
+
+
+def _store_late(backend_name: str, key: str, future) -> None:
+    """
+    Done-callback for calls that timed out: caches the result in its own session.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    db = SessionLocal()
+    try:
+        store_explanations(db, backend_name, {key: future.result()})
+    except Exception:
+        logger.exception("Could not cache late explanation %s", key)
+    finally:
+        db.close()
+
+
+# ----------------------------
+# Explaining
+# ----------------------------
+def explain_many(db: Session, alerts, timeout: float = EXPLAIN_TIMEOUT_SEC,
+                 refresh: bool = False, backend=None) -> list[dict]:
+    """
+    Explains alerts, using the cache and the bounded pool for misses.
+
+    Args:
+        db (Session): DB session
+        alerts (list): Alert rows or alert dicts
+        timeout (float): seconds for the whole call, counted from now
+        refresh (bool): ignore cached explanations, ask the backend again
+            and overwrite them
+        backend (ExplanationBackend): defaults to ai_services.get_backend()
+
+    Returns:
+        list[dict]: per alert, in input order:
+            {"status": "cached" | "ok" | "timeout" | "error", "explanation": str | None}
+    """
+    backend = backend or get_backend()
+    contents = [alert_content(a) for a in alerts]
+    keys = [content_key(c, backend.name) for c in contents]
+
+    found = {} if refresh else cached_explanations(db, set(keys))
+    results = {k: {"status": "cached", "explanation": e} for k, e in found.items()}
+
+    # One backend call per distinct missing content
+    misses = {}
+    for key, content in zip(keys, contents):
+        if key not in found:
+            misses.setdefault(key, content)
+
+    deadline = time.monotonic() + timeout
+
+    def run(content):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("request deadline passed before the call started")
+        return backend.explain(content, timeout=remaining)
+
+    pool = _pool()
+    pending = {pool.submit(run, c): k for k, c in misses.items()}
+    fresh = {}
+
+    while pending:
+        remaining = max(deadline - time.monotonic(), 0)
+        done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = pending.pop(future)
+            if future.exception() is not None:
+                logger.warning("Explanation backend failed: %s", future.exception())
+                results[key] = {"status": "error", "explanation": None}
+            else:
+                fresh[key] = future.result()
+                results[key] = {"status": "ok", "explanation": fresh[key]}
+
+        if pending and time.monotonic() >= deadline:
+            for future, key in pending.items():
+                results[key] = {"status": "timeout", "explanation": None}
+                if not future.cancel():
+                    future.add_done_callback(lambda f, k=key: _store_late(backend.name, k, f))
+            pending = {}
+
+    store_explanations(db, backend.name, fresh, overwrite=refresh)
+
+    return [dict(results[k]) for k in keys]
+
+
+def explain_cached(db: Session, alert, timeout: float = EXPLAIN_TIMEOUT_SEC, refresh: bool = False) -> dict:
+    """
+    Single-alert form of explain_many().
+    """
+    return explain_many(db, [alert], timeout=timeout, refresh=refresh)[0]
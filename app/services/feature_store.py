@@ -0,0 +1,277 @@
+"""
+feature_store.py
+
+Bounded, in-memory per-account features for the rule engine.
+
+Instead of pulling an account's full transaction history on every ingest,
+the pipeline keeps a small sliding window of features per sender:
+- last-N transaction timestamps (rapid transactions)
+- rolling count / sum of small transfers per counterparty (smurfing)
+- total transaction count and first-seen time (mule / new accounts)
+
+Entries live in an LRU map and are rebuilt from the transactions table
+with a few grouped queries when they are missing or evicted. History
+moved to cold storage is added back from archived_pair_totals.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import ArchivedPairTotals, Transaction
+from app.models.transaction import STATUS_PROCESSED, UNPROCESSED_STATUSES
+from app.services import rule_engine
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+FEATURE_WINDOW_SIZE = 20               # timestamps kept per account
+FEATURE_STORE_MAX_ACCOUNTS = 100_000   # LRU capacity
+REBUILD_CHUNK = 500                    # accounts per rebuild query
+
+
+class AccountFeatures:
+    """
+    Sliding-window features of one sending account.
+    """
+
+    __slots__ = ("recent_times", "tx_count", "first_seen", "small_counts", "small_sums")
+
+    def __init__(self, window: int = FEATURE_WINDOW_SIZE):
+        self.recent_times = deque(maxlen=window)
+        self.tx_count = 0
+        self.first_seen = None
+        self.small_counts = {}
+        self.small_sums = {}
+
+    def observe(self, to_account: str, amount: float, timestamp) -> None:
+        """
+        Applies one outgoing transaction to the features.
+        """
+        self.recent_times.append(timestamp)
+        self.tx_count += 1
+        if self.first_seen is None or timestamp < self.first_seen:
+            self.first_seen = timestamp
+
+        if amount <= rule_engine.SMURF_TXN_AMOUNT:
+            self.small_counts[to_account] = self.small_counts.get(to_account, 0) + 1
+            self.small_sums[to_account] = self.small_sums.get(to_account, 0.0) + amount
+
+    def unobserve(self, to_account: str, amount: float, timestamp, evicted=None, first_seen=None) -> None:
+        """
+        Takes back one observe(). `evicted` is the timestamp it pushed out of
+        recent_times and `first_seen` the value before it, if any.
+        """
+        times = self.recent_times
+        for i in range(len(times) - 1, -1, -1):
+            if times[i] == timestamp:
+                del times[i]
+                if evicted is not None:
+                    times.appendleft(evicted)
+                break
+        self.tx_count = max(self.tx_count - 1, 0)
+        if self.first_seen == timestamp:
+            self.first_seen = first_seen if self.tx_count else None
+
+        if amount <= rule_engine.SMURF_TXN_AMOUNT and to_account in self.small_counts:
+            self.small_counts[to_account] -= 1
+            self.small_sums[to_account] -= amount
+            if not self.small_counts[to_account]:
+                del self.small_counts[to_account]
+                del self.small_sums[to_account]
+
+    def small_count(self, counterparty: str) -> int:
+        return self.small_counts.get(counterparty, 0)
+
+    def small_sum(self, counterparty: str) -> float:
+        return self.small_sums.get(counterparty, 0.0)
+
+
+class FeatureStore:
+    """
+    LRU map of account_id -> AccountFeatures, rebuildable from the DB.
+
+    Callers load features before persisting a transaction and apply it with
+    observe() afterwards, so a rebuild never counts the same row twice.
+    """
+
+    def __init__(self, max_accounts: int = FEATURE_STORE_MAX_ACCOUNTS, window: int = FEATURE_WINDOW_SIZE):
+        self.max_accounts = max_accounts
+        self.window = window
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def get(self, db: Session, account_id: str) -> AccountFeatures:
+        return self.get_many(db, [account_id])[account_id]
+
+    def get_many(self, db: Session, account_ids) -> dict:
+        """
+        Returns account_id -> AccountFeatures, rebuilding misses from the DB.
+        """
+        with self._lock:
+            found = {}
+            missing = []
+            for acc_id in dict.fromkeys(account_ids):
+                features = self._entries.get(acc_id)
+                if features is None:
+                    missing.append(acc_id)
+                else:
+                    self._entries.move_to_end(acc_id)
+                    found[acc_id] = features
+
+            if missing:
+                rebuilt = self.rebuild(db, missing)
+                for acc_id, features in rebuilt.items():
+                    self._put(acc_id, features)
+                found.update(rebuilt)
+
+        return found
+
+    def peek(self, account_id: str):
+        """
+        Cached features without touching the DB or the LRU order.
+        """
+        return self._entries.get(account_id)
+
+    def observe(self, features: AccountFeatures, to_account: str, amount: float, timestamp,
+                journal: list = None) -> AccountFeatures:
+        """
+        Applies one transaction to `features`; with a journal (list) it is
+        logged so revert() can take it back if the transaction rolls back.
+        """
+        with self._lock:
+            if journal is not None:
+                times = features.recent_times
+                evicted = times[0] if len(times) == times.maxlen else None
+                journal.append((features, to_account, amount, timestamp, evicted, features.first_seen))
+            features.observe(to_account, amount, timestamp)
+        return features
+
+    def revert(self, journal: list) -> None:
+        """
+        Undoes the observe() calls logged in `journal`, newest first, and
+        empties it. Features evicted or rebuilt in the meantime are detached
+        from the store, so undoing them there is harmless.
+        """
+        with self._lock:
+            for features, to_account, amount, timestamp, evicted, first_seen in reversed(journal):
+                features.unobserve(to_account, amount, timestamp, evicted, first_seen)
+            journal.clear()
+
+    def put(self, account_id: str, features: AccountFeatures) -> None:
+        with self._lock:
+            self._put(account_id, features)
+
+    def invalidate(self, account_ids=None) -> None:
+        """
+        Drops the given accounts (or everything) so they are rebuilt on next use.
+        """
+        with self._lock:
+            if account_ids is None:
+                self._entries.clear()
+                return
+            for acc_id in account_ids:
+                self._entries.pop(acc_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, account_id, features) -> None:
+        self._entries[account_id] = features
+        self._entries.move_to_end(account_id)
+        while len(self._entries) > self.max_accounts:
+            self._entries.popitem(last=False)
+
+    # ----------------------------
+    # Rebuild from DB
+    # ----------------------------
+    def rebuild(self, db: Session, account_ids) -> dict:
+        """
+        Builds features for the given senders from the transactions table
+        with grouped queries (no per-row ORM objects). Rows still waiting
+        in the queue are skipped; the worker observes them when processed.
+        Archived rows count through archived_pair_totals (they are all
+        older than the hot tier, so recent_times never needs them).
+        """
+        result = {acc_id: AccountFeatures(self.window) for acc_id in account_ids}
+        processed = func.coalesce(Transaction.status, STATUS_PROCESSED).notin_(UNPROCESSED_STATUSES)
+
+        for i in range(0, len(account_ids), REBUILD_CHUNK):
+            chunk = account_ids[i:i + REBUILD_CHUNK]
+
+            # Totals + first seen
+            totals = db.query(
+                Transaction.from_account,
+                func.count(Transaction.id),
+                func.min(Transaction.timestamp),
+            ).filter(
+                Transaction.from_account.in_(chunk), processed
+            ).group_by(Transaction.from_account)
+
+            for acc_id, count, first_seen in totals:
+                result[acc_id].tx_count = count
+                result[acc_id].first_seen = first_seen
+
+            # Last-N timestamps per account
+            rn = func.row_number().over(
+                partition_by=Transaction.from_account,
+                order_by=Transaction.timestamp.desc(),
+            ).label("rn")
+            recent = db.query(
+                Transaction.from_account, Transaction.timestamp, rn
+            ).filter(
+                Transaction.from_account.in_(chunk), processed
+            ).subquery()
+
+            rows = db.query(recent.c.from_account, recent.c.timestamp).filter(
+                recent.c.rn <= self.window
+            ).order_by(recent.c.from_account, recent.c.timestamp.asc())
+
+            for acc_id, timestamp in rows:
+                result[acc_id].recent_times.append(timestamp)
+
+            # Small transfers per counterparty
+            small = db.query(
+                Transaction.from_account,
+                Transaction.to_account,
+                func.count(Transaction.id),
+                func.sum(Transaction.amount),
+            ).filter(
+                Transaction.from_account.in_(chunk),
+                Transaction.amount <= rule_engine.SMURF_TXN_AMOUNT,
+                processed,
+            ).group_by(Transaction.from_account, Transaction.to_account)
+
+            for acc_id, to_account, count, total in small:
+                result[acc_id].small_counts[to_account] = count
+                result[acc_id].small_sums[to_account] = total or 0.0
+
+            # Archived history (see cold_storage)
+            archived = db.query(
+                ArchivedPairTotals.from_account,
+                ArchivedPairTotals.to_account,
+                ArchivedPairTotals.tx_count,
+                ArchivedPairTotals.first_seen,
+                ArchivedPairTotals.small_count,
+                ArchivedPairTotals.small_sum,
+            ).filter(ArchivedPairTotals.from_account.in_(chunk))
+
+            for acc_id, to_account, count, first_seen, small_count, small_sum in archived:
+                features = result[acc_id]
+                features.tx_count += count
+                if first_seen is not None and (features.first_seen is None or first_seen < features.first_seen):
+                    features.first_seen = first_seen
+                if small_count:
+                    features.small_counts[to_account] = features.small_counts.get(to_account, 0) + small_count
+                    features.small_sums[to_account] = features.small_sums.get(to_account, 0.0) + small_sum
+
+        return result
+
+
+# Shared store used by the ingest pipeline
+feature_store = FeatureStore()
@@ -5,6 +5,31 @@ Contains logic to analyze relationships between accounts
 and detect suspicious money flow patterns like loops.
 """
 
+import logging
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from datetime import timedelta
+from itertools import chain
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+TRANSFER_WINDOW_SEC = 24 * 3600   # how long recent transfers stay indexed
+EDGE_HISTORY_SIZE = 8             # recent transfers remembered per edge
+EDGE_HISTORY_MIN_AMOUNT = 10_000  # smaller transfers are not kept for path searches
+SWEEP_EVERY = 50_000              # transfers recorded between expiry sweeps
+COMPACT_MIN_DELTA = 50_000        # buffered new edges before a compaction is considered
+COMPACT_DELTA_RATIO = 0.125       # ... and only once they exceed this share of compacted edges
+COMPACT_LOCKED_REPLAY = 1_000     # late changes left to replay while holding the lock
+LOOP_MAX_STEPS = 20_000           # edges inspected per closes_loop() search
+
 
 def build_graph(links: list[tuple[str, str]]) -> dict:
     """
@@ -27,7 +52,10 @@ def build_graph(links: list[tuple[str, str]]) -> dict:
 
 def detect_cycle(graph: dict, start: str, visited=None, path=None) -> bool:
     """
-    DFS to detect if there is a cycle starting from an account.
+    DFS to detect if there is a cycle reachable from an account.
+
+    Uses an explicit stack instead of recursion, so long chains cannot
+    hit Python's recursion limit.
     """
     if visited is None:
         visited = set()
@@ -36,26 +64,876 @@ def detect_cycle(graph: dict, start: str, visited=None, path=None) -> bool:
 
     visited.add(start)
     path.add(start)
+    stack = [(start, iter(graph.get(start, [])))]
 
-    for neighbor in graph.get(start, []):
-        if neighbor not in visited:
-            if detect_cycle(graph, neighbor, visited, path):
+    while stack:
+        node, neighbors = stack[-1]
+        for neighbor in neighbors:
+            if neighbor not in visited:
+                visited.add(neighbor)
+                path.add(neighbor)
+                stack.append((neighbor, iter(graph.get(neighbor, []))))
+                break
+            if neighbor in path:
                 return True
-        elif neighbor in path:
-            return True
+        else:
+            stack.pop()
+            path.discard(node)
 
-    path.remove(start)
     return False
 
 
 def check_money_loop(links: list[tuple[str, str]]) -> bool:
     """
     Main function to check if any cycle exists in account graph.
+
+    Graph-wide yes / no only: once any loop exists it stays True. The
+    ingest path asks LinkGraph.closes_loop about the new edge instead, and
+    graph_analytics reports which accounts form loops (strongly connected
+    components).
     """
     graph = build_graph(links)
 
+    # Nodes already explored cannot start a new cycle, so share `visited`
+    visited = set()
     for node in graph:
-        if detect_cycle(graph, node):
+        if node not in visited and detect_cycle(graph, node, visited):
+            return True
+
+    return False
+
+
+class CounterpartyWindow:
+    """
+    Distinct counterparties of one account over a sliding time window.
+
+    Events are appended in time order and expired from the left, so both
+    record() and distinct() are amortised O(1) however busy the account is.
+    """
+
+    __slots__ = ("events", "counts")
+
+    def __init__(self):
+        self.events = deque()     # (timestamp, counterparty)
+        self.counts = Counter()   # counterparty -> events in window
+
+    def record(self, counterparty: str, timestamp) -> bool:
+        """
+        Adds one transfer. Returns True if the counterparty is new to the window.
+        """
+        self.events.append((timestamp, counterparty))
+        self.counts[counterparty] += 1
+        return self.counts[counterparty] == 1
+
+    def unrecord(self, counterparty: str, timestamp) -> None:
+        """
+        Removes one transfer added by record() (no-op if it already expired).
+        """
+        events = self.events
+        for i in range(len(events) - 1, -1, -1):
+            if events[i] == (timestamp, counterparty):
+                del events[i]
+                self.counts[counterparty] -= 1
+                if not self.counts[counterparty]:
+                    del self.counts[counterparty]
+                return
+
+    def expire(self, since) -> None:
+        events, counts = self.events, self.counts
+        while events and events[0][0] < since:
+            _, counterparty = events.popleft()
+            counts[counterparty] -= 1
+            if not counts[counterparty]:
+                del counts[counterparty]
+
+    def distinct(self) -> int:
+        return len(self.counts)
+
+
+# -----------------------------------------------------
+# Compact adjacency (CSR + delta buffer)
+# -----------------------------------------------------
+class CompactAdjacency:
+    """
+    Directed graph over interned account ids, stored column-wise.
+
+    Account ids are interned to dense ints. Compacted edges live in CSR
+    arrays: the targets of node i are targets[offsets[i]:offsets[i + 1]],
+    sorted, with the link strengths at the same positions in `strengths`.
+    That is 8 bytes per edge (int32 target + uint32 strength) instead of a
+    set entry and a string reference, and a node's row is one contiguous
+    slice for traversals.
+
+    Edges added after the last compaction go to a small delta buffer
+    (node -> {target: strength}). remove_edge() takes strength back off
+    (undoing add_edge() of a rolled back transaction); a compacted edge
+    whose strength drops to 0 stays in the arrays as a dead edge that
+    reads skip. Neither add_edge() nor remove_edge() compacts: once
+    buffered plus dead edges exceed max(COMPACT_MIN_DELTA,
+    COMPACT_DELTA_RATIO x compacted edges), needs_compaction turns True
+    and the owner merges them, either with compact() or off the request
+    path (see "Background compaction" below).
+
+    Not thread-safe on its own; LinkGraph serialises access.
+    """
+
+    __slots__ = ("_ids", "_names", "_offsets", "_targets", "_strengths",
+                 "_delta", "_delta_edges", "_zeroed", "_dead_edges", "_shared", "_changes",
+                 "compactions", "min_delta", "delta_ratio")
+
+    def __init__(self, min_delta: int = COMPACT_MIN_DELTA, delta_ratio: float = COMPACT_DELTA_RATIO):
+        self.min_delta = min_delta
+        self.delta_ratio = delta_ratio
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._offsets = array("q", [0])   # len = compacted nodes + 1
+        self._targets = array("i")
+        self._strengths = array("I")
+        self._delta: dict[int, dict[int, int]] = {}
+        self._delta_edges = 0
+        self._zeroed: set[int] = set()    # nodes with a dead (0-strength) CSR edge
+        self._dead_edges = 0
+        self._shared: set[int] = set()    # delta rows also held by a compaction snapshot
+        self._changes = None              # (source, target, strength change) during a background compaction
+        self.compactions = 0
+
+    # ----------------------------
+    # Interning
+    # ----------------------------
+    def intern(self, account_id: str) -> int:
+        node = self._ids.get(account_id)
+        if node is None:
+            node = self._ids[account_id] = len(self._names)
+            self._names.append(account_id)
+        return node
+
+    def id_of(self, account_id: str):
+        """Interned id of an account, or None if it has no edges."""
+        return self._ids.get(account_id)
+
+    def name_of(self, node: int) -> str:
+        return self._names[node]
+
+    # ----------------------------
+    # Building
+    # ----------------------------
+    @classmethod
+    def from_links(cls, links, **kwargs) -> "CompactAdjacency":
+        """
+        Builds the arrays from (a, b) or (a, b, strength) tuples; repeated
+        pairs have their strengths added.
+        """
+        graph = cls(**kwargs)
+        ids, names = graph._ids, graph._names
+
+        # One packed (source << 32 | target) key per link, sorted once
+        keys, strengths = array("q"), array("I")
+        for link in links:
+            source = ids.get(link[0])
+            if source is None:
+                source = ids[link[0]] = len(names)
+                names.append(link[0])
+            target = ids.get(link[1])
+            if target is None:
+                target = ids[link[1]] = len(names)
+                names.append(link[1])
+            keys.append(source << 32 | target)
+            strengths.append(link[2] if len(link) > 2 and link[2] else 1)
+
+        # Sort and merge repeated pairs in NumPy, without a Python object per link
+        key_array = np.frombuffer(keys, dtype=np.int64) if keys else np.zeros(0, dtype=np.int64)
+        order = np.argsort(key_array, kind="stable")
+        sorted_keys = key_array[order]
+        first = np.ones(len(sorted_keys), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        starts = np.flatnonzero(first)
+        unique_keys = sorted_keys[starts]
+        merged = (
+            np.add.reduceat(np.frombuffer(strengths, dtype=np.uint32)[order].astype(np.uint64), starts)
+            if len(starts) else np.zeros(0, dtype=np.uint64)
+        )
+
+        sources = unique_keys >> 32
+        offsets = np.searchsorted(sources, np.arange(len(names) + 1), side="left")
+        graph._offsets = array("q", offsets.astype(np.int64).tobytes())
+        graph._targets = array("i", (unique_keys & 0xFFFFFFFF).astype(np.int32).tobytes())
+        graph._strengths = array("I", merged.astype(np.uint32).tobytes())
+        return graph
+
+    def add_edge(self, a: str, b: str, strength: int = 1) -> bool:
+        """
+        Adds `strength` to the edge a -> b. Returns True if the edge is new.
+        """
+        source, target = self.intern(a), self.intern(b)
+        if self._changes is not None:
+            self._changes.append((source, target, strength))
+        return self._add(source, target, strength)
+
+    def _add(self, source: int, target: int, strength: int) -> bool:
+        position = self._find(source, target)
+        if position is not None:
+            revived = not self._strengths[position]
+            if revived:
+                self._dead_edges -= 1
+            self._strengths[position] += strength
+            return revived
+
+        row = self._delta_row(source)
+        new = target not in row
+        row[target] = row.get(target, 0) + strength
+        if new:
+            self._delta_edges += 1
+        return new
+
+    def remove_edge(self, a: str, b: str, strength: int = 1) -> None:
+        """
+        Takes `strength` off the edge a -> b, dropping the edge at 0.
+        """
+        source, target = self._ids.get(a), self._ids.get(b)
+        if source is None or target is None:
+            return
+        if self._remove(source, target, strength) and self._changes is not None:
+            self._changes.append((source, target, -strength))
+
+    def _remove(self, source: int, target: int, strength: int) -> bool:
+        row = self._delta.get(source)
+        if row is not None and target in row:
+            row = self._delta_row(source)
+            if row[target] > strength:
+                row[target] -= strength
+                return True
+            del row[target]
+            self._delta_edges -= 1
+            if not row:
+                del self._delta[source]
+            return True
+
+        position = self._find(source, target)
+        if position is None or not self._strengths[position]:
+            return False
+        if self._strengths[position] > strength:
+            self._strengths[position] -= strength
+            return True
+        # The edge was compacted since it was added: leave it dead until the next compaction
+        self._strengths[position] = 0
+        self._zeroed.add(source)
+        self._dead_edges += 1
+        return True
+
+    def _delta_row(self, source: int) -> dict:
+        """Delta row of a node for writing (copied first if a snapshot holds it)."""
+        row = self._delta.get(source)
+        if row is None:
+            row = self._delta[source] = {}
+        elif source in self._shared:
+            row = self._delta[source] = dict(row)
+            self._shared.discard(source)
+        return row
+
+    @property
+    def needs_compaction(self) -> bool:
+        """True once buffered + dead edges are worth a compaction."""
+        pending = self._delta_edges + self._dead_edges
+        return pending > 0 and pending >= max(self.min_delta, self.delta_ratio * len(self._targets))
+
+    def compact(self) -> None:
+        """
+        Merges the delta buffer into new CSR arrays and drops dead edges,
+        in the calling thread.
+        """
+        if not self._delta_edges and not self._zeroed:
+            return
+        self._install(self.build_compaction(self._snapshot()))
+
+    # ----------------------------
+    # Background compaction
+    # ----------------------------
+    # begin_compaction() and finish_compaction() run under the owner's
+    # lock and cost O(buffered rows) / O(late changes); the O(E) rebuild
+    # and most of the replay run without it:
+    #
+    #   snapshot = adjacency.begin_compaction()            # locked
+    #   staged = adjacency.build_compaction(snapshot)      # unlocked
+    #   staged.replay(adjacency.take_changes())            # take locked, replay unlocked
+    #   adjacency.finish_compaction(staged)                # locked
+    def _snapshot(self) -> tuple:
+        # offsets / targets are only ever replaced, never written in place
+        return (
+            len(self._names), self._offsets, self._targets, self._strengths,
+            self._delta, set(self._zeroed),
+        )
+
+    def begin_compaction(self) -> tuple:
+        """
+        Snapshot to pass to build_compaction(). Changes made from now on
+        are logged for replay until finish_compaction().
+        """
+        node_count, offsets, targets, strengths, delta, zeroed = self._snapshot()
+        # Strengths are updated in place: copy them. Delta rows are shared
+        # with the snapshot and copied by the first write to them instead.
+        self._shared = set(delta)
+        self._changes = []
+        return node_count, offsets, targets, strengths[:], dict(delta), zeroed
+
+    def build_compaction(self, snapshot: tuple) -> "CompactAdjacency":
+        """
+        New adjacency holding the snapshot compacted (sharing this one's
+        interning). Only reads the snapshot, so it runs without the lock.
+        """
+        node_count, old_offsets, old_targets, old_strengths, delta, zeroed = snapshot
+        offsets = array("q", [0])
+        targets, strengths = array("i"), array("I")
+        compacted = len(old_offsets) - 1
+
+        for node in range(node_count):
+            if node < compacted:
+                lo, hi = old_offsets[node], old_offsets[node + 1]
+            else:
+                lo = hi = 0
+            row_delta = delta.get(node)
+            if row_delta is None and node not in zeroed:
+                targets.extend(old_targets[lo:hi])
+                strengths.extend(old_strengths[lo:hi])
+            else:
+                row = dict(zip(old_targets[lo:hi], old_strengths[lo:hi]))
+                for target, strength in (row_delta or {}).items():
+                    row[target] = row.get(target, 0) + strength
+                _append_row(targets, strengths, row)
+            offsets.append(len(targets))
+
+        staged = CompactAdjacency(self.min_delta, self.delta_ratio)
+        staged._ids, staged._names = self._ids, self._names
+        staged._offsets, staged._targets, staged._strengths = offsets, targets, strengths
+        return staged
+
+    def take_changes(self) -> list:
+        """
+        Changes logged since begin_compaction() or the last call, for
+        replay() on the staged adjacency.
+        """
+        changes, self._changes = self._changes or [], []
+        return changes
+
+    def replay(self, changes) -> None:
+        for source, target, strength in changes:
+            if strength > 0:
+                self._add(source, target, strength)
+            else:
+                self._remove(source, target, -strength)
+
+    def finish_compaction(self, staged: "CompactAdjacency") -> None:
+        """
+        Replays the remaining changes onto `staged` and swaps its arrays in.
+        """
+        staged.replay(self._changes or [])
+        self._changes = None
+        self._offsets, self._targets, self._strengths = staged._offsets, staged._targets, staged._strengths
+        self._delta, self._delta_edges = staged._delta, staged._delta_edges
+        self._zeroed, self._dead_edges = staged._zeroed, staged._dead_edges
+        self._shared = set()
+        self.compactions += 1
+
+    def abort_compaction(self) -> None:
+        """Stops logging changes for a compaction that will not finish."""
+        self._changes = None
+
+    def _install(self, staged: "CompactAdjacency") -> None:
+        # Synchronous compact(): a background compaction still running
+        # replays its own log, so its result stays correct
+        self._offsets, self._targets, self._strengths = staged._offsets, staged._targets, staged._strengths
+        self._delta, self._delta_edges = {}, 0
+        self._zeroed, self._dead_edges = set(), 0
+        self._shared = set()
+        self.compactions += 1
+
+    # ----------------------------
+    # Reads
+    # ----------------------------
+    def _row(self, node: int, compacted: int = None) -> tuple[int, int]:
+        if node >= (len(self._offsets) - 1 if compacted is None else compacted):
+            return 0, 0
+        return self._offsets[node], self._offsets[node + 1]
+
+    def _find(self, source: int, target: int):
+        """Position of source -> target in the CSR arrays, or None."""
+        lo, hi = self._row(source)
+        position = bisect_left(self._targets, target, lo, hi)
+        if position < hi and self._targets[position] == target:
+            return position
+        return None
+
+    def successors(self, node: int):
+        """Interned targets of a node (compacted, then buffered)."""
+        delta = self._delta.get(node)
+        offsets = self._offsets
+        if node >= len(offsets) - 1 or offsets[node] == offsets[node + 1]:
+            return delta or ()
+        lo, hi = offsets[node], offsets[node + 1]
+        row = self._targets[lo:hi]
+        if node in self._zeroed:
+            row = [target for target, strength in zip(row, self._strengths[lo:hi]) if strength]
+        return row if delta is None else chain(row, delta)
+
+    def has_edge(self, a: str, b: str) -> bool:
+        source, target = self._ids.get(a), self._ids.get(b)
+        if source is None or target is None:
+            return False
+        position = self._find(source, target)
+        if position is not None and self._strengths[position]:
             return True
+        return target in self._delta.get(source, ())
+
+    def neighbors(self, account_id: str) -> list[str]:
+        node = self._ids.get(account_id)
+        if node is None:
+            return []
+        names = self._names
+        return [names[target] for target in self.successors(node)]
+
+    def strength(self, a: str, b: str) -> int:
+        """Link strength of a -> b (0 if there is no such edge)."""
+        source, target = self._ids.get(a), self._ids.get(b)
+        if source is None or target is None:
+            return 0
+        position = self._find(source, target)
+        strength = self._strengths[position] if position is not None else 0
+        return strength + self._delta.get(source, {}).get(target, 0)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._names)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._targets) - self._dead_edges + self._delta_edges
+
+    def memory_usage(self) -> dict:
+        """
+        Approximate bytes held, by structure. Interned names are counted
+        once (shared with the rest of the process where they are the same
+        str objects).
+        """
+        arrays = sum(a.itemsize * len(a) for a in (self._offsets, self._targets, self._strengths))
+        interning = (
+            sys.getsizeof(self._ids) + sys.getsizeof(self._names)
+            + sum(sys.getsizeof(name) for name in self._names)
+        )
+        delta = sys.getsizeof(self._delta) + sum(sys.getsizeof(row) for row in self._delta.values())
+        return {
+            "nodes": self.node_count,
+            "edges": self.edge_count,
+            "compacted_edges": len(self._targets),
+            "delta_edges": self._delta_edges,
+            "dead_edges": self._dead_edges,
+            "compactions": self.compactions,
+            "csr_bytes": arrays,
+            "intern_bytes": interning,
+            "delta_bytes": delta,
+            "total_bytes": arrays + interning + delta,
+        }
+
+
+def _append_row(targets: array, strengths: array, row: dict) -> None:
+    """Appends one node's {target: strength} to CSR arrays, sorted by target."""
+    for target in sorted(row):
+        if not row[target]:
+            continue
+        targets.append(target)
+        strengths.append(row[target])
+
+
+# -----------------------------------------------------
+# Incremental link graph (process-resident)
+# -----------------------------------------------------
+class LinkGraph:
+    """
+    In-memory adjacency index over account_links.
+
+    Warm-loaded once from the database, then kept up to date by the
+    ingest pipeline as new edges are committed. Loop checks only explore
+    what a new edge (from_account -> to_account) can close, so their cost
+    depends on the neighbourhood of that edge and not on total graph size.
+
+    Alongside the structural edges the index keeps the transfers of the
+    last TRANSFER_WINDOW_SEC for the time-constrained searches in
+    layering.py: up to EDGE_HISTORY_SIZE transfers of at least
+    EDGE_HISTORY_MIN_AMOUNT per edge, and distinct-counterparty windows
+    per sender / receiver (all amounts).
+
+    The structural edges are held in a CompactAdjacency (interned ids,
+    CSR arrays, link strengths alongside); memory_usage() reports its size.
+    When it needs a compaction, a background thread builds the new arrays
+    from a snapshot without the lock and only takes it to swap them in.
+
+    The index is per process: every API/worker process warm-loads its own copy.
+    """
+
+    def __init__(self, window_sec: int = TRANSFER_WINDOW_SEC, edge_history: int = EDGE_HISTORY_SIZE,
+                 min_amount: float = EDGE_HISTORY_MIN_AMOUNT):
+        self.window = timedelta(seconds=window_sec)
+        self.edge_history = edge_history
+        self.min_amount = min_amount
+        self._adjacency = CompactAdjacency()
+        self._transfers: dict[str, dict[str, deque]] = {}
+        self._out_windows: dict[str, CounterpartyWindow] = {}
+        self._in_windows: dict[str, CounterpartyWindow] = {}
+        self._clock = None
+        self._since_sweep = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._compactor = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Held by searches that walk the index across several calls."""
+        return self._lock
+
+    def _reset(self) -> None:
+        self._adjacency = CompactAdjacency()
+        self._transfers = {}
+        self._out_windows = {}
+        self._in_windows = {}
+        self._clock = None
+        self._since_sweep = 0
+
+    def load(self, links, transfers=()) -> None:
+        """
+        Replaces the index with the given (account_a, account_b) or
+        (account_a, account_b, link_strength) links and recent
+        (from_account, to_account, timestamp, amount) transfers, the latter
+        in timestamp order.
+        """
+        adjacency = CompactAdjacency.from_links(links)
+
+        with self._lock:
+            self._reset()
+            self._adjacency = adjacency
+            for a, b, timestamp, amount in transfers:
+                self.record_transfer(a, b, timestamp, amount)
+            self._loaded = True
+
+    def load_from_db(self, db) -> None:
+        """
+        Warm-loads the index from the account_links table and the
+        transactions of the last transfer window.
+        """
+        from sqlalchemy import func
+
+        from app.models import AccountLink, Transaction
+        from app.models.transaction import STATUS_PROCESSED, UNPROCESSED_STATUSES
+
+        links = db.query(
+            AccountLink.account_a, AccountLink.account_b, AccountLink.link_strength
+        ).yield_per(10000)
+
+        latest = db.query(func.max(Transaction.timestamp)).scalar()
+        transfers = ()
+        if latest is not None:
+            transfers = (
+                db.query(
+                    Transaction.from_account,
+                    Transaction.to_account,
+                    Transaction.timestamp,
+                    Transaction.amount,
+                )
+                .filter(Transaction.timestamp >= latest - self.window)
+                .filter(func.coalesce(Transaction.status, STATUS_PROCESSED).notin_(UNPROCESSED_STATUSES))
+                .order_by(Transaction.timestamp.asc())
+                .yield_per(10000)
+            )
+
+        self.load((tuple(row) for row in links), (tuple(row) for row in transfers))
+
+    def ensure_loaded(self, db) -> None:
+        """
+        Loads the index on first use in this process.
+        """
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self.load_from_db(db)
+
+    def invalidate(self) -> None:
+        """
+        Drops the index so the next ensure_loaded() reloads it from the DB.
+        """
+        with self._lock:
+            self._reset()
+            self._loaded = False
+
+    def add_edge(self, a: str, b: str, timestamp=None, amount: float = None, journal: list = None):
+        """
+        Adds the edge a -> b. With a timestamp and amount the transfer is
+        also recorded for time-constrained searches, and the result of
+        record_transfer() is returned.
+
+        With a journal (list) the changes are appended to it so revert()
+        can take exactly them back if the transaction is rolled back.
+        """
+        with self._lock:
+            self._adjacency.add_edge(a, b)
+            self._maybe_compact()
+            if journal is not None:
+                journal.append((a, b, None, None, None))
+            if timestamp is not None and amount is not None:
+                return self.record_transfer(a, b, timestamp, amount, journal)
+        return None
+
+    def revert(self, journal: list) -> None:
+        """
+        Undoes the add_edge() / record_transfer() calls logged in `journal`,
+        newest first, leaving changes made by other units of work in place,
+        and empties the journal. The clock is not moved back.
+        """
+        with self._lock:
+            for a, b, timestamp, amount, evicted in reversed(journal):
+                if timestamp is None:
+                    self._adjacency.remove_edge(a, b)
+                else:
+                    self._unrecord_transfer(a, b, timestamp, amount, evicted)
+            journal.clear()
+            self._maybe_compact()
+
+    def has_edge(self, a: str, b: str) -> bool:
+        with self._lock:
+            return self._adjacency.has_edge(a, b)
+
+    def neighbors(self, account_id: str) -> list[str]:
+        with self._lock:
+            return self._adjacency.neighbors(account_id)
+
+    def link_strength(self, a: str, b: str) -> int:
+        with self._lock:
+            return self._adjacency.strength(a, b)
+
+    def compact(self) -> None:
+        """Merges buffered new edges into the CSR arrays now."""
+        with self._lock:
+            self._adjacency.compact()
+
+    def _maybe_compact(self) -> None:
+        """
+        Starts a background compaction when one is due (call under the lock).
+        """
+        if not self._adjacency.needs_compaction:
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(
+            target=self._compact_in_background, args=(self._adjacency,),
+            name="link-graph-compact", daemon=True,
+        )
+        self._compactor.start()
+
+    def _compact_in_background(self, adjacency: CompactAdjacency) -> None:
+        try:
+            with self._lock:
+                snapshot = adjacency.begin_compaction()
+            # The O(E) rebuild runs without the lock ...
+            staged = adjacency.build_compaction(snapshot)
+            # ... and so does the replay of edges added meanwhile, until few are left
+            for _ in range(4):
+                with self._lock:
+                    changes = adjacency.take_changes()
+                staged.replay(changes)
+                if len(changes) <= COMPACT_LOCKED_REPLAY:
+                    break
+            with self._lock:
+                adjacency.finish_compaction(staged)
+        except Exception:
+            with self._lock:
+                adjacency.abort_compaction()
+            logger.exception("Link graph compaction failed, edges stay buffered")
+
+    def closes_loop(self, from_account: str, to_account: str,
+                    max_depth: int = None, max_steps: int = None) -> bool:
+        """
+        True if the edge from_account -> to_account lies on a cycle of at
+        most max_depth hops back, i.e. from_account is reachable from
+        to_account within max_depth hops.
+
+        Level-by-level BFS like rule_engine.detect_circular_flow, capped by
+        depth and by max_steps inspected edges, so the graph lock is held
+        for a bounded time however dense the neighbourhood is. A search
+        that runs out of steps reports no loop.
+
+        Args:
+            max_depth (int): hops from to_account back to from_account
+                (default rule_engine.CIRCULAR_FLOW_MAX_DEPTH)
+            max_steps (int): edge budget (default LOOP_MAX_STEPS)
+        """
+        if from_account == to_account:
+            return True
+
+        if max_depth is None:
+            from app.services.rule_engine import CIRCULAR_FLOW_MAX_DEPTH
+            max_depth = CIRCULAR_FLOW_MAX_DEPTH
+        steps = LOOP_MAX_STEPS if max_steps is None else max_steps
+
+        with self._lock:
+            adjacency = self._adjacency
+            target, start = adjacency.id_of(from_account), adjacency.id_of(to_account)
+            if target is None or start is None:
+                return False
+
+            seen = {start}
+            frontier = [start]
+            for _ in range(max_depth):
+                next_frontier = []
+                for node in frontier:
+                    for neighbor in adjacency.successors(node):
+                        if neighbor == target:
+                            return True
+                        steps -= 1
+                        if steps <= 0:
+                            return False
+                        if neighbor not in seen:
+                            seen.add(neighbor)
+                            next_frontier.append(neighbor)
+                if not next_frontier:
+                    break
+                frontier = next_frontier
+
+        return False
+
+    # ----------------------------
+    # Recent transfers
+    # ----------------------------
+    def record_transfer(self, a: str, b: str, timestamp, amount: float, journal: list = None) -> dict:
+        """
+        Indexes one transfer a -> b (logged to `journal` if given, see add_edge()).
+
+        Returns:
+            dict: {"new_receiver": bool, "new_sender": bool} - whether b is a
+            new counterparty of a (and a of b) within the window
+        """
+        with self._lock:
+            if self._clock is None or timestamp > self._clock:
+                self._clock = timestamp
+            since = self._clock - self.window
+
+            evicted = None
+            if amount >= self.min_amount:
+                history = self._transfers.setdefault(a, {}).get(b)
+                if history is None:
+                    history = self._transfers[a][b] = deque(maxlen=self.edge_history)
+                if len(history) == history.maxlen:
+                    evicted = history[0]
+                history.append((timestamp, amount))
+            if journal is not None:
+                journal.append((a, b, timestamp, amount, evicted))
+
+            out_window = self._out_windows.setdefault(a, CounterpartyWindow())
+            in_window = self._in_windows.setdefault(b, CounterpartyWindow())
+            out_window.expire(since)
+            in_window.expire(since)
+            result = {
+                "new_receiver": out_window.record(b, timestamp),
+                "new_sender": in_window.record(a, timestamp),
+            }
+
+            self._since_sweep += 1
+            if self._since_sweep >= SWEEP_EVERY:
+                self.sweep()
+
+            return result
+
+    def _unrecord_transfer(self, a: str, b: str, timestamp, amount: float, evicted) -> None:
+        if amount >= self.min_amount:
+            edges = self._transfers.get(a, {})
+            history = edges.get(b)
+            if history is not None:
+                for i in range(len(history) - 1, -1, -1):
+                    if history[i] == (timestamp, amount):
+                        del history[i]
+                        if evicted is not None:
+                            history.appendleft(evicted)
+                        break
+                if not history:
+                    del edges[b]
+                    if not edges:
+                        del self._transfers[a]
+
+        out_window, in_window = self._out_windows.get(a), self._in_windows.get(b)
+        if out_window is not None:
+            out_window.unrecord(b, timestamp)
+        if in_window is not None:
+            in_window.unrecord(a, timestamp)
+
+    def recent_transfers(self, account_id: str) -> dict:
+        """
+        counterparty -> deque of (timestamp, amount) sent by account_id,
+        oldest first, for transfers of at least min_amount. Entries may
+        predate the window; callers filter by time.
+        """
+        return self._transfers.get(account_id, {})
+
+    def fan_out(self, account_id: str) -> int:
+        """Distinct receivers of account_id within the window."""
+        with self._lock:
+            window = self._out_windows.get(account_id)
+            if window is None:
+                return 0
+            window.expire(self._clock - self.window)
+            return window.distinct()
+
+    def fan_in(self, account_id: str) -> int:
+        """Distinct senders to account_id within the window."""
+        with self._lock:
+            window = self._in_windows.get(account_id)
+            if window is None:
+                return 0
+            window.expire(self._clock - self.window)
+            return window.distinct()
+
+    def sweep(self) -> None:
+        """
+        Forgets transfers and windows that fell out of the window, so memory
+        follows recent traffic instead of all-time history.
+        """
+        with self._lock:
+            self._since_sweep = 0
+            if self._clock is None:
+                return
+            since = self._clock - self.window
+
+            for a in list(self._transfers):
+                edges = self._transfers[a]
+                for b in [b for b, h in edges.items() if h[-1][0] < since]:
+                    del edges[b]
+                if not edges:
+                    del self._transfers[a]
+
+            for windows in (self._out_windows, self._in_windows):
+                for account_id in list(windows):
+                    windows[account_id].expire(since)
+                    if not windows[account_id].events:
+                        del windows[account_id]
+
+    def memory_usage(self) -> dict:
+        """
+        Approximate memory of the index: adjacency structures (see
+        CompactAdjacency.memory_usage) and sizes of the transfer index.
+        """
+        with self._lock:
+            usage = self._adjacency.memory_usage()
+            usage.update({
+                "loaded": self._loaded,
+                "transfer_senders": len(self._transfers),
+                "transfer_edges": sum(len(edges) for edges in self._transfers.values()),
+                "out_windows": len(self._out_windows),
+                "in_windows": len(self._in_windows),
+            })
+            return usage
+
+    def __len__(self) -> int:
+        return self._adjacency.edge_count
+
 
-    return False
\ No newline at end of file
+# Shared index used by the ingest pipeline
+link_graph = LinkGraph()
@@ -0,0 +1,164 @@
+"""
+group_commit.py
+
+Group commit for POST /transactions.
+
+With GROUP_COMMIT_ENABLED, request threads do not run the pipeline on
+their own session. They hand the payload to one committer thread and
+block until it is durable: the committer collects every submission that
+arrives within GROUP_COMMIT_WINDOW_MS of the first (at most
+GROUP_COMMIT_MAX_BATCH), runs them through ingest_service.ingest_batch
+as one unit of work and commits once. N concurrent ingests then cost
+one commit (one fsync on SQLite, one round trip on PostgreSQL) instead
+of N, for at most the window of added latency.
+
+A caller only gets its result after the commit that contains its
+transaction, so the API answer still means "stored". A submission that
+times out is withdrawn only while it still waits in the queue; once its
+group is committing, the caller waits for that commit's outcome. If a group fails,
+its members are retried one by one, so one bad payload only fails its
+own request.
+
+Unlike ingest_pipeline (fire-and-forget, polled by tracking id), the
+request keeps its synchronous contract.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.db import SessionLocal
+from app.services.ingest_service import ingest_batch
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))   # wait for more ingests after the first
+GROUP_COMMIT_MAX_BATCH = 500        # submissions per commit
+GROUP_COMMIT_TIMEOUT_SEC = 30       # how long a request waits for its commit
+
+
+class GroupCommitter:
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH,
+                 timeout_sec: float = GROUP_COMMIT_TIMEOUT_SEC, session_factory=SessionLocal):
+        self.window_sec = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout_sec = timeout_sec
+        self.session_factory = session_factory
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.commits = 0
+        self.committed = 0
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Commits what was already submitted, then stops the committer.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ----------------------------
+    # Producer side
+    # ----------------------------
+    def submit(self, payload) -> dict:
+        """
+        Ingests one TransactionCreate payload in the next group commit.
+
+        Returns:
+            dict: the ingest_batch result of the payload, once committed
+
+        Raises:
+            TimeoutError: no group picked the payload up within timeout_sec;
+                it was withdrawn and nothing is stored, so a retry is safe
+            Exception: whatever ingesting this payload alone raised
+        """
+        if not self.running:
+            self.start()
+
+        future = Future()
+        self._queue.put((payload, future))
+        try:
+            return future.result(timeout=self.timeout_sec)
+        except TimeoutError:
+            if future.cancel():
+                raise
+        # Already in a commit that is running: it may still land, so the
+        # caller gets its outcome rather than a retry that would duplicate it
+        return future.result()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    # ----------------------------
+    # Committer
+    # ----------------------------
+    def _next_group(self) -> list:
+        try:
+            group = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.window_sec
+        while len(group) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                group.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _commit(self, db, group) -> None:
+        results = ingest_batch(db, [payload for payload, _ in group], path="group")
+        self.commits += 1
+        self.committed += len(group)
+        for (_, future), result in zip(group, results):
+            future.set_result(result)
+
+    def _run(self) -> None:
+        db = self.session_factory()
+        try:
+            # Keep draining after stop() so no caller is left waiting
+            while not (self._stop.is_set() and self._queue.empty()):
+                group = [item for item in self._next_group() if item[1].set_running_or_notify_cancel()]
+                if not group:
+                    continue
+
+                try:
+                    self._commit(db, group)
+                except Exception:
+                    logger.exception("Group commit of %d failed, retrying individually", len(group))
+                    for item in group:
+                        try:
+                            self._commit(db, [item])
+                        except Exception as e:
+                            item[1].set_exception(e)
+        finally:
+            db.close()
+
+
+# Shared committer used by POST /transactions when GROUP_COMMIT is enabled
+group_committer = GroupCommitter()
@@ -0,0 +1,186 @@
+"""
+ingest_pipeline.py
+
+Bounded in-process pipeline for asynchronous ingestion.
+
+POST /transactions/async only validates the payload and puts it on a
+bounded queue; background threads drain the queue in micro-batches and
+run the full ingest pipeline (persist -> link update -> rules ->
+alerts / risk) through ingest_service.ingest_batch. When the queue is
+full, submit() raises PipelineFull so the API can answer 429 instead of
+piling up work during peaks.
+
+Status of each submission is kept in memory (bounded) and can be polled
+by tracking id. Submissions are not durable: anything still queued when
+the process dies is lost. Use the txn_queue worker for durable queuing.
+"""
+
+import logging
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from app.db import SessionLocal
+from app.services.ingest_service import ingest_batch
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+PIPELINE_QUEUE_SIZE = 10000     # max submissions waiting to be processed
+PIPELINE_WORKERS = 2            # background threads
+PIPELINE_MAX_BATCH = 200        # submissions ingested per unit of work
+STATUS_RETENTION = 100_000      # tracking ids remembered for polling
+
+
+class PipelineFull(Exception):
+    """Raised by submit() when the pipeline queue is at capacity."""
+
+
+class IngestPipeline:
+    def __init__(self, maxsize: int = PIPELINE_QUEUE_SIZE, workers: int = PIPELINE_WORKERS,
+                 max_batch: int = PIPELINE_MAX_BATCH, retention: int = STATUS_RETENTION,
+                 session_factory=SessionLocal):
+        self.max_batch = max_batch
+        self.retention = retention
+        self.session_factory = session_factory
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._statuses: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._workers = workers
+        self._threads: list[threading.Thread] = []
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"ingest-pipeline-{i + 1}", daemon=True)
+                for i in range(self._workers)
+            ]
+            for t in self._threads:
+                t.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops accepting work and waits for the queue to drain.
+        """
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    # ----------------------------
+    # Producer side
+    # ----------------------------
+    def submit(self, payload) -> str:
+        """
+        Enqueues a TransactionCreate payload and returns its tracking id.
+        Raises PipelineFull when the queue is at capacity.
+        """
+        if not self.running:
+            self.start()
+
+        tracking_id = str(uuid.uuid4())
+        self._set_status(tracking_id, {"status": "queued", "submitted_at": datetime.utcnow()})
+
+        try:
+            self._queue.put_nowait((tracking_id, payload))
+        except queue.Full:
+            with self._lock:
+                self._statuses.pop(tracking_id, None)
+            raise PipelineFull()
+
+        return tracking_id
+
+    def status(self, tracking_id: str):
+        with self._lock:
+            entry = self._statuses.get(tracking_id)
+            return dict(entry) if entry is not None else None
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def capacity(self) -> int:
+        return self._queue.maxsize
+
+    # ----------------------------
+    # Consumer side
+    # ----------------------------
+    def _set_status(self, tracking_id: str, entry: dict) -> None:
+        with self._lock:
+            self._statuses[tracking_id] = entry
+            self._statuses.move_to_end(tracking_id)
+            while len(self._statuses) > self.retention:
+                self._statuses.popitem(last=False)
+
+    def _update_status(self, tracking_id: str, **fields) -> None:
+        with self._lock:
+            entry = self._statuses.get(tracking_id)
+            if entry is not None:
+                entry.update(fields)
+
+    def _next_batch(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _ingest(self, db, batch) -> None:
+        for tracking_id, _ in batch:
+            self._update_status(tracking_id, status="processing")
+
+        results = ingest_batch(db, [payload for _, payload in batch], path="pipeline")
+
+        now = datetime.utcnow()
+        for (tracking_id, _), result in zip(batch, results):
+            self._update_status(tracking_id, status="done", completed_at=now, result=result)
+
+    def _run(self) -> None:
+        db = self.session_factory()
+        try:
+            # Keep draining after stop() so accepted work is not dropped
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if not batch:
+                    continue
+
+                try:
+                    self._ingest(db, batch)
+                except Exception:
+                    logger.exception("Pipeline batch of %d failed, retrying individually", len(batch))
+                    for item in batch:
+                        try:
+                            self._ingest(db, [item])
+                        except Exception as e:
+                            self._update_status(
+                                item[0], status="failed", completed_at=datetime.utcnow(), error=str(e)
+                            )
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            db.close()
+
+
+# Shared pipeline used by POST /transactions/async
+ingest_pipeline = IngestPipeline()
@@ -0,0 +1,349 @@
+"""
+ingest_service.py
+
+Set-based ingestion of transaction batches.
+
+Runs the same pipeline as POST /transactions (accounts, transaction,
+graph link, rules, money loops, alerts, risk audit) for a whole list of
+transactions inside one unit of work, sharing every DB lookup across
+the batch instead of issuing them per transaction.
+
+The post-persist stages (process_transactions) are also used by the
+queue worker for transactions stored with status "queued".
+"""
+
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Transaction,
+    TransactionQueue,
+)
+from app.db import write_lock
+from app.models.transaction import STATUS_PROCESSED, STATUS_QUEUED
+from app.services.account_resolver import account_resolver
+from app.services.rule_engine import evaluate_rules
+from app.services.graph_service import link_graph
+from app.services.layering import evaluate_graph_rules
+from app.services.feature_store import feature_store
+from app.services.network_risk import network_scores
+from app.services.upserts import upsert_links
+from app.services.account_stats import apply_account_stats
+from app.services.response_cache import account_cache
+from app.services.alert_service import generate_alerts, persist_alerts
+from app.services.metrics import count_ingested, stage_timer
+
+# Upper bound on transactions accepted in a single batch
+MAX_BATCH_SIZE = 5000
+
+# Keeps IN (...) lists below the bound-parameter limits of SQLite
+IN_CLAUSE_CHUNK = 500
+
+
+def _chunks(items, size=IN_CLAUSE_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ----------------------------
+# Pipeline stages for persisted transactions
+# ----------------------------
+def transaction_record(t) -> tuple:
+    """
+    (id, from_account, to_account, amount, timestamp) of a Transaction row.
+    """
+    return (t.id, t.from_account, t.to_account, t.amount, t.timestamp)
+
+
+class MemoryJournal:
+    """
+    In-memory updates (link_graph edges / transfers, sender features) made
+    while scoring one unit of work. If the unit is rolled back, revert()
+    takes back exactly those, leaving other units' updates in place.
+    """
+
+    __slots__ = ("graph", "features")
+
+    def __init__(self):
+        self.graph = []
+        self.features = []
+
+    def revert(self) -> None:
+        link_graph.revert(self.graph)
+        feature_store.revert(self.features)
+
+
+def score_transactions(db: Session, records, owns=None, journal: MemoryJournal = None, network=None) -> dict:
+    """
+    STEP 4 / 5 — Rules and graph rules over in-memory state, in record order.
+
+    Every record's edge is applied to link_graph; rules only run for
+    records whose sender is accepted by `owns` (all when None). Shard
+    processes (sharded_ingest) see the whole batch so their graph stays
+    complete, but score only the senders they own.
+
+    Args:
+        db (Session): DB session, only read (warm-up / feature rebuilds)
+        records (list[tuple]): (id, from_account, to_account, amount, timestamp)
+        owns (callable): account_id -> bool
+        journal (MemoryJournal): logs the in-memory updates for a rollback
+        network (NetworkScores): graph job results for the graph rules;
+            network_scores on live ingest, None in shard processes
+
+    Returns:
+        dict: transaction id -> alerts from generate_alerts, scored records only
+    """
+    graph_journal = journal.graph if journal is not None else None
+    feature_journal = journal.features if journal is not None else None
+
+    link_graph.ensure_loaded(db)
+
+    senders = {r[1] for r in records if owns is None or owns(r[1])}
+
+    # Sender features, shared by the whole batch
+    with stage_timer("history"):
+        features = feature_store.get_many(db, list(senders))
+
+    scored = {}
+    for txn_id, a, b, amount, timestamp in records:
+        mine = a in senders
+
+        # STEP 4 — Rules over features including earlier batch items
+        if mine:
+            with stage_timer("rules"):
+                sender_features = feature_store.observe(features[a], b, amount, timestamp, feature_journal)
+                triggered_rules = evaluate_rules(
+                    amount,
+                    None,
+                    txn_pair=(a, b),
+                    features=sender_features,
+                )
+
+        # STEP 5 — Layering / money loops through the new edge
+        with stage_timer("loops"):
+            new_counterparties = link_graph.add_edge(a, b, timestamp, amount, graph_journal)
+            if mine:
+                triggered_rules.extend(evaluate_graph_rules(
+                    link_graph, a, b, amount, timestamp, new_counterparties, network
+                ))
+
+        if mine:
+            scored[txn_id] = generate_alerts(txn_id, triggered_rules)
+
+    return scored
+
+
+def persist_scored(db: Session, transactions, scored: dict, path: str = "batch") -> list[dict]:
+    """
+    STEP 3 / 6 — Links, account aggregates, alerts and risk for scored
+    transactions. Does not commit.
+
+    Args:
+        db (Session): DB session
+        transactions (list[Transaction]): rows in processing order
+        scored (dict): transaction id -> alerts (score_transactions)
+        path (str): ingest path label for the metrics
+
+    Returns:
+        list[dict]: per-transaction results, same order as transactions
+    """
+    pairs = [(t.from_account, t.to_account) for t in transactions]
+
+    # STEP 3 — Graph links + per-account aggregates
+    with stage_timer("links"):
+        new_links = upsert_links(db, Counter(pairs))
+
+        # New accounts / transactions must exist before the stats / risk statements below
+        db.flush()
+        apply_account_stats(db, transactions, new_links)
+
+    results = []
+    alerts_by_account = {}
+    for transaction in transactions:
+        # STEP 6 — Alerts, applied per account once the batch is scored
+        alerts = scored.get(transaction.id, [])
+        alerts_by_account.setdefault(transaction.from_account, []).extend(alerts)
+
+        transaction.status = STATUS_PROCESSED
+
+        results.append({
+            "id": transaction.id,
+            "from_account": transaction.from_account,
+            "to_account": transaction.to_account,
+            "amount": transaction.amount,
+            "timestamp": transaction.timestamp,
+            "status": transaction.status,
+            "alerts": [
+                {"rule_triggered": al["rule_triggered"], "severity": al["severity"]}
+                for al in alerts
+            ],
+        })
+
+    # STEP 6 — One atomic risk increment per account + bulk alerts / audits
+    with stage_timer("alerts"):
+        persist_alerts(db, alerts_by_account, {t.id: t.to_account for t in transactions})
+
+    count_ingested(path, len(transactions))
+
+    return results
+
+
+def process_transactions(db: Session, transactions, path: str = "batch",
+                         journal: MemoryJournal = None) -> list[dict]:
+    """
+    Runs graph update, rules, loop check, alerts and risk audit for
+    transactions that are already added to the session (or stored with
+    status "queued"). Does not commit.
+
+    Args:
+        db (Session): DB session
+        transactions (list[Transaction]): rows in processing order
+        path (str): ingest path label for the metrics ("batch", "worker", ...)
+        journal (MemoryJournal): pass to discard_memory_state() on rollback
+
+    Returns:
+        list[dict]: per-transaction results, same order as transactions
+    """
+    if not transactions:
+        return []
+
+    scored = score_transactions(
+        db, [transaction_record(t) for t in transactions], journal=journal, network=network_scores
+    )
+    return persist_scored(db, transactions, scored, path)
+
+
+def invalidate_account_views(transactions) -> None:
+    """
+    Drops cached account views of both sides of committed transactions.
+    Call after the commit, never before.
+    """
+    account_cache.invalidate({a for t in transactions for a in (t.from_account, t.to_account)})
+
+
+def discard_memory_state(journal: MemoryJournal) -> None:
+    """
+    Takes back the in-memory graph / feature updates of a unit of work
+    that was rolled back (logged in `journal` while scoring it).
+    """
+    if journal is not None:
+        journal.revert()
+
+
+def build_transactions(payloads, status: str) -> list:
+    """
+    Transaction rows for payloads, not yet added to any session.
+    """
+    return [
+        Transaction(
+            id=str(uuid.uuid4()),
+            from_account=str(p.from_account),
+            to_account=str(p.to_account),
+            amount=p.amount,
+            timestamp=datetime.utcnow(),
+            status=status,
+        )
+        for p in payloads
+    ]
+
+
+def add_transactions(db: Session, transactions) -> None:
+    """
+    Ensures both accounts of every transaction exist and adds the rows.
+    Writes; hold write_lock(db) until the commit.
+    """
+    # STEP 1 — Accounts, shared by the whole batch
+    with stage_timer("accounts"):
+        account_resolver.ensure(db, [a for t in transactions for a in (t.from_account, t.to_account)])
+
+    # STEP 2 — Transactions (flushed here so the INSERT is timed as such)
+    with stage_timer("insert"):
+        db.add_all(transactions)
+        db.flush()
+
+
+def new_transactions(db: Session, payloads, status: str) -> list:
+    transactions = build_transactions(payloads, status)
+    add_transactions(db, transactions)
+    return transactions
+
+
+# ----------------------------
+# Batch ingestion
+# ----------------------------
+def ingest_batch(db: Session, payloads, path: str = "batch") -> list[dict]:
+    """
+    Ingests a list of TransactionCreate payloads in one unit of work.
+
+    Args:
+        db (Session): DB session, committed once at the end
+        payloads (list[TransactionCreate]): transactions in arrival order
+        path (str): ingest path label for the metrics
+
+    Returns:
+        list[dict]: one result per payload, in the same order, with the
+            stored transaction fields and the alerts it raised
+    """
+    if not payloads:
+        return []
+
+    transactions = build_transactions(payloads, STATUS_PROCESSED)
+    journal = MemoryJournal()
+
+    try:
+        # Rules, money loops and layering over in-memory state; only reads,
+        # so no write lock is held while they run
+        scored = score_transactions(
+            db, [transaction_record(t) for t in transactions], journal=journal, network=network_scores
+        )
+
+        # Writers of this process take turns from the first write to the commit
+        with write_lock(db):
+            try:
+                add_transactions(db, transactions)
+                results = persist_scored(db, transactions, scored, path)
+                db.commit()
+            except Exception:
+                # Roll back before another writer gets the lock
+                db.rollback()
+                raise
+    except Exception:
+        db.rollback()
+        discard_memory_state(journal)
+        raise
+
+    invalidate_account_views(transactions)
+    return results
+
+
+# ----------------------------
+# Queued ingestion
+# ----------------------------
+def enqueue_transactions(db: Session, payloads) -> list[str]:
+    """
+    Stores transactions with status "queued" plus one txn_queue row each,
+    leaving rules and alerts to worker/transaction_worker.py.
+
+    Returns:
+        list[str]: transaction ids, in payload order
+    """
+    if not payloads:
+        return []
+
+    with write_lock(db):
+        try:
+            transactions = new_transactions(db, payloads, STATUS_QUEUED)
+            db.add_all(
+                TransactionQueue(txn_id=uuid.UUID(t.id), status="pending")
+                for t in transactions
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    return [t.id for t in transactions]
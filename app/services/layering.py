@@ -0,0 +1,230 @@
+"""
+layering.py
+
+Bounded path search for layering through a newly ingested edge.
+
+Layering moves funds through a chain of accounts to hide their origin,
+often returning them to where they started. For a new transfer
+A -> B (amount x, time t) this module looks for:
+
+- layering cycles : B -> X1 -> ... -> A followed by the new A -> B, where
+                    every hop happens after the previous one, the whole
+                    cycle fits in LAYERING_WINDOW_SEC, and each hop moves
+                    between (1 - LAYERING_AMOUNT_DECAY) and 100% of the
+                    previous hop's amount (fees / skimming along the way)
+- fan-out         : A reached LAYERING_FAN_THRESHOLD distinct receivers
+                    within the window with this transfer (scatter)
+- fan-in          : B reached LAYERING_FAN_THRESHOLD distinct senders
+                    within the window with this transfer (gather)
+
+The search is an iterative DFS over the recent transfers indexed by
+graph_service.LinkGraph, capped by depth, by a node-expansion budget and
+by a wall-clock budget, so one transaction cannot stall ingest however
+dense its neighbourhood is. Since amounts can only shrink by a bounded
+share per hop, a hop k steps before the new transfer can carry at most
+x / (1 - decay)^k, which prunes most edges of busy accounts up front.
+Transfers below LinkGraph.min_amount are not indexed, so cycles are only
+searched for transfers of at least that amount. A truncated search
+reports what it found so far.
+"""
+
+import time
+from datetime import timedelta
+
+from app.services.rule_registry import GROUP_GRAPH, Rule, rule_registry
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+LAYERING_MAX_DEPTH = 6             # hops in a cycle, new edge included
+LAYERING_WINDOW_SEC = 24 * 3600    # first to last hop of a cycle
+LAYERING_AMOUNT_DECAY = 0.05       # max share of the amount lost per hop
+LAYERING_FAN_THRESHOLD = 10        # distinct counterparties within the window
+LAYERING_MAX_STEPS = 20_000        # edges inspected per transaction
+LAYERING_TIME_BUDGET_MS = 10       # wall-clock budget per transaction
+LAYERING_MAX_CYCLES = 3            # cycles reported per transaction
+
+
+def _hop_ok(prev_amount: float, amount: float, decay: float) -> bool:
+    return prev_amount * (1 - decay) <= amount <= prev_amount
+
+
+def find_layering_cycles(graph, from_account: str, to_account: str, amount: float, timestamp,
+                         max_depth: int = None, window_sec: int = None, decay: float = None,
+                         max_steps: int = None, time_budget_ms: float = None,
+                         max_cycles: int = None):
+    """
+    Finds time-ordered, amount-decaying cycles closed by the edge
+    from_account -> to_account.
+
+    Args:
+        graph (LinkGraph): index holding recent transfers (the new transfer
+            may or may not already be recorded)
+        from_account, to_account (str): the new edge A -> B
+        amount (float): amount of the new transfer
+        timestamp (datetime): time of the new transfer
+        max_depth, window_sec, decay, max_steps, time_budget_ms,
+        max_cycles: overrides for the LAYERING_* settings
+
+    Returns:
+        (cycles, truncated): cycles are account lists [A, B, ..., A];
+        truncated is True if a budget ran out before the search finished
+    """
+    max_depth = LAYERING_MAX_DEPTH if max_depth is None else max_depth
+    window_sec = LAYERING_WINDOW_SEC if window_sec is None else window_sec
+    decay = LAYERING_AMOUNT_DECAY if decay is None else decay
+    max_steps = LAYERING_MAX_STEPS if max_steps is None else max_steps
+    time_budget_ms = LAYERING_TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms
+    max_cycles = LAYERING_MAX_CYCLES if max_cycles is None else max_cycles
+
+    # Every hop carries at least `amount`, so smaller transfers were never indexed
+    if from_account == to_account or max_depth < 2 or amount < graph.min_amount:
+        return [], False
+
+    earliest = timestamp - timedelta(seconds=window_sec)
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    # Largest amount the i-th hop after to_account can carry and still decay to `amount`
+    ceilings = [amount / (1 - decay) ** (max_depth - i) if decay < 1 else float("inf")
+                for i in range(max_depth + 1)]
+    cycles = []
+    steps = 0
+
+    with graph.lock:
+        # (node, time of hop into node, amount of hop into node, path so far)
+        stack = [(to_account, earliest, None, (to_account,))]
+
+        while stack:
+            node, hop_time, hop_amount, path = stack.pop()
+            ceiling = ceilings[len(path)]
+
+            for neighbor, history in graph.recent_transfers(node).items():
+                steps += 1
+                if steps > max_steps or (steps % 256 == 0 and time.perf_counter() > deadline):
+                    return cycles, True
+
+                closing = neighbor == from_account
+                if not closing and (neighbor in path or len(path) + 1 >= max_depth):
+                    continue
+
+                for ts, amt in history:
+                    # After the previous hop, not after the new transfer
+                    if ts < hop_time or ts > timestamp:
+                        continue
+                    # Amounts only shrink along the chain, down to the new transfer's amount
+                    if amt < amount or amt > ceiling:
+                        continue
+                    if hop_amount is not None and not _hop_ok(hop_amount, amt, decay):
+                        continue
+
+                    if closing:
+                        if _hop_ok(amt, amount, decay):
+                            cycles.append([from_account, *path, from_account])
+                            if len(cycles) >= max_cycles:
+                                return cycles, False
+                            break
+                        continue
+
+                    stack.append((neighbor, ts, amt, path + (neighbor,)))
+
+    return cycles, False
+
+
+# ----------------------------
+# Rule declarations (see rule_registry)
+# ----------------------------
+@rule_registry.provider("layering_cycles")
+def _layering_cycles(ctx):
+    cycles, _ = find_layering_cycles(
+        ctx["graph"], ctx["from_account"], ctx["to_account"], ctx["amount"], ctx["timestamp"]
+    )
+    return cycles
+
+
+@rule_registry.provider("fan_out")
+def _fan_out(ctx):
+    return ctx["graph"].fan_out(ctx["from_account"])
+
+
+@rule_registry.provider("fan_in")
+def _fan_in(ctx):
+    return ctx["graph"].fan_in(ctx["to_account"])
+
+
+def _check_layering_cycle(ctx):
+    cycles = ctx["layering_cycles"]
+    if not cycles:
+        return False
+    shortest = min(cycles, key=len)
+    return (
+        f"Funds returned to origin through {len(shortest) - 1} time-ordered hops "
+        f"with decaying amounts: {' -> '.join(shortest)}."
+    )
+
+
+def _check_fan(direction: str, feature: str):
+    # Fires only when this transfer's new counterparty crosses the threshold
+    def check(ctx):
+        new_counterparties = ctx.get("new_counterparties")
+        return (
+            new_counterparties is not None
+            and new_counterparties[direction]
+            and ctx[feature] == LAYERING_FAN_THRESHOLD
+        )
+    return check
+
+
+rule_registry.register(Rule(
+    "Layering Cycle", "HIGH",
+    "Funds returned to origin through time-ordered hops with decaying amounts.",
+    check=_check_layering_cycle,
+    needs=("layering_cycles",), cost=30, groups=(GROUP_GRAPH,),
+))
+rule_registry.register(Rule(
+    "Fan-out Layering", "MEDIUM",
+    "Account is spreading funds across many distinct receivers in a short window.",
+    check=_check_fan("new_receiver", "fan_out"),
+    needs=("new_counterparties", "fan_out"), cost=2, groups=(GROUP_GRAPH,),
+))
+rule_registry.register(Rule(
+    "Fan-in Layering", "MEDIUM",
+    "Account is collecting funds from many distinct senders in a short window.",
+    check=_check_fan("new_sender", "fan_in"),
+    needs=("new_counterparties", "fan_in"), cost=2, groups=(GROUP_GRAPH,),
+))
+
+
+def evaluate_graph_rules(graph, from_account: str, to_account: str, amount: float, timestamp,
+                         new_counterparties: dict = None, network=None) -> list[dict]:
+    """
+    Runs the enabled "graph" rules of the registry for a new transfer and
+    returns triggered-rule dicts for generate_alerts. Searches are skipped
+    when the rules that need them are disabled.
+
+    A layering cycle supersedes the plain structural "Money Loop Detected",
+    which is only evaluated when no time / amount constrained cycle was found.
+
+    Args:
+        graph (LinkGraph): shared index, with the new transfer already recorded
+        from_account, to_account (str): the new edge A -> B
+        amount (float): transfer amount
+        timestamp (datetime): transfer time
+        new_counterparties (dict): what LinkGraph.add_edge returned for this
+            transfer; fan rules fire only when the threshold is crossed
+        network (NetworkScores): graph job results (network_risk.network_scores)
+            for live ingest; None where results must only depend on the
+            transactions (replay, shards)
+
+    Returns:
+        list[dict]: triggered rules (rule_triggered, severity, reason)
+    """
+    return rule_registry.evaluate(
+        GROUP_GRAPH,
+        graph=graph,
+        from_account=from_account,
+        to_account=to_account,
+        amount=amount,
+        timestamp=timestamp,
+        new_counterparties=new_counterparties,
+        txn_pair=(from_account, to_account),
+        network=network,
+    )
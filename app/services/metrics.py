@@ -0,0 +1,385 @@
+"""
+metrics.py
+
+In-process metrics in the Prometheus text exposition format.
+
+- Counter / Histogram / Gauge with labels, thread-safe, no dependencies
+- stage_timer(stage): times one ingest stage into aml_ingest_stage_seconds
+- count_rule_hits(alerts): aml_rule_hits_total per rule
+- per-request DB query counts via a SQLAlchemy cursor event and a
+  request-scoped context variable (see main.py middleware)
+- queue depth / worker lag gauges read from txn_queue at scrape time
+
+Set METRICS_ENABLED=false to turn instrumentation off: stage_timer() then
+returns a shared no-op context manager and the other hooks return at once.
+"""
+
+import bisect
+import contextvars
+from abc import ABC, abstractmethod
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+# Seconds; ingest stages are mostly sub-millisecond
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+# ----------------------------
+# Metric types
+# ----------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    @abstractmethod
+    def samples(self):
+        """Yields (suffix, label values, extra labels, value)."""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return lines
+
+
+class _ChildMetric(_Metric):
+    """
+    Metric keeping one child (value holder) per label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A new child for one set of label values."""
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_ChildMetric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield "_total", values, (), child.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_ChildMetric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield "_bucket", values, (("le", _format_value(float(bound))),), cumulative
+            yield "_sum", values, (), total
+            yield "_count", values, (), cumulative
+
+
+class Gauge(_Metric):
+    """
+    Gauge computed at scrape time by `collect`, which returns
+    {label values tuple: value}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for values, value in (self.collect() or {}).items():
+            yield "", tuple(str(v) for v in values), (), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # one broken collector must not hide the rest
+                lines.append(f"# {metric.name} unavailable: {type(e).__name__}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+INGEST_STAGE_SECONDS = registry.register(Histogram(
+    "aml_ingest_stage_seconds", "Time spent per ingest stage.", ["stage"], STAGE_BUCKETS))
+INGESTED_TRANSACTIONS = registry.register(Counter(
+    "aml_ingested_transactions", "Transactions run through the rule pipeline.", ["path"]))
+RULE_HITS = registry.register(Counter(
+    "aml_rule_hits", "Alerts raised per rule.", ["rule"]))
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "aml_http_request_seconds", "HTTP request latency.", ["method", "route"], REQUEST_BUCKETS))
+HTTP_REQUEST_QUERIES = registry.register(Histogram(
+    "aml_http_request_db_queries", "DB statements executed per HTTP request.", ["method", "route"],
+    QUERY_COUNT_BUCKETS))
+DB_QUERIES = registry.register(Counter(
+    "aml_db_queries", "DB statements executed."))
+
+
+# ----------------------------
+# Ingest hooks
+# ----------------------------
+class _StageTimer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def stage_timer(stage: str):
+    """
+    Context manager timing one ingest stage:
+    accounts, insert, links, history, rules, loops, alerts, commit.
+    """
+    if not METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _StageTimer(INGEST_STAGE_SECONDS.labels(stage))
+
+
+def count_ingested(path: str, count: int = 1) -> None:
+    if METRICS_ENABLED and count:
+        INGESTED_TRANSACTIONS.labels(path).inc(count)
+
+
+def count_rule_hits(alerts) -> None:
+    if not METRICS_ENABLED:
+        return
+    for alert in alerts:
+        RULE_HITS.labels(alert["rule_triggered"]).inc()
+
+
+# ----------------------------
+# Per-request DB query counting
+# ----------------------------
+class QueryCounter:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+
+# Mutable holder, so threadpool copies of the request context share it
+_request_queries: contextvars.ContextVar = contextvars.ContextVar("aml_request_queries", default=None)
+
+
+def start_request() -> contextvars.Token:
+    return _request_queries.set(QueryCounter())
+
+
+def finish_request(token, method: str, route: str, seconds: float) -> int:
+    """
+    Records latency and query count of a request. Returns the query count.
+    """
+    holder = _request_queries.get()
+    _request_queries.reset(token)
+    count = holder.count if holder is not None else 0
+    HTTP_REQUEST_SECONDS.labels(method, route).observe(seconds)
+    HTTP_REQUEST_QUERIES.labels(method, route).observe(count)
+    return count
+
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERIES.inc()
+    holder = _request_queries.get()
+    if holder is not None:
+        holder.count += 1
+
+
+def instrument_engine(engine) -> None:
+    """
+    Counts every statement executed on `engine`. No-op when disabled.
+    """
+    if METRICS_ENABLED and not event.contains(engine, "before_cursor_execute", _on_execute):
+        event.listen(engine, "before_cursor_execute", _on_execute)
+
+
+# ----------------------------
+# Queue gauges
+# ----------------------------
+def _queue_snapshot():
+    from app.db import SessionLocal
+    from app.models import TransactionQueue
+
+    db = SessionLocal()
+    try:
+        depth = dict(
+            db.query(TransactionQueue.status, func.count())
+            .group_by(TransactionQueue.status)
+            .all()
+        )
+        oldest = (
+            db.query(func.min(TransactionQueue.created_at))
+            .filter(TransactionQueue.status == "pending")
+            .scalar()
+        )
+    finally:
+        db.close()
+
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    return depth, lag
+
+
+_snapshot_lock = threading.Lock()
+_snapshot = {"at": 0.0, "value": ({}, 0.0)}
+
+
+def queue_snapshot(max_age_sec: float = 1.0):
+    """
+    txn_queue depth by status and age of the oldest pending row, shared by
+    the gauges of one scrape.
+    """
+    with _snapshot_lock:
+        if time.monotonic() - _snapshot["at"] > max_age_sec:
+            _snapshot["value"] = _queue_snapshot()
+            _snapshot["at"] = time.monotonic()
+        return _snapshot["value"]
+
+
+def _collect_queue_depth():
+    depth, _ = queue_snapshot()
+    return {(status or "unknown",): count for status, count in depth.items()}
+
+
+def _collect_queue_lag():
+    _, lag = queue_snapshot()
+    return {(): lag}
+
+
+def _collect_pipeline_depth():
+    from app.services.ingest_pipeline import ingest_pipeline
+
+    return {(): ingest_pipeline.depth()}
+
+
+registry.register(Gauge(
+    "aml_txn_queue_depth", "txn_queue rows by status.", ["status"], _collect_queue_depth))
+registry.register(Gauge(
+    "aml_txn_queue_lag_seconds", "Age of the oldest pending txn_queue row.", (), _collect_queue_lag))
+registry.register(Gauge(
+    "aml_ingest_pipeline_depth", "Submissions waiting in the in-process async pipeline.", (),
+    _collect_pipeline_depth))
+
+
+def render() -> str:
+    return registry.render()
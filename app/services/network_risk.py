@@ -0,0 +1,148 @@
+"""
+network_risk.py
+
+Online side of the graph job (graph_analytics): O(1) lookups of each
+account's strongly connected component and network risk.
+
+NetworkScores keeps the account_graph_scores table in a dict. At most
+every GRAPH_SCORES_REFRESH_SEC a lookup checks (in a background thread)
+whether a newer run was stored; the new dict is built there and swapped
+in with one reference assignment, so lookups never wait for a load and
+keep answering from the previous run until the swap. run_graph_job()
+asks for a check as soon as it has stored a run. Until the job has run
+nothing is known and every lookup misses.
+
+The rule engine takes the scores as the `network` input of the graph
+rules ("Money Loop Detected": a transfer between two members of one
+component closes a loop, no BFS needed; "High-Risk Network
+Counterparty"). Only live ingest passes network_scores; replays and
+shard processes pass nothing, so their results depend on the
+transactions alone.
+"""
+
+import logging
+import threading
+import time
+
+from sqlalchemy import func
+
+from app.models import AccountGraphScore
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+GRAPH_SCORES_REFRESH_SEC = 60    # how often to look for a newer graph job run
+
+
+class NetworkScores:
+    def __init__(self, refresh_sec: float = GRAPH_SCORES_REFRESH_SEC, session_factory=None):
+        self.refresh_sec = refresh_sec
+        self.session_factory = session_factory
+        # (computed_at of the loaded run, account_id -> (component_id, component_size, network_risk)),
+        # replaced as a whole so readers always see one run
+        self._state = (None, {})
+        self._next_check = 0.0
+        self._lock = threading.Lock()     # one load at a time
+        self._refreshing = False
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def _session(self):
+        if self.session_factory is None:
+            from app.db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+    def reload(self, db=None) -> None:
+        """
+        Loads the latest stored run now (if it is not loaded yet), in the
+        calling thread. Lookups keep using the previous run until the swap.
+        """
+        own = db is None
+        db = self._session() if own else db
+        try:
+            version = db.query(func.max(AccountGraphScore.computed_at)).scalar()
+            if version == self._state[0]:
+                return
+            scores = {
+                account_id: (component_id, component_size, network_risk)
+                for account_id, component_id, component_size, network_risk in db.query(
+                    AccountGraphScore.account_id,
+                    AccountGraphScore.component_id,
+                    AccountGraphScore.component_size,
+                    AccountGraphScore.network_risk,
+                ).yield_per(10000)
+            }
+            self._state = (version, scores)
+        finally:
+            if own:
+                db.close()
+
+    def _refresh(self) -> None:
+        try:
+            with self._lock:
+                self.reload()
+        except Exception:
+            logger.exception("Loading graph scores failed, keeping the previous run")
+        finally:
+            self._refreshing = False
+
+    def _maybe_refresh(self) -> None:
+        """
+        Starts a background check for a newer run when one is due.
+        """
+        if time.monotonic() < self._next_check or self._refreshing:
+            return
+        self._refreshing = True
+        self._next_check = time.monotonic() + self.refresh_sec
+        threading.Thread(target=self._refresh, name="graph-scores-refresh", daemon=True).start()
+
+    def expire(self) -> None:
+        """
+        Makes the next lookup check for a newer run (graph job completion hook).
+        """
+        self._next_check = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._state, self._next_check = (None, {}), 0.0
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def get(self, account_id: str):
+        """
+        (component_id, component_size, network_risk) or None.
+        """
+        self._maybe_refresh()
+        return self._state[1].get(account_id)
+
+    def same_component(self, a: str, b: str) -> bool:
+        self._maybe_refresh()
+        scores = self._state[1]
+        score_a, score_b = scores.get(a), scores.get(b)
+        return (
+            score_a is not None and score_b is not None
+            and score_a[0] is not None and score_a[0] == score_b[0]
+        )
+
+    def network_risk(self, account_id: str) -> float:
+        score = self.get(account_id)
+        return score[2] if score is not None else 0.0
+
+    def describe(self, account_id: str) -> dict:
+        component_id, component_size, network_risk = self.get(account_id) or (None, 1, 0.0)
+        return {
+            "component_id": component_id,
+            "component_size": component_size,
+            "network_risk": network_risk,
+            "computed_at": self._state[0],
+        }
+
+
+# Shared scores read by the rule engine and the account views
+network_scores = NetworkScores()
+
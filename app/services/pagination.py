@@ -0,0 +1,128 @@
+"""
+pagination.py
+
+Keyset (cursor) pagination and chunked streaming over (timestamp, id).
+
+OFFSET pagination makes the database walk and discard every skipped row,
+so deep pages get slower as tables grow. Keyset pagination remembers the
+(timestamp, id) of the last row returned and asks for rows strictly after
+it, which stays an index range scan at any depth.
+
+Cursors are opaque url-safe strings; clients pass back the `next_cursor`
+of the previous page unchanged.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.orm import Session
+
+# Filtered "approx" totals stop counting after this many rows
+APPROX_COUNT_CAP = 10_000
+
+
+# ----------------------------
+# Cursor encoding
+# ----------------------------
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Returns (timestamp, id). Raises ValueError on a malformed cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(ts), row_id
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+# ----------------------------
+# Keyset queries
+# ----------------------------
+def _after(ts_col, id_col, ts, row_id, descending: bool):
+    if descending:
+        return or_(ts_col < ts, and_(ts_col == ts, id_col < row_id))
+    return or_(ts_col > ts, and_(ts_col == ts, id_col > row_id))
+
+
+def _ordered(query, ts_col, id_col, descending: bool):
+    if descending:
+        return query.order_by(ts_col.desc(), id_col.desc())
+    return query.order_by(ts_col.asc(), id_col.asc())
+
+
+def keyset_page(query, ts_col, id_col, size: int, cursor: str = None, descending: bool = True):
+    """
+    Fetches one page after `cursor`.
+
+    Returns:
+        (rows, next_cursor): next_cursor is None on the last page
+    """
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        query = query.filter(_after(ts_col, id_col, ts, row_id, descending))
+
+    rows = _ordered(query, ts_col, id_col, descending).limit(size + 1).all()
+
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, ts_col.key), getattr(last, id_col.key))
+
+
+def iter_keyset(query, ts_col, id_col, chunk_size: int = 1000, descending: bool = False):
+    """
+    Yields lists of rows, chunk by chunk, without materializing the result set.
+    Each chunk is its own short query, so no cursor is held open between chunks.
+    """
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(query, ts_col, id_col, chunk_size, cursor, descending)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+# ----------------------------
+# Totals
+# ----------------------------
+def exact_count(query) -> int:
+    return query.order_by(None).count()
+
+
+def approximate_count(db: Session, query, table, filtered: bool) -> dict:
+    """
+    Cheap total for UIs that only need an order of magnitude.
+
+    - unfiltered: planner statistics (PostgreSQL) or MAX(rowid) (SQLite)
+    - filtered: exact count capped at APPROX_COUNT_CAP rows
+
+    Returns:
+        dict: {"total": int, "estimated": bool}
+    """
+    if not filtered:
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            estimate = db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t"),
+                {"t": table.name},
+            ).scalar()
+            if estimate is not None and estimate >= 0:
+                return {"total": int(estimate), "estimated": True}
+        elif dialect == "sqlite":
+            estimate = db.execute(text(f"SELECT MAX(rowid) FROM {table.name}")).scalar()
+            return {"total": int(estimate or 0), "estimated": True}
+
+    capped = query.order_by(None).limit(APPROX_COUNT_CAP + 1).subquery()
+    count = db.execute(select(func.count()).select_from(capped)).scalar()
+    return {"total": min(count, APPROX_COUNT_CAP), "estimated": count > APPROX_COUNT_CAP}
@@ -0,0 +1,415 @@
+"""
+replay.py
+
+Re-scores a recorded transaction stream offline.
+
+Transactions are streamed in timestamp order from an NDJSON / CSV file
+(the format of GET /transactions/export) or from the transactions table,
+and run through the same rules as ingest — sliding-window features,
+evaluate_rules, LinkGraph + layering rules, generate_alerts — with all
+state held in memory. Nothing is written to the database; alerts go to an
+NDJSON or CSV file. Rule thresholds can be overridden per run and the
+alert set compared with the output of an earlier run:
+
+    python -m app.services.replay --source db --out alerts_v1.ndjson
+    python -m app.services.replay --source db --out alerts_v2.ndjson \\
+        --set LARGE_TXN_THRESHOLD=50000 --set LAYERING_FAN_THRESHOLD=8 \\
+        --compare alerts_v1.ndjson
+
+Replay differs from live ingest in two deliberate ways:
+- the layering wall-clock budget is off (the step budget still applies),
+  so two runs over the same input give the same alerts
+- feature state is never evicted, so memory grows with distinct accounts
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.services import feature_store, graph_service, layering, rule_engine
+from app.services.alert_service import generate_alerts
+from app.services.feature_store import AccountFeatures
+from app.services.graph_service import LinkGraph
+from app.services.layering import evaluate_graph_rules
+from app.services.rule_engine import evaluate_rules
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+REPLAY_DB_CHUNK = 5000          # transactions per keyset query for --source db
+REPLAY_PROGRESS_EVERY = 100_000  # transactions between progress lines
+
+# Modules whose upper-case settings can be overridden with --set
+TUNABLE_MODULES = (rule_engine, layering, graph_service, feature_store)
+
+ALERT_COLUMNS = [
+    "transaction_id", "from_account", "to_account", "amount", "timestamp",
+    "rule_triggered", "severity", "reason",
+]
+
+
+# ----------------------------
+# Sources
+# ----------------------------
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _record(row: dict, fallback_id: str) -> tuple:
+    return (
+        str(row.get("id") or fallback_id),
+        str(row["from_account"]),
+        str(row["to_account"]),
+        float(row["amount"]),
+        _parse_timestamp(row["timestamp"]),
+    )
+
+
+def read_ndjson(path: str):
+    """
+    Yields (id, from_account, to_account, amount, timestamp) per line.
+    Lines without an id get their line number.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield _record(json.loads(line), f"line-{line_no}")
+
+
+def read_csv(path: str):
+    """
+    Same as read_ndjson for a CSV file with a header row.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row_no, row in enumerate(csv.DictReader(f), 1):
+            yield _record(row, f"row-{row_no}")
+
+
+def read_db(start_time: datetime = None, end_time: datetime = None, chunk_size: int = REPLAY_DB_CHUNK):
+    """
+    Streams processed transactions oldest first with keyset pagination.
+    Queued rows have not been scored live and are skipped.
+    """
+    from sqlalchemy import func
+
+    from app.db import SessionLocal
+    from app.models import Transaction
+    from app.models.transaction import STATUS_PROCESSED, UNPROCESSED_STATUSES
+    from app.services.pagination import iter_keyset
+
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Transaction.id,
+            Transaction.from_account,
+            Transaction.to_account,
+            Transaction.amount,
+            Transaction.timestamp,
+        ).filter(func.coalesce(Transaction.status, STATUS_PROCESSED).notin_(UNPROCESSED_STATUSES))
+        if start_time:
+            query = query.filter(Transaction.timestamp >= start_time)
+        if end_time:
+            query = query.filter(Transaction.timestamp <= end_time)
+
+        for rows in iter_keyset(query, Transaction.timestamp, Transaction.id, chunk_size):
+            for row in rows:
+                yield tuple(row)
+    finally:
+        db.close()
+
+
+def in_timestamp_order(records, sort: bool = False):
+    """
+    Passes records through, oldest first.
+
+    With sort=False the input must already be ordered (exports and the DB
+    source are); an out-of-order record raises ValueError. sort=True loads
+    the whole input and sorts it in memory.
+    """
+    if sort:
+        yield from sorted(records, key=lambda r: r[4])
+        return
+
+    last = None
+    for record in records:
+        if last is not None and record[4] < last:
+            raise ValueError(
+                f"Transaction {record[0]} at {record[4].isoformat()} is older than the previous one; "
+                "re-run with --sort"
+            )
+        last = record[4]
+        yield record
+
+
+# ----------------------------
+# Threshold overrides
+# ----------------------------
+def _coerce(current, raw: str):
+    if isinstance(current, bool):
+        return raw.lower() in ("1", "true", "yes")
+    if isinstance(current, int):
+        return int(float(raw))
+    if isinstance(current, float):
+        return float(raw)
+    return raw
+
+
+def parse_overrides(pairs) -> dict:
+    """
+    Turns ["NAME=VALUE", ...] into {NAME: value}, typed like the current setting.
+    Raises ValueError for malformed pairs and unknown names.
+    """
+    overrides = {}
+    for pair in pairs or ():
+        name, sep, raw = pair.partition("=")
+        name = name.strip()
+        if not sep or not name:
+            raise ValueError(f"Expected NAME=VALUE, got {pair!r}")
+
+        modules = [m for m in TUNABLE_MODULES if name.isupper() and hasattr(m, name)]
+        if not modules:
+            raise ValueError(f"Unknown setting {name!r}")
+        overrides[name] = _coerce(getattr(modules[0], name), raw.strip())
+    return overrides
+
+
+@contextmanager
+def threshold_overrides(overrides: dict):
+    """
+    Temporarily sets module-level rule settings (e.g. LARGE_TXN_THRESHOLD)
+    in every tunable module that defines them. Rules read their settings
+    at call time, so the overrides apply to everything run inside.
+    """
+    previous = []
+    try:
+        for name, value in overrides.items():
+            for module in TUNABLE_MODULES:
+                if hasattr(module, name):
+                    previous.append((module, name, getattr(module, name)))
+                    setattr(module, name, value)
+        yield
+    finally:
+        for module, name, value in reversed(previous):
+            setattr(module, name, value)
+
+
+# ----------------------------
+# Replay engine
+# ----------------------------
+class ReplayEngine:
+    """
+    In-memory rule + graph pipeline over a time-ordered stream.
+
+    Scores each transaction the way ingest_service.process_transactions
+    does, against features and a LinkGraph built only from the replayed
+    stream itself. Graph job results are only used when a `network`
+    source is passed (e.g. a NetworkScores pinned to one run), so by
+    default a replay gives the same alerts whenever it runs.
+    """
+
+    def __init__(self, network=None):
+        self.network = network
+        self.features: dict[str, AccountFeatures] = {}
+        self.graph = LinkGraph(
+            window_sec=graph_service.TRANSFER_WINDOW_SEC,
+            edge_history=graph_service.EDGE_HISTORY_SIZE,
+            min_amount=graph_service.EDGE_HISTORY_MIN_AMOUNT,
+        )
+        self.graph.load(())
+        self.window = feature_store.FEATURE_WINDOW_SIZE
+        self.transactions = 0
+        self.rule_counts = Counter()
+
+    def process(self, record) -> list[dict]:
+        """
+        Scores one (id, from_account, to_account, amount, timestamp) record
+        and returns its alerts.
+        """
+        txn_id, a, b, amount, timestamp = record
+
+        sender_features = self.features.get(a)
+        if sender_features is None:
+            sender_features = self.features[a] = AccountFeatures(self.window)
+
+        # Rules over features including this transaction, as in ingest
+        sender_features.observe(b, amount, timestamp)
+        triggered_rules = evaluate_rules(amount, None, txn_pair=(a, b), features=sender_features)
+
+        new_counterparties = self.graph.add_edge(a, b, timestamp, amount)
+        triggered_rules.extend(evaluate_graph_rules(
+            self.graph, a, b, amount, timestamp, new_counterparties, self.network
+        ))
+
+        alerts = generate_alerts(txn_id, triggered_rules)
+        self.transactions += 1
+        self.rule_counts.update(al["rule_triggered"] for al in alerts)
+        return alerts
+
+    def run(self, records, sink=None, progress=None) -> dict:
+        """
+        Replays records, passing (record, alerts) to sink(record, alerts)
+        for transactions that raised alerts.
+
+        Returns:
+            dict: transactions, alerts, per-rule counts, seconds, tx_per_sec
+        """
+        started = time.perf_counter()
+        for record in records:
+            alerts = self.process(record)
+            if alerts and sink is not None:
+                sink(record, alerts)
+            if progress and self.transactions % REPLAY_PROGRESS_EVERY == 0:
+                progress(self.transactions, record[4])
+
+        seconds = time.perf_counter() - started
+        return {
+            "transactions": self.transactions,
+            "alerts": sum(self.rule_counts.values()),
+            "rules": dict(self.rule_counts.most_common()),
+            "accounts": len(self.features),
+            "seconds": round(seconds, 3),
+            "tx_per_sec": round(self.transactions / seconds, 1) if seconds else None,
+        }
+
+
+def replay(records, overrides: dict = None, sink=None, progress=None) -> dict:
+    """
+    Runs a fresh ReplayEngine over records with the given setting overrides.
+    """
+    overrides = dict(overrides or {})
+    # Deterministic output: budget layering searches by steps only
+    overrides.setdefault("LAYERING_TIME_BUDGET_MS", float("inf"))
+
+    with threshold_overrides(overrides):
+        return ReplayEngine().run(records, sink=sink, progress=progress)
+
+
+# ----------------------------
+# Alert files
+# ----------------------------
+class AlertWriter:
+    """
+    Appends replayed alerts to an NDJSON file, or CSV when the path ends in .csv.
+    """
+
+    def __init__(self, path: str):
+        self.fmt = "csv" if path.lower().endswith(".csv") else "ndjson"
+        self._file = open(path, "w", newline="" if self.fmt == "csv" else None, encoding="utf-8")
+        self._csv = None
+        if self.fmt == "csv":
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(ALERT_COLUMNS)
+
+    def __call__(self, record, alerts) -> None:
+        txn_id, a, b, amount, timestamp = record
+        for alert in alerts:
+            row = [txn_id, a, b, amount, timestamp.isoformat(),
+                   alert["rule_triggered"], alert["severity"], alert["reason"]]
+            if self._csv is not None:
+                self._csv.writerow(row)
+            else:
+                self._file.write(json.dumps(dict(zip(ALERT_COLUMNS, row))) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_alert_keys(path: str) -> set:
+    """
+    (transaction_id, rule_triggered) pairs of an alert file written by AlertWriter.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return {(r["transaction_id"], r["rule_triggered"]) for r in csv.DictReader(f)}
+
+    keys = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                keys.add((row["transaction_id"], row["rule_triggered"]))
+    return keys
+
+
+def compare_alerts(baseline: set, current: set) -> dict:
+    """
+    Per-rule difference between two alert sets of the same input.
+
+    Returns:
+        dict: {"baseline": n, "current": n, "added": n, "removed": n,
+               "rules": {rule: {"added": n, "removed": n}}}
+    """
+    added = Counter(rule for _, rule in current - baseline)
+    removed = Counter(rule for _, rule in baseline - current)
+    return {
+        "baseline": len(baseline),
+        "current": len(current),
+        "added": sum(added.values()),
+        "removed": sum(removed.values()),
+        "rules": {
+            rule: {"added": added[rule], "removed": removed[rule]}
+            for rule in sorted(set(added) | set(removed))
+        },
+    }
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def _records(args):
+    if args.source == "db":
+        return read_db(args.start_time, args.end_time)
+    if not args.input:
+        raise SystemExit("--input is required for file sources")
+    reader = read_csv if args.source == "csv" else read_ndjson
+    return in_timestamp_order(reader(args.input), sort=args.sort)
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description="Replay recorded transactions through the AML rules")
+    parser.add_argument("--source", choices=["ndjson", "csv", "db"], default="ndjson")
+    parser.add_argument("--input", help="NDJSON / CSV file (id, from_account, to_account, amount, timestamp)")
+    parser.add_argument("--sort", action="store_true", help="sort file input by timestamp in memory")
+    parser.add_argument("--start-time", type=_parse_timestamp, help="db source: first timestamp (ISO)")
+    parser.add_argument("--end-time", type=_parse_timestamp, help="db source: last timestamp (ISO)")
+    parser.add_argument("--out", help="alert file (.ndjson, or .csv)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a rule setting, e.g. LARGE_TXN_THRESHOLD=50000 (repeatable)")
+    parser.add_argument("--compare", help="alert file of an earlier run over the same input")
+    args = parser.parse_args(argv)
+
+    if args.compare and not args.out:
+        parser.error("--compare needs --out")
+    try:
+        overrides = parse_overrides(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    writer = AlertWriter(args.out) if args.out else None
+
+    def progress(count, timestamp):
+        print(f"  {count} transactions replayed (at {timestamp.isoformat()})", file=sys.stderr)
+
+    try:
+        summary = replay(_records(args), overrides, sink=writer, progress=progress)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    summary["overrides"] = overrides
+    if args.compare:
+        summary["comparison"] = compare_alerts(read_alert_keys(args.compare), read_alert_keys(args.out))
+
+    print(json.dumps(summary, indent=2, default=str))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+response_cache.py
+
+Small in-process TTL + LRU cache for rendered API responses.
+
+Entries are grouped (e.g. by account id) so an ingest can drop everything
+cached for the accounts it touched. A reader takes a token() before
+querying the DB and put() ignores the result if its group was invalidated
+after that token, so a response computed before a commit is never stored
+after that commit's invalidation.
+
+The cache is per process: other processes only see a change once their
+own entry expires, which TTL bounds.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+ACCOUNT_CACHE_TTL_SEC = 30         # max age of a cached account view
+ACCOUNT_CACHE_MAX_ENTRIES = 10_000  # LRU capacity (responses, not accounts)
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = ACCOUNT_CACHE_MAX_ENTRIES, ttl_sec: float = ACCOUNT_CACHE_TTL_SEC):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self._entries: OrderedDict = OrderedDict()   # (group, key) -> (expires_at, value)
+        self._groups: dict = {}                      # group -> set of keys
+        self._invalidated: dict = {}                 # group -> clock of last invalidation
+        self._clock = 0
+        self._floor = 0                              # tokens older than this are rejected
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def token(self) -> int:
+        """
+        Taken before computing a value to put() later.
+        """
+        with self._lock:
+            return self._clock
+
+    def get(self, group, key):
+        """
+        Returns the cached value or None (missing or expired).
+        """
+        with self._lock:
+            entry = self._entries.get((group, key))
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop((group, key))
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((group, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, group, key, value, token: int) -> bool:
+        """
+        Stores value unless the group was invalidated after `token` was
+        taken. Returns True if stored.
+        """
+        with self._lock:
+            if token < self._floor or self._invalidated.get(group, -1) > token:
+                return False
+
+            self._entries[(group, key)] = (time.monotonic() + self.ttl_sec, value)
+            self._entries.move_to_end((group, key))
+            self._groups.setdefault(group, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            return True
+
+    def invalidate(self, groups) -> None:
+        with self._lock:
+            self._clock += 1
+            for group in groups:
+                self._invalidated[group] = self._clock
+                for key in self._groups.pop(group, ()):
+                    self._entries.pop((group, key), None)
+
+            # Forget per-group clocks in bulk; in-flight tokens become stale instead
+            if len(self._invalidated) > self.max_entries:
+                self._invalidated.clear()
+                self._floor = self._clock
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._invalidated.clear()
+            self._clock += 1
+            self._floor = self._clock
+
+    def _drop(self, entry_key) -> None:
+        self._entries.pop(entry_key, None)
+        group, key = entry_key
+        keys = self._groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Account inspection responses (GET /accounts/{account_id}), grouped by account id
+account_cache = ResponseCache()
@@ -4,11 +4,15 @@ rule_engine.py
 Advanced AML rules engine for real-time transaction monitoring.
 - Detects high-risk patterns and assigns severity.
 - Returns triggered rules for alerts and risk scoring.
+- Rules are declared in the rule registry (rule_registry.py), which
+  plans and short-circuits their evaluation.
 """
 
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+from app.services.rule_registry import GROUP_GRAPH, GROUP_TRANSACTION, Rule, rule_registry
+
 # -----------------------------
 # CONFIG / THRESHOLDS
 # -----------------------------
@@ -17,6 +21,8 @@ RAPID_TXN_WINDOW_SEC = 60     # 60 seconds
 SMURF_TXN_THRESHOLD = 5       # ≥ 5 small repeated txns
 SMURF_TXN_AMOUNT = 10000      # Small txn < ₹10,000
 NEW_ACCOUNT_AGE_HOURS = 24    # New account window for mule detection
+CIRCULAR_FLOW_MAX_DEPTH = 5   # Max hops from receiver back to sender
+NETWORK_RISK_ALERT_THRESHOLD = 0.5  # Receiver network risk (graph_analytics) that raises an alert
 
 # -----------------------------
 # Helper Functions
@@ -31,10 +37,10 @@ def detect_rapid_transactions(txn_times):
     diffs = get_time_diff_seconds(txn_times)
     return any(d < RAPID_TXN_WINDOW_SEC for d in diffs)
 
-def detect_mule(account_created_at, txn_time, past_txns):
+def detect_mule(account_created_at, txn_time, past_txn_count):
     """Detect mule/OTP scams: new account forwarding funds quickly."""
     account_age = (txn_time - account_created_at).total_seconds() / 3600
-    if account_age <= NEW_ACCOUNT_AGE_HOURS and len(past_txns) <= 2:
+    if account_age <= NEW_ACCOUNT_AGE_HOURS and past_txn_count <= 2:
         return True
     return False
 
@@ -43,21 +49,42 @@ def detect_smurfing(amount, past_txns):
     small_txns = [t for t in past_txns if t.amount <= SMURF_TXN_AMOUNT]
     return len(small_txns) >= SMURF_TXN_THRESHOLD
 
-def detect_circular_flow(link_pairs, txn_pair):
+def detect_smurfing_features(features, counterparty):
+    """Detect repeated small-value transfers to the same counterparty from account features."""
+    return features.small_count(counterparty) >= SMURF_TXN_THRESHOLD
+
+def detect_circular_flow(link_pairs, txn_pair, max_depth=CIRCULAR_FLOW_MAX_DEPTH):
     """
-    Detect circular money flows (A -> B -> C -> A)
-    - link_pairs: list of tuples (from_account, to_account)
+    Detect circular money flows (A -> B -> ... -> A) through the current txn
+    - link_pairs: list of tuples (from_account, to_account), or a pre-indexed
+      graph with neighbors(account) such as graph_service.LinkGraph
     - txn_pair: current txn (from_account, to_account)
+    - max_depth: max hops from to_account back to from_account
     """
-    graph = defaultdict(set)
-    for a, b in link_pairs:
-        graph[a].add(b)
+    if hasattr(link_pairs, "neighbors"):
+        neighbors = link_pairs.neighbors
+    else:
+        graph = defaultdict(set)
+        for a, b in link_pairs:
+            graph[a].add(b)
+        neighbors = lambda account: graph.get(account, ())
 
     start, end = txn_pair
-    # Check if end can reach start in 2 steps (A->B->C->A)
-    for intermediate in graph[end]:
-        if start in graph.get(intermediate, []):
-            return True
+    # Bounded BFS: can end reach start within max_depth hops?
+    seen = {end}
+    frontier = [end]
+    for _ in range(max_depth):
+        next_frontier = []
+        for account in frontier:
+            for neighbor in neighbors(account):
+                if neighbor == start:
+                    return True
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    next_frontier.append(neighbor)
+        if not next_frontier:
+            break
+        frontier = next_frontier
     return False
 
 def detect_false_accounts(account_activity):
@@ -67,12 +94,149 @@ def detect_false_accounts(account_activity):
     """
     return [acc for acc, count in account_activity.items() if count <= 1]
 
+def rule_hit(rule_name):
+    """
+    Builds the triggered-rule dict (rule, severity, reason) for a rule.
+    Shared with the columnar engine (vector_rules) so both produce identical alerts.
+    """
+    return rule_registry.get(rule_name).hit()
+
+# -----------------------------
+# Rule declarations (see rule_registry)
+# -----------------------------
+@rule_registry.provider("recent_times")
+def _recent_times(ctx):
+    features = ctx.get("features")
+    return list(features.recent_times) if features is not None else ctx.get("txn_times")
+
+@rule_registry.provider("past_txn_count")
+def _past_txn_count(ctx):
+    features = ctx.get("features")
+    if features is not None:
+        return features.tx_count
+    past_txns = ctx.get("past_txns")
+    return len(past_txns) if past_txns is not None else None
+
+@rule_registry.provider("small_txn_count")
+def _small_txn_count(ctx):
+    features, txn_pair = ctx.get("features"), ctx.get("txn_pair")
+    if features is not None and txn_pair is not None:
+        return features.small_count(txn_pair[1])
+    past_txns = ctx.get("past_txns")
+    return sum(1 for t in past_txns if t.amount <= SMURF_TXN_AMOUNT) if past_txns is not None else 0
+
+@rule_registry.provider("loop_closed")
+def _loop_closed(ctx):
+    graph, txn_pair = ctx.get("graph"), ctx.get("txn_pair")
+    if txn_pair is None:
+        return False
+    if graph is not None:
+        # Same strongly connected component at the last graph job: a loop, no search needed
+        network = ctx.get("network")
+        if network is not None and network.same_component(*txn_pair):
+            return True
+        return graph.closes_loop(*txn_pair, max_depth=CIRCULAR_FLOW_MAX_DEPTH)
+    link_pairs = ctx.get("link_pairs")
+    return link_pairs is not None and detect_circular_flow(link_pairs, txn_pair)
+
+@rule_registry.provider("receiver_network_risk")
+def _receiver_network_risk(ctx):
+    txn_pair, network = ctx.get("txn_pair"), ctx.get("network")
+    if txn_pair is None or network is None:
+        return 0.0
+    return network.network_risk(txn_pair[1])
+
+@rule_registry.provider("false_accounts")
+def _false_accounts(ctx):
+    account_activity = ctx.get("account_activity")
+    return detect_false_accounts(account_activity) if account_activity is not None else []
+
+def _check_rapid(ctx):
+    txn_times = ctx["recent_times"]
+    return bool(txn_times) and detect_rapid_transactions(txn_times)
+
+def _check_mule(ctx):
+    account_created_at = ctx.get("account_created_at")
+    if account_created_at is None:
+        return False
+    txn_times, past_txn_count = ctx["recent_times"], ctx["past_txn_count"]
+    return bool(txn_times) and past_txn_count is not None and detect_mule(account_created_at, txn_times[-1], past_txn_count)
+
+def _check_risky_counterparty(ctx):
+    # Once per receiver and transfer window, like the fan rules
+    new_counterparties = ctx.get("new_counterparties")
+    return (
+        new_counterparties is not None
+        and new_counterparties["new_receiver"]
+        and ctx["receiver_network_risk"] >= NETWORK_RISK_ALERT_THRESHOLD
+    )
+
+def _check_false_accounts(ctx):
+    false_accs = ctx["false_accounts"]
+    return f"Accounts with minimal activity detected: {false_accs}." if false_accs else False
+
+# Registration order is the order hits are reported in
+rule_registry.register(Rule(
+    "Large Transaction Amount", "HIGH",
+    lambda: f"Transaction amount exceeds safe threshold (₹{LARGE_TXN_THRESHOLD}).",
+    check=lambda ctx: ctx["amount"] >= LARGE_TXN_THRESHOLD,
+    needs=("amount",), cost=1,
+))
+rule_registry.register(Rule(
+    "Rapid Transactions", "MEDIUM",
+    lambda: f"Multiple transactions detected from this account within {RAPID_TXN_WINDOW_SEC} seconds.",
+    check=_check_rapid,
+    needs=("recent_times",), cost=3,
+))
+rule_registry.register(Rule(
+    "Mule / OTP Scam", "HIGH",
+    "New account forwarding received funds quickly (potential mule or OTP scam).",
+    check=_check_mule,
+    needs=("account_created_at", "recent_times", "past_txn_count"), cost=2,
+))
+rule_registry.register(Rule(
+    "Smurfing", "MEDIUM",
+    lambda: f"Multiple small transactions detected between same accounts (≥ {SMURF_TXN_THRESHOLD}).",
+    check=lambda ctx: ctx["small_txn_count"] >= SMURF_TXN_THRESHOLD,
+    needs=("small_txn_count",), cost=1,
+))
+rule_registry.register(Rule(
+    "Money Loop Detected", "HIGH",
+    "Circular money flow detected between linked accounts.",
+    check=lambda ctx: ctx["loop_closed"],
+    needs=("loop_closed",), cost=50,
+    groups=(GROUP_TRANSACTION, GROUP_GRAPH),
+    # A time / amount constrained cycle is the more specific finding
+    unless=("Layering Cycle",),
+))
+rule_registry.register(Rule(
+    "High-Risk Network Counterparty", "MEDIUM",
+    "Funds sent to an account closely connected to flagged accounts (graph job network risk).",
+    check=_check_risky_counterparty,
+    needs=("new_counterparties", "receiver_network_risk"), cost=1, groups=(GROUP_GRAPH,),
+))
+rule_registry.register(Rule(
+    "False / Temporary Accounts", "MEDIUM",
+    "Accounts with minimal activity detected.",
+    check=_check_false_accounts,
+    needs=("false_accounts",), cost=5,
+))
+
+# Names used by older alert_service severity tables
+rule_registry.alias("Mule Account Detected", "Mule / OTP Scam")
+rule_registry.alias("OTP Scam Detected", "Mule / OTP Scam")
+rule_registry.alias("Smurfing Pattern", "Smurfing")
+rule_registry.alias("False / Temp Account", "False / Temporary Accounts")
+
 # -----------------------------
 # Main Rule Evaluation Function
 # -----------------------------
-def evaluate_rules(amount, txn_times, account_created_at=None, past_txns=None, link_pairs=None, account_activity=None, txn_pair=None):
+def evaluate_rules(amount, txn_times, account_created_at=None, past_txns=None, link_pairs=None, account_activity=None, txn_pair=None, features=None):
     """
     Evaluate AML rules for a transaction.
+
+    Runs the enabled "transaction" rules of the registry; features are
+    only computed for rules that need them.
     
     Args:
         amount (float): transaction amount
@@ -82,60 +246,21 @@ def evaluate_rules(amount, txn_times, account_created_at=None, past_txns=None, l
         link_pairs (list[(from_account, to_account)]): all account links for graph analysis
         account_activity (dict): account_id -> total txn count
         txn_pair (tuple): current transaction (from_account, to_account)
+        features (AccountFeatures): sliding-window features of from_account
+            (see feature_store). When given, replaces txn_times / past_txns
+            so rule cost does not grow with account history.
     
     Returns:
         triggered_rules (list[dict]): list of dicts with rule, severity, reason
     """
-    triggered_rules = []
-
-    # 1️ Large Transaction Amount
-    if amount >= LARGE_TXN_THRESHOLD:
-        triggered_rules.append({
-            "rule_triggered": "Large Transaction Amount",
-            "severity": "HIGH",
-            "reason": f"Transaction amount exceeds safe threshold (₹{LARGE_TXN_THRESHOLD})."
-        })
-
-    # 2️ Rapid Transactions
-    if txn_times and detect_rapid_transactions(txn_times):
-        triggered_rules.append({
-            "rule_triggered": "Rapid Transactions",
-            "severity": "MEDIUM",
-            "reason": f"Multiple transactions detected from this account within {RAPID_TXN_WINDOW_SEC} seconds."
-        })
-
-    # 3️ Mule / OTP scam detection
-    if account_created_at and past_txns is not None and detect_mule(account_created_at, txn_times[-1], past_txns):
-        triggered_rules.append({
-            "rule_triggered": "Mule / OTP Scam",
-            "severity": "HIGH",
-            "reason": "New account forwarding received funds quickly (potential mule or OTP scam)."
-        })
-
-    # 4️ Smurfing
-    if past_txns is not None and detect_smurfing(amount, past_txns):
-        triggered_rules.append({
-            "rule_triggered": "Smurfing",
-            "severity": "MEDIUM",
-            "reason": f"Multiple small transactions detected between same accounts (≥ {SMURF_TXN_THRESHOLD})."
-        })
-
-    # 5️ Circular Money Flow
-    if link_pairs is not None and txn_pair is not None and detect_circular_flow(link_pairs, txn_pair):
-        triggered_rules.append({
-            "rule_triggered": "Money Loop Detected",
-            "severity": "HIGH",
-            "reason": "Circular money flow detected between linked accounts."
-        })
-
-    # 6️ False / Temporary Accounts
-    if account_activity is not None:
-        false_accs = detect_false_accounts(account_activity)
-        if false_accs:
-            triggered_rules.append({
-                "rule_triggered": "False / Temporary Accounts",
-                "severity": "MEDIUM",
-                "reason": f"Accounts with minimal activity detected: {false_accs}."
-            })
-
-    return triggered_rules
\ No newline at end of file
+    return rule_registry.evaluate(
+        GROUP_TRANSACTION,
+        amount=amount,
+        txn_times=txn_times,
+        account_created_at=account_created_at,
+        past_txns=past_txns,
+        link_pairs=link_pairs,
+        account_activity=account_activity,
+        txn_pair=txn_pair,
+        features=features,
+    )
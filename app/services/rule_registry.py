@@ -0,0 +1,284 @@
+"""
+rule_registry.py
+
+Declarative registry of AML rules and the planner that evaluates them.
+
+Each Rule declares:
+- its severity and reason (the single source of alert severities)
+- the features it reads (needs), by name
+- a relative cost, and the group it runs in: "transaction" rules run on
+  the sender's features, "graph" rules once the new edge is in LinkGraph
+- the rules it yields to (unless): it is skipped when one of them hit
+
+For each group a RulePlan is compiled from the enabled rules: cheapest
+first (but after the rules they yield to), together with the union of the
+features they need. Features are computed by providers on first use and
+at most once per transaction, so a disabled or short-circuited rule never
+pays for its lookups (no layering search while "Layering Cycle" is
+disabled). Hits are reported in registration order whatever the
+evaluation order, so alert lists stay stable.
+
+Rules are declared next to their detection logic (rule_engine.py,
+layering.py) and can be enabled / disabled at runtime through the admin
+API; plans are recompiled on the next evaluation. The registry is per
+process: DISABLED_RULES (comma separated names) applies the same setting
+to every API / worker process at startup.
+"""
+
+import importlib
+import os
+import threading
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+DISABLED_RULES = {name.strip() for name in os.getenv("DISABLED_RULES", "").split(",") if name.strip()}
+
+# Modules declaring rules, imported on first use of the registry
+RULE_MODULES = ("app.services.rule_engine", "app.services.layering")
+
+GROUP_TRANSACTION = "transaction"
+GROUP_GRAPH = "graph"
+
+
+class Rule:
+    """
+    One AML rule.
+
+    `check(ctx)` returns a falsy value (no hit), True (hit with the
+    declared reason) or a string (hit with that reason). `reason` is a
+    string or a callable returning one, so reasons that quote thresholds
+    follow runtime changes.
+    """
+
+    __slots__ = ("name", "severity", "reason", "check", "needs", "cost", "groups", "unless", "enabled", "order")
+
+    def __init__(self, name: str, severity: str, reason, check, needs=(), cost: int = 1,
+                 groups=(GROUP_TRANSACTION,), unless=()):
+        self.name = name
+        self.severity = severity
+        self.reason = reason
+        self.check = check
+        self.needs = tuple(needs)
+        self.cost = cost
+        self.groups = tuple(groups)
+        self.unless = tuple(unless)
+        self.enabled = True
+        self.order = 0
+
+    def describe_reason(self) -> str:
+        return self.reason() if callable(self.reason) else self.reason
+
+    def hit(self, reason: str = None) -> dict:
+        """
+        Triggered-rule dict (rule_triggered, severity, reason) for generate_alerts.
+        """
+        return {
+            "rule_triggered": self.name,
+            "severity": self.severity,
+            "reason": reason or self.describe_reason(),
+        }
+
+
+class RuleContext:
+    """
+    Inputs of one evaluation plus the features computed from them so far.
+    """
+
+    __slots__ = ("_values", "_providers")
+
+    def __init__(self, providers: dict, inputs: dict):
+        # Features are memoized next to the inputs (names never overlap)
+        self._values = inputs
+        self._providers = providers
+
+    def get(self, name: str, default=None):
+        """
+        An input, or `default` when the caller did not pass it.
+        """
+        value = self._values.get(name)
+        return default if value is None else value
+
+    def __getitem__(self, feature: str):
+        """
+        A feature, computed by its provider on first access.
+        """
+        try:
+            return self._values[feature]
+        except KeyError:
+            value = self._values[feature] = self._providers[feature](self)
+            return value
+
+
+class RulePlan:
+    """
+    Compiled evaluation order of the enabled rules of one group.
+    """
+
+    __slots__ = ("group", "rules", "needs")
+
+    def __init__(self, group: str, rules: list):
+        self.group = group
+        self.rules = _evaluation_order(rules)
+        self.needs = sorted({feature for rule in self.rules for feature in rule.needs})
+
+    def evaluate(self, ctx: RuleContext) -> list[dict]:
+        hits = []
+        hit_names = set()
+        for rule in self.rules:
+            if rule.unless and hit_names.intersection(rule.unless):
+                continue
+            result = rule.check(ctx)
+            if result:
+                hit_names.add(rule.name)
+                hits.append((rule.order, rule.hit(result if isinstance(result, str) else None)))
+
+        if len(hits) > 1:
+            hits.sort(key=lambda h: h[0])
+        return [hit for _, hit in hits]
+
+    def describe(self) -> dict:
+        return {"group": self.group, "rules": [r.name for r in self.rules], "needs": self.needs}
+
+
+def _evaluation_order(rules: list) -> list:
+    """
+    Cheapest first, except that a rule always comes after the rules it yields to.
+    """
+    by_name = {r.name: r for r in rules}
+    ordered, placed = [], set()
+
+    def place(rule, visiting=()):
+        if rule.name in placed or rule.name in visiting:
+            return
+        for name in rule.unless:
+            if name in by_name:
+                place(by_name[name], visiting + (rule.name,))
+        placed.add(rule.name)
+        ordered.append(rule)
+
+    for rule in sorted(rules, key=lambda r: (r.cost, r.order)):
+        place(rule)
+    return ordered
+
+
+class RuleRegistry:
+    def __init__(self, disabled=()):
+        self._rules: dict[str, Rule] = {}
+        self._aliases: dict[str, str] = {}
+        self._providers: dict = {}
+        self._disabled = set(disabled)
+        self._plans: dict = {}
+        self._lock = threading.RLock()
+        self._modules_loaded = False
+
+    # ----------------------------
+    # Declaration
+    # ----------------------------
+    def register(self, rule: Rule) -> Rule:
+        with self._lock:
+            rule.order = len(self._rules)
+            rule.enabled = rule.name not in self._disabled
+            self._rules[rule.name] = rule
+            self._plans = {}
+        return rule
+
+    def provider(self, feature: str):
+        """
+        Decorator registering fn(ctx) as the provider of a feature.
+        """
+        def decorator(fn):
+            self._providers[feature] = fn
+            return fn
+        return decorator
+
+    def alias(self, old_name: str, name: str) -> None:
+        """
+        Makes an old rule name resolve to a registered rule (severity lookups).
+        """
+        self._aliases[old_name] = name
+
+    def _load_modules(self) -> None:
+        if self._modules_loaded:
+            return
+        self._modules_loaded = True
+        for module in RULE_MODULES:
+            importlib.import_module(module)
+
+    # ----------------------------
+    # Lookup
+    # ----------------------------
+    def get(self, name: str):
+        """
+        Rule by name or alias, or None.
+        """
+        self._load_modules()
+        return self._rules.get(self._aliases.get(name, name))
+
+    def severity(self, name: str):
+        rule = self.get(name)
+        return rule.severity if rule is not None else None
+
+    def rules(self) -> list:
+        self._load_modules()
+        return list(self._rules.values())
+
+    def is_enabled(self, name: str) -> bool:
+        rule = self.get(name)
+        return rule is not None and rule.enabled
+
+    def set_enabled(self, name: str, enabled: bool) -> Rule:
+        """
+        Enables / disables a rule for this process. Raises KeyError for unknown rules.
+        """
+        rule = self.get(name)
+        if rule is None:
+            raise KeyError(name)
+        with self._lock:
+            rule.enabled = enabled
+            self._plans = {}
+        return rule
+
+    # ----------------------------
+    # Evaluation
+    # ----------------------------
+    def plan(self, group: str) -> RulePlan:
+        plan = self._plans.get(group)
+        if plan is None:
+            self._load_modules()
+            with self._lock:
+                plan = RulePlan(group, [r for r in self._rules.values() if r.enabled and group in r.groups])
+                plans = dict(self._plans)
+                plans[group] = plan
+                self._plans = plans
+        return plan
+
+    def evaluate(self, group: str, **inputs) -> list[dict]:
+        """
+        Runs the enabled rules of a group over one transaction's inputs.
+
+        Returns:
+            list[dict]: triggered rules (rule_triggered, severity, reason)
+        """
+        plan = self.plan(group)
+        if not plan.rules:
+            return []
+        return plan.evaluate(RuleContext(self._providers, inputs))
+
+    def describe(self) -> list[dict]:
+        return [
+            {
+                "name": r.name,
+                "severity": r.severity,
+                "enabled": r.enabled,
+                "groups": list(r.groups),
+                "cost": r.cost,
+                "needs": list(r.needs),
+                "unless": list(r.unless),
+                "reason": r.describe_reason(),
+            }
+            for r in self.rules()
+        ]
+
+
+rule_registry = RuleRegistry(disabled=DISABLED_RULES)
@@ -0,0 +1,275 @@
+"""
+sharded_ingest.py
+
+Partitioned ingest: rule scoring spread over N worker processes by sender.
+
+Transactions are routed by a stable hash of from_account. The shard that
+owns a sender keeps that sender's sliding-window features and produces
+its alerts, so the risk deltas of an account always come from one
+process. Every shard still receives the whole batch and applies every
+edge to its own LinkGraph, in batch order, before scoring the next
+record: cross-shard edges are forwarded this way, so loop and layering
+searches see exactly the graph the single-process path would.
+
+Each batch is scored by all shards in parallel, then persisted by the
+coordinator in one unit of work (links, aggregates, alerts, risk), and
+committed before the next batch is dispatched, so feature rebuilds in
+the shards never miss or double-count a transaction.
+
+Rules and graph searches are the CPU-bound part of ingest and scale with
+the number of shards; the commit stays a single writer. Each shard holds
+a full replica of the link graph, so memory grows with the shard count.
+Use one ShardedIngest per process that ingests (a dedicated ingest
+process or worker --shards); other writers would not reach the replicas.
+
+Shards score without graph job results (network_risk): each would load
+its own copy at its own time, so the same batch could score differently
+per shard and per run.
+"""
+
+import logging
+import multiprocessing
+import os
+import zlib
+from queue import Empty
+
+from sqlalchemy.orm import Session
+
+from app.db import write_lock
+from app.models.transaction import STATUS_PROCESSED
+from app.services.feature_store import feature_store
+from app.services.graph_service import link_graph
+from app.services.ingest_service import (
+    MemoryJournal,
+    discard_memory_state,
+    invalidate_account_views,
+    new_transactions,
+    persist_scored,
+    score_transactions,
+    transaction_record,
+)
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+SHARD_COUNT = int(os.getenv("INGEST_SHARDS", str(os.cpu_count() or 1)))
+SHARD_REPLY_TIMEOUT_SEC = 120     # per batch, covers a shard's first graph warm-load
+SHARD_START_METHOD = "spawn"      # no inherited engine / locks from the parent
+
+
+def shard_of(account_id: str, shards: int) -> int:
+    """
+    Stable shard of an account (the same in every process, unlike hash()).
+    """
+    return zlib.crc32(account_id.encode()) % shards
+
+
+# ----------------------------
+# Shard process
+# ----------------------------
+def _shard_main(shard_id: int, shards: int, inbox, outbox) -> None:
+    """
+    Shard loop. Messages:
+    - ("score", batch_id, records): score owned senders, reply
+      (batch_id, shard_id, {txn_id: alerts}, error)
+    - ("discard",): take back the graph / feature updates of the last
+      batch (the coordinator rolled it back)
+    - ("stop",)
+    """
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+
+    def owns(account_id):
+        return shard_of(account_id, shards) == shard_id
+
+    journal = MemoryJournal()   # updates of the last scored batch
+
+    try:
+        while True:
+            message = inbox.get()
+            kind = message[0]
+
+            if kind == "stop":
+                return
+
+            if kind == "discard":
+                journal.revert()
+                continue
+
+            _, batch_id, records = message
+            journal = MemoryJournal()
+            try:
+                scored = score_transactions(db, records, owns, journal)
+                outbox.put((batch_id, shard_id, scored, None))
+            except Exception as e:
+                logger.exception("Shard %d failed on batch %d", shard_id, batch_id)
+                journal.revert()
+                outbox.put((batch_id, shard_id, None, f"{type(e).__name__}: {e}"))
+            finally:
+                # End the read transaction so the next batch sees the coordinator's commit
+                db.close()
+    finally:
+        db.close()
+
+
+# ----------------------------
+# Coordinator
+# ----------------------------
+class ShardedIngest:
+    """
+    Owns N shard processes and runs batches through them.
+
+        with ShardedIngest(shards=4) as sharded:
+            results = sharded.ingest(db, payloads)
+    """
+
+    def __init__(self, shards: int = SHARD_COUNT, reply_timeout: float = SHARD_REPLY_TIMEOUT_SEC,
+                 start_method: str = SHARD_START_METHOD):
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        self.shards = shards
+        self.reply_timeout = reply_timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._inboxes = []
+        self._outbox = None
+        self._processes = []
+        self._batch_id = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._processes)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._outbox = self._context.Queue()
+        for shard_id in range(self.shards):
+            inbox = self._context.Queue()
+            process = self._context.Process(
+                target=_shard_main,
+                args=(shard_id, self.shards, inbox, self._outbox),
+                name=f"ingest-shard-{shard_id}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+    def stop(self, timeout: float | None = 10) -> None:
+        for inbox in self._inboxes:
+            inbox.put(("stop",))
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._inboxes, self._processes, self._outbox = [], [], None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # ----------------------------
+    # Scoring
+    # ----------------------------
+    def score(self, records) -> dict:
+        """
+        Scores (id, from_account, to_account, amount, timestamp) records on
+        all shards in parallel.
+
+        Returns:
+            dict: transaction id -> alerts
+
+        Raises:
+            RuntimeError: a shard failed or did not answer in time (shard
+                state is discarded; the next batch reloads it)
+        """
+        self.start()
+        self._batch_id += 1
+        batch_id = self._batch_id
+
+        for inbox in self._inboxes:
+            inbox.put(("score", batch_id, records))
+
+        scored, errors, pending = {}, [], set(range(self.shards))
+        while pending:
+            try:
+                reply_id, shard_id, shard_scored, error = self._outbox.get(timeout=self.reply_timeout)
+            except Empty:
+                dead = [i for i in pending if not self._processes[i].is_alive()]
+                self.stop(timeout=1)
+                raise RuntimeError(f"Shards {sorted(pending)} did not answer (dead: {dead})")
+
+            if reply_id != batch_id:
+                continue  # late reply of an abandoned batch
+            pending.discard(shard_id)
+            if error is not None:
+                errors.append(f"shard {shard_id}: {error}")
+            else:
+                scored.update(shard_scored)
+
+        if errors:
+            self.discard()
+            raise RuntimeError("; ".join(errors))
+        return scored
+
+    def discard(self) -> None:
+        """
+        Takes back the shards' updates for the last batch (after a rollback).
+        """
+        for inbox in self._inboxes:
+            inbox.put(("discard",))
+
+    # ----------------------------
+    # Ingest
+    # ----------------------------
+    def process(self, db: Session, transactions, path: str = "sharded",
+                journal: MemoryJournal = None) -> list[dict]:
+        """
+        Sharded equivalent of ingest_service.process_transactions for rows
+        already added to the session. Does not commit; on failure roll
+        back, then call discard() and discard_memory_state(journal).
+        """
+        if not transactions:
+            return []
+
+        scored = self.score([transaction_record(t) for t in transactions])
+        results = persist_scored(db, transactions, scored, path)
+
+        # This process' own graph / features did not see these transactions
+        if link_graph.loaded:
+            graph_journal = journal.graph if journal is not None else None
+            for t in transactions:
+                link_graph.add_edge(t.from_account, t.to_account, t.timestamp, t.amount, graph_journal)
+        feature_store.invalidate({t.from_account for t in transactions})
+        return results
+
+    def ingest(self, db: Session, payloads, path: str = "sharded") -> list[dict]:
+        """
+        Sharded equivalent of ingest_service.ingest_batch: one unit of work,
+        committed once, results in payload order.
+        """
+        if not payloads:
+            return []
+
+        journal = MemoryJournal()
+
+        with write_lock(db):
+            try:
+                transactions = new_transactions(db, payloads, STATUS_PROCESSED)
+                results = self.process(db, transactions, path, journal)
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.discard()
+                discard_memory_state(journal)
+                raise
+
+        invalidate_account_views(transactions)
+        return results
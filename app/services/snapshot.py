@@ -0,0 +1,557 @@
+"""
+snapshot.py
+
+Memory-mapped columnar snapshots of transactions, links and alerts for
+analytics and rule backtests.
+
+An export writes one directory:
+
+    manifest.json                 row counts, column dtypes, small dictionaries
+    accounts.offsets.bin / .data  account dictionary (code -> id)
+    transactions.<column>.bin     one raw little-endian array per column
+    links.<column>.bin
+    alerts.<column>.bin
+
+- numbers and times are fixed-width arrays (amount float64, timestamp
+  datetime64[us], link strength int64)
+- account ids are dictionary-encoded: int32 codes into accounts, in
+  first-seen order
+- rule / severity / status names are int16 codes into lists kept in the
+  manifest
+- other strings (transaction / alert ids) are Arrow-style offsets (int64)
+  plus a UTF-8 data blob
+
+open_snapshot maps every column with np.memmap (read-only): opening is a
+manifest read, columns are zero-copy views paged in on first touch, and
+processes that open the same snapshot share the OS page cache instead of
+holding their own copy. Transactions are stored in (timestamp, id) order,
+archived months included, so time ranges are binary-search slices.
+
+backtest() runs vector_rules.evaluate_columnar straight on the mapped
+columns (account codes stand in for ids), optionally with rule setting
+overrides like replay.
+
+    python -m app.services.snapshot export --out snapshots/2026-10
+    python -m app.services.snapshot backtest --path snapshots/2026-10 --set SMURF_TXN_THRESHOLD=3
+"""
+
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import AccountLink, Alert, Transaction
+from app.services.pagination import iter_keyset
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+SNAPSHOT_CHUNK = 50_000      # rows read / written per batch
+SNAPSHOT_VERSION = 1
+
+MANIFEST = "manifest.json"
+NULL_CODE = -1               # missing account / dictionary value
+
+TRANSACTION_COLUMNS = {
+    "id": "str",
+    "from_account": "int32",
+    "to_account": "int32",
+    "amount": "float64",
+    "timestamp": "datetime64[us]",
+    "status": "int16",
+}
+LINK_COLUMNS = {
+    "account_a": "int32",
+    "account_b": "int32",
+    "link_strength": "int64",
+}
+ALERT_COLUMNS = {
+    "id": "str",
+    "transaction_id": "str",
+    "account_id": "int32",
+    "counterparty_id": "int32",
+    "rule_triggered": "int16",
+    "severity": "int16",
+    "created_at": "datetime64[us]",
+}
+
+
+# ----------------------------
+# Column files
+# ----------------------------
+class _Dictionary:
+    """
+    Value -> code in first-seen order.
+    """
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values) -> list:
+        codes = self.codes
+        out = []
+        for value in values:
+            if value is None:
+                out.append(NULL_CODE)
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(codes)
+            out.append(code)
+        return out
+
+    def values(self) -> list:
+        return list(self.codes)
+
+
+class _StringWriter:
+    def __init__(self, path: str):
+        self._offsets = open(path + ".offsets.bin", "wb")
+        self._data = open(path + ".data.bin", "wb")
+        self._end = 0
+        self._offsets.write(np.zeros(1, dtype="<i8").tobytes())
+
+    def write(self, values) -> None:
+        encoded = [v.encode() for v in values]
+        lengths = np.fromiter(map(len, encoded), dtype="<i8", count=len(encoded))
+        self._offsets.write((self._end + np.cumsum(lengths)).astype("<i8").tobytes())
+        self._data.write(b"".join(encoded))
+        self._end += int(lengths.sum())
+
+    def close(self) -> None:
+        self._offsets.close()
+        self._data.close()
+
+
+class _TableWriter:
+    """
+    Appends chunks of column values to <prefix>.<column>.bin files.
+    """
+
+    def __init__(self, directory: str, table: str, columns: dict):
+        self.table = table
+        self.columns = columns
+        self.rows = 0
+        self._files = {}
+        for name, dtype in columns.items():
+            path = os.path.join(directory, f"{table}.{name}")
+            self._files[name] = _StringWriter(path) if dtype == "str" else open(path + ".bin", "wb")
+
+    def write(self, chunk: dict) -> None:
+        for name, dtype in self.columns.items():
+            values = chunk[name]
+            if dtype == "str":
+                self._files[name].write(values)
+            else:
+                self._files[name].write(np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<")).tobytes())
+        self.rows += len(chunk[next(iter(self.columns))])
+
+    def close(self) -> dict:
+        for f in self._files.values():
+            f.close()
+        return {"rows": self.rows, "columns": self.columns}
+
+
+# ----------------------------
+# Export
+# ----------------------------
+def _batches(rows, size: int = SNAPSHOT_CHUNK):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _transaction_chunks(db: Session, include_archive: bool):
+    """
+    (id, from, to, amount, timestamp, status) tuples in (timestamp, id)
+    order: archived months first (all older than the hot tier), then the
+    transactions table.
+    """
+    if include_archive:
+        from app.services.cold_storage import iter_cold_rows
+
+        chunk = []
+        for row in iter_cold_rows(db, descending=False):
+            chunk.append((row["id"], row["from_account"], row["to_account"],
+                          row["amount"], row["timestamp"], row["status"]))
+            if len(chunk) >= SNAPSHOT_CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    query = db.query(
+        Transaction.id,
+        Transaction.from_account,
+        Transaction.to_account,
+        Transaction.amount,
+        Transaction.timestamp,
+        Transaction.status,
+    )
+    for rows in iter_keyset(query, Transaction.timestamp, Transaction.id, SNAPSHOT_CHUNK):
+        yield rows
+
+
+def export_snapshot(db: Session, path: str, include_archive: bool = True) -> dict:
+    """
+    Writes a snapshot directory (replacing an existing one at `path` once
+    the new one is complete).
+
+    On PostgreSQL the export reads in one REPEATABLE READ transaction, on
+    SQLite (WAL) in one read transaction, so the three tables are
+    consistent with each other.
+
+    Args:
+        db (Session): DB session with no pending writes
+        path (str): snapshot directory
+        include_archive (bool): also export archived months (cold_storage)
+
+    Returns:
+        dict: the manifest
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    tmp_path = path.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    accounts = _Dictionary()
+    statuses, rules, severities = _Dictionary(), _Dictionary(), _Dictionary()
+
+    try:
+        # STEP 1 — Transactions
+        writer = _TableWriter(tmp_path, "transactions", TRANSACTION_COLUMNS)
+        for rows in _transaction_chunks(db, include_archive):
+            ids, froms, tos, amounts, times, status = zip(*rows)
+            writer.write({
+                "id": ids,
+                "from_account": accounts.encode(froms),
+                "to_account": accounts.encode(tos),
+                "amount": amounts,
+                "timestamp": times,
+                "status": statuses.encode(status),
+            })
+        transactions = writer.close()
+
+        # STEP 2 — Links
+        writer = _TableWriter(tmp_path, "links", LINK_COLUMNS)
+        query = db.query(AccountLink.account_a, AccountLink.account_b, AccountLink.link_strength)
+        for rows in _batches(query.yield_per(SNAPSHOT_CHUNK)):
+            a, b, strength = zip(*rows)
+            writer.write({
+                "account_a": accounts.encode(a),
+                "account_b": accounts.encode(b),
+                "link_strength": [s or 1 for s in strength],
+            })
+        links = writer.close()
+
+        # STEP 3 — Alerts
+        writer = _TableWriter(tmp_path, "alerts", ALERT_COLUMNS)
+        query = db.query(
+            Alert.id,
+            Alert.transaction_id,
+            Alert.account_id,
+            Alert.counterparty_id,
+            Alert.rule_triggered,
+            Alert.severity,
+            Alert.created_at,
+        )
+        for rows in iter_keyset(query, Alert.created_at, Alert.id, SNAPSHOT_CHUNK):
+            ids, txn_ids, acc, counterparty, rule, severity, created = zip(*rows)
+            writer.write({
+                "id": ids,
+                "transaction_id": txn_ids,
+                "account_id": accounts.encode(acc),
+                "counterparty_id": accounts.encode(counterparty),
+                "rule_triggered": rules.encode(rule),
+                "severity": severities.encode(severity),
+                "created_at": created,
+            })
+        alerts = writer.close()
+
+        # STEP 4 — Dictionaries + manifest
+        account_writer = _StringWriter(os.path.join(tmp_path, "accounts"))
+        account_ids = accounts.values()
+        for i in range(0, len(account_ids), SNAPSHOT_CHUNK):
+            account_writer.write(account_ids[i:i + SNAPSHOT_CHUNK])
+        account_writer.close()
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": datetime.utcnow().isoformat(),
+            "accounts": len(account_ids),
+            "tables": {"transactions": transactions, "links": links, "alerts": alerts},
+            "dictionaries": {
+                "transactions.status": statuses.values(),
+                "alerts.rule_triggered": rules.values(),
+                "alerts.severity": severities.values(),
+            },
+        }
+        with open(os.path.join(tmp_path, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    finally:
+        db.rollback()  # end the read transaction
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+# ----------------------------
+# Loading
+# ----------------------------
+def _map(path: str, dtype: str, rows: int) -> np.ndarray:
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+
+class StringColumn:
+    """
+    Read-only string column over mapped offsets / data files.
+    """
+
+    def __init__(self, path: str, rows: int):
+        self.offsets = _map(path + ".offsets.bin", "int64", rows + 1)
+        data_size = int(self.offsets[-1]) if rows else 0
+        self.data = _map(path + ".data.bin", "uint8", data_size)
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def take(self, indices) -> list:
+        return [self[int(i)] for i in indices]
+
+    def to_list(self) -> list:
+        blob = bytes(self.data)
+        offsets = self.offsets.tolist()
+        return [blob[offsets[i]:offsets[i + 1]].decode() for i in range(len(self))]
+
+
+class Table:
+    """
+    Columns of one snapshot table: numpy memmaps, or StringColumn for
+    "str" columns. Dictionary-coded columns are decoded with
+    Snapshot.decode.
+    """
+
+    def __init__(self, directory: str, name: str, meta: dict):
+        self.name = name
+        self.rows = meta["rows"]
+        self.columns = meta["columns"]
+        self._directory = directory
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, column: str):
+        if column not in self._cache:
+            dtype = self.columns[column]  # KeyError for unknown columns
+            path = os.path.join(self._directory, f"{self.name}.{column}")
+            self._cache[column] = (
+                StringColumn(path, self.rows) if dtype == "str" else _map(path + ".bin", dtype, self.rows)
+            )
+        return self._cache[column]
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.manifest.get('version')!r}")
+
+        self.path = path
+        self.tables = {name: Table(path, name, meta) for name, meta in self.manifest["tables"].items()}
+        self.accounts = StringColumn(os.path.join(path, "accounts"), self.manifest["accounts"])
+        self._account_ids = None
+        self._account_codes = None
+
+    @property
+    def transactions(self) -> Table:
+        return self.tables["transactions"]
+
+    @property
+    def links(self) -> Table:
+        return self.tables["links"]
+
+    @property
+    def alerts(self) -> Table:
+        return self.tables["alerts"]
+
+    # ----------------------------
+    # Dictionaries
+    # ----------------------------
+    def account_ids(self) -> np.ndarray:
+        """
+        Account id per code (object array, decoded once).
+        """
+        if self._account_ids is None:
+            self._account_ids = np.array(self.accounts.to_list(), dtype=object)
+        return self._account_ids
+
+    def account_code(self, account_id: str) -> int:
+        if self._account_codes is None:
+            self._account_codes = {a: i for i, a in enumerate(self.account_ids())}
+        return self._account_codes.get(account_id, NULL_CODE)
+
+    def decode(self, table: str, column: str, codes) -> np.ndarray:
+        """
+        Values of a dictionary-coded column (None for NULL_CODE).
+        """
+        codes = np.asarray(codes)
+        if column in ("from_account", "to_account", "account_a", "account_b", "account_id", "counterparty_id"):
+            values = self.account_ids()
+        else:
+            values = np.array(self.manifest["dictionaries"][f"{table}.{column}"], dtype=object)
+        out = np.empty(len(codes), dtype=object)
+        valid = codes != NULL_CODE
+        out[valid] = values[codes[valid]]
+        return out
+
+    # ----------------------------
+    # Slicing / graph
+    # ----------------------------
+    def time_range(self, start_time: datetime = None, end_time: datetime = None) -> slice:
+        """
+        Rows of transactions with start_time <= timestamp <= end_time.
+        """
+        timestamps = self.transactions["timestamp"]
+        lo = 0 if start_time is None else int(np.searchsorted(timestamps, np.datetime64(start_time, "us"), "left"))
+        hi = len(timestamps) if end_time is None else int(
+            np.searchsorted(timestamps, np.datetime64(end_time, "us"), "right")
+        )
+        return slice(lo, max(lo, hi))
+
+    def adjacency(self):
+        """
+        CSR adjacency of the link graph over account codes.
+
+        Returns:
+            (offsets, targets, strengths): successors of code c are
+                targets[offsets[c]:offsets[c + 1]]
+        """
+        a, b = self.links["account_a"], self.links["account_b"]
+        order = np.argsort(a, kind="stable")
+        counts = np.bincount(a, minlength=len(self.accounts))
+        offsets = np.zeros(len(self.accounts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets, np.asarray(b)[order], np.asarray(self.links["link_strength"])[order]
+
+
+def open_snapshot(path: str) -> Snapshot:
+    return Snapshot(path)
+
+
+# ----------------------------
+# Backtest
+# ----------------------------
+def backtest(snapshot: Snapshot, start_time: datetime = None, end_time: datetime = None,
+             overrides: dict = None) -> dict:
+    """
+    Re-scores the snapshot's transactions with the columnar rule engine
+    (current thresholds, plus overrides) as if ingested in order from an
+    empty state.
+
+    Returns:
+        dict: {"rows": slice of scored transaction rows, "masks": rule -> mask,
+            "hits": rule -> count}
+    """
+    from app.services.replay import threshold_overrides
+    from app.services.vector_rules import evaluate_columnar
+
+    rows = snapshot.time_range(start_time, end_time)
+    txns = snapshot.transactions
+    with threshold_overrides(overrides or {}):
+        masks = evaluate_columnar(
+            txns["from_account"][rows],
+            txns["to_account"][rows],
+            txns["amount"][rows],
+            txns["timestamp"][rows],
+        )
+    return {
+        "rows": rows,
+        "masks": masks,
+        "hits": {name: int(np.count_nonzero(mask)) for name, mask in masks.items()},
+    }
+
+
+def stored_alert_counts(snapshot: Snapshot) -> dict:
+    """
+    Alerts per rule in the snapshot's alerts table.
+    """
+    names = snapshot.manifest["dictionaries"]["alerts.rule_triggered"]
+    codes = np.asarray(snapshot.alerts["rule_triggered"])
+    counts = np.bincount(codes[codes != NULL_CODE], minlength=len(names))
+    return {name: int(count) for name, count in zip(names, counts)}
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def main(argv=None) -> dict:
+    from app.services.replay import _parse_timestamp, parse_overrides
+
+    parser = argparse.ArgumentParser(description="Columnar snapshots of AML history")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write a snapshot of the database")
+    export.add_argument("--out", required=True, help="snapshot directory (replaced if it exists)")
+    export.add_argument("--hot-only", action="store_true", help="skip archived months")
+
+    run = commands.add_parser("backtest", help="re-score a snapshot with the columnar rule engine")
+    run.add_argument("--path", required=True, help="snapshot directory")
+    run.add_argument("--start-time", type=_parse_timestamp, help="first timestamp (ISO)")
+    run.add_argument("--end-time", type=_parse_timestamp, help="last timestamp (ISO)")
+    run.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                     help="override a rule setting, e.g. LARGE_TXN_THRESHOLD=50000 (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        from app.db import SessionLocal
+
+        db = SessionLocal()
+        try:
+            manifest = export_snapshot(db, args.out, include_archive=not args.hot_only)
+        finally:
+            db.close()
+        result = {
+            "path": args.out,
+            "accounts": manifest["accounts"],
+            **{name: meta["rows"] for name, meta in manifest["tables"].items()},
+        }
+    else:
+        try:
+            overrides = parse_overrides(args.overrides)
+        except ValueError as e:
+            parser.error(str(e))
+        snapshot = open_snapshot(args.path)
+        outcome = backtest(snapshot, args.start_time, args.end_time, overrides)
+        rows = outcome["rows"]
+        result = {
+            "transactions": rows.stop - rows.start,
+            "overrides": overrides,
+            "hits": outcome["hits"],
+            "stored_alerts": stored_alert_counts(snapshot),
+        }
+
+    print(json.dumps(result, indent=2, default=str))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+upserts.py
+
+Dialect-aware single-statement upserts (INSERT ... ON CONFLICT) for
+SQLite and PostgreSQL. They rely on the unique indexes declared on the
+models; run migrate.py on databases created before those existed.
+"""
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import AccountLink
+
+
+def dialect_insert(db: Session, table):
+    """
+    Returns an INSERT construct for the session's dialect that supports
+    on_conflict_do_nothing / on_conflict_do_update.
+    """
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(table)
+    if name == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {name}")
+
+
+def upsert_links(db: Session, pair_counts) -> set:
+    """
+    Adds `count` to link_strength for each (account_a, account_b) pair,
+    inserting pairs that do not exist yet. One statement per call.
+
+    Args:
+        db (Session): DB session (not committed)
+        pair_counts (dict): (account_a, account_b) -> number of new transactions
+
+    Returns:
+        set: pairs that did not exist before this call
+    """
+    if not pair_counts:
+        return set()
+
+    stmt = dialect_insert(db, AccountLink.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AccountLink.account_a, AccountLink.account_b],
+        set_={"link_strength": AccountLink.link_strength + stmt.excluded.link_strength},
+    ).returning(AccountLink.account_a, AccountLink.account_b, AccountLink.link_strength)
+
+    rows = db.execute(stmt, [
+        {"account_a": a, "account_b": b, "link_strength": count}
+        for (a, b), count in pair_counts.items()
+    ])
+
+    # An updated row is always stronger than the count just added
+    return {(a, b) for a, b, strength in rows if strength == pair_counts[(a, b)]}
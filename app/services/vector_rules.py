@@ -0,0 +1,258 @@
+"""
+vector_rules.py
+
+Columnar (NumPy) evaluation of the rule engine for backfills and replays.
+
+evaluate_rules scores one transaction at a time; re-scoring months of
+history after a threshold change that way is far too slow. This module
+takes whole columns (from, to, amount, timestamp) and computes every
+rule hit with sort / group / diff operations, reproducing what the
+streaming path (feature_store + evaluate_rules) would have raised if the
+same transactions had been ingested in timestamp order from an empty state:
+
+- Large Transaction Amount : amount >= LARGE_TXN_THRESHOLD
+- Rapid Transactions       : a gap < RAPID_TXN_WINDOW_SEC among the sender's
+                             last FEATURE_WINDOW_SIZE timestamps
+- Mule / OTP Scam          : only when sender creation times are given
+- Smurfing                 : >= SMURF_TXN_THRESHOLD small transfers to the
+                             same counterparty so far
+
+Thresholds are read from rule_engine at call time, so changing e.g.
+rule_engine.RAPID_TXN_WINDOW_SEC before calling evaluate_columnar re-scores
+with the new value.
+"""
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Transaction
+from app.services import rule_engine
+from app.services.feature_store import FEATURE_WINDOW_SIZE
+from app.services.rule_engine import rule_hit
+from app.services.rule_registry import rule_registry
+
+# Order in which evaluate_rules appends hits, kept for identical alert lists
+RULE_ORDER = [
+    "Large Transaction Amount",
+    "Rapid Transactions",
+    "Mule / OTP Scam",
+    "Smurfing",
+]
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+def _to_seconds(timestamps) -> np.ndarray:
+    """
+    Converts datetimes / datetime64 values to float seconds since epoch.
+    """
+    ts = np.asarray(timestamps)
+    if not np.issubdtype(ts.dtype, np.number):
+        ts = ts.astype("datetime64[us]").astype(np.int64) / 1e6
+    return ts.astype(np.float64)
+
+
+def _encode(*columns) -> np.ndarray:
+    """
+    Dictionary-encodes one or more key columns into a single int64 group code.
+    """
+    code = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        uniques, inverse = np.unique(np.asarray(col), return_inverse=True)
+        code = code * len(uniques) + inverse.ravel()
+    return code
+
+
+def _group_positions(keys: np.ndarray, times: np.ndarray):
+    """
+    Sorts rows by (key, time, input order) and returns
+    (order, rank within group, group start position for each sorted row).
+    """
+    n = len(keys)
+    order = np.lexsort((np.arange(n), times, keys))
+    sorted_keys = keys[order]
+
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = sorted_keys[1:] != sorted_keys[:-1]
+
+    positions = np.arange(n)
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    rank = positions - group_start
+
+    return order, rank, group_start
+
+
+# ----------------------------
+# Rules
+# ----------------------------
+def rapid_mask(from_codes, seconds, window: int = FEATURE_WINDOW_SIZE) -> np.ndarray:
+    """
+    Rapid Transactions over the sender's last `window` timestamps
+    (window - 1 consecutive gaps, current transaction included).
+    """
+    n = len(from_codes)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    order, rank, group_start = _group_positions(from_codes, seconds)
+    sorted_times = seconds[order]
+
+    gaps = np.diff(sorted_times, prepend=sorted_times[0])
+    short = (gaps < rule_engine.RAPID_TXN_WINDOW_SEC) & (rank > 0)
+    cum = np.cumsum(short)
+
+    positions = np.arange(n)
+    lo = np.maximum(group_start + 1, positions - window + 2)
+    has_gap = lo <= positions
+    before = np.where(has_gap, cum[np.maximum(lo - 1, 0)], cum)
+    hits_sorted = has_gap & ((cum - before) > 0)
+
+    hits = np.empty(n, dtype=bool)
+    hits[order] = hits_sorted
+    return hits
+
+
+def smurfing_mask(pair_codes, seconds, amounts) -> np.ndarray:
+    """
+    Smurfing: running count of small transfers per (from, to) pair,
+    current transaction included.
+    """
+    n = len(pair_codes)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    order, _, group_start = _group_positions(pair_codes, seconds)
+    small = (amounts[order] <= rule_engine.SMURF_TXN_AMOUNT).astype(np.int64)
+    cum = np.cumsum(small)
+    before = np.where(group_start > 0, cum[np.maximum(group_start - 1, 0)], 0)
+    running = cum - before
+
+    hits = np.empty(n, dtype=bool)
+    hits[order] = running >= rule_engine.SMURF_TXN_THRESHOLD
+    return hits
+
+
+def mule_mask(from_codes, seconds, created_seconds) -> np.ndarray:
+    """
+    Mule / OTP Scam: sender younger than NEW_ACCOUNT_AGE_HOURS with at most
+    two transactions so far (current one included).
+    """
+    n = len(from_codes)
+    order, rank, _ = _group_positions(from_codes, seconds)
+
+    count = np.empty(n, dtype=np.int64)
+    count[order] = rank + 1
+
+    age_hours = (seconds - created_seconds) / 3600
+    return (age_hours <= rule_engine.NEW_ACCOUNT_AGE_HOURS) & (count <= 2)
+
+
+def evaluate_columnar(from_accounts, to_accounts, amounts, timestamps,
+                      account_created_at=None, window: int = FEATURE_WINDOW_SIZE) -> dict:
+    """
+    Computes all rule hits for a set of transactions at once.
+
+    Args:
+        from_accounts, to_accounts (array-like): account ids (any hashable dtype)
+        amounts (array-like[float]): transaction amounts
+        timestamps (array-like): datetimes, datetime64 or epoch seconds
+        account_created_at (array-like, optional): sender creation time per
+            row; enables the mule rule like evaluate_rules does
+        window (int): feature window size (FEATURE_WINDOW_SIZE)
+
+    Returns:
+        dict: rule name -> boolean mask aligned with the input rows, for
+            the rules enabled in the registry
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    seconds = _to_seconds(timestamps)
+    from_codes = _encode(from_accounts)
+    pair_codes = _encode(from_accounts, to_accounts)
+
+    # Rules disabled in the registry are neither computed nor reported
+    enabled = rule_registry.is_enabled
+    masks = {}
+    if enabled("Large Transaction Amount"):
+        masks["Large Transaction Amount"] = amounts >= rule_engine.LARGE_TXN_THRESHOLD
+    if enabled("Rapid Transactions"):
+        masks["Rapid Transactions"] = rapid_mask(from_codes, seconds, window)
+    if enabled("Smurfing"):
+        masks["Smurfing"] = smurfing_mask(pair_codes, seconds, amounts)
+
+    if account_created_at is not None and enabled("Mule / OTP Scam"):
+        masks["Mule / OTP Scam"] = mule_mask(from_codes, seconds, _to_seconds(account_created_at))
+
+    return masks
+
+
+def masks_to_alerts(transaction_ids, masks: dict) -> list[dict]:
+    """
+    Expands rule masks into the triggered-rule dicts evaluate_rules returns,
+    one list entry per hit, tagged with the transaction id.
+    """
+    transaction_ids = np.asarray(transaction_ids).tolist()
+    names = [name for name in RULE_ORDER if name in masks]
+    if not names:
+        return []
+
+    rows = np.concatenate([np.flatnonzero(masks[name]) for name in names])
+    rule_idx = np.concatenate([
+        np.full(int(np.count_nonzero(masks[name])), i) for i, name in enumerate(names)
+    ])
+    order = np.lexsort((rule_idx, rows))
+
+    hits = {name: rule_hit(name) for name in names}
+    return [
+        {"transaction_id": transaction_ids[rows[k]], **hits[names[rule_idx[k]]]}
+        for k in order
+    ]
+
+
+# ----------------------------
+# DB backfill
+# ----------------------------
+def load_columns(db: Session, start_time=None, end_time=None, chunk_size: int = 50000) -> dict:
+    """
+    Streams (id, from, to, amount, timestamp) out of the transactions table
+    into NumPy columns without building ORM objects.
+    """
+    query = db.query(
+        Transaction.id,
+        Transaction.from_account,
+        Transaction.to_account,
+        Transaction.amount,
+        Transaction.timestamp,
+    )
+    if start_time:
+        query = query.filter(Transaction.timestamp >= start_time)
+    if end_time:
+        query = query.filter(Transaction.timestamp <= end_time)
+
+    ids, froms, tos, amounts, times = [], [], [], [], []
+    for row in query.order_by(Transaction.timestamp.asc()).yield_per(chunk_size):
+        ids.append(row[0])
+        froms.append(row[1])
+        tos.append(row[2])
+        amounts.append(row[3])
+        times.append(row[4])
+
+    return {
+        "id": np.array(ids, dtype=object),
+        "from_account": np.array(froms, dtype=object),
+        "to_account": np.array(tos, dtype=object),
+        "amount": np.array(amounts, dtype=np.float64),
+        "timestamp": np.array(times, dtype="datetime64[us]"),
+    }
+
+
+def rescore_history(db: Session, start_time=None, end_time=None) -> list[dict]:
+    """
+    Re-scores stored transactions with the current thresholds and returns
+    the alerts the streaming path would raise for them.
+    """
+    cols = load_columns(db, start_time, end_time)
+    masks = evaluate_columnar(
+        cols["from_account"], cols["to_account"], cols["amount"], cols["timestamp"]
+    )
+    return masks_to_alerts(cols["id"], masks)
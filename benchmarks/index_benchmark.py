@@ -0,0 +1,207 @@
+"""
+index_benchmark.py
+
+Query latency on the hot lookup paths before and after the model indexes,
+on a synthetic SQLite database (default 1M transactions).
+
+The database is populated once without secondary indexes, measured, then
+upgraded with app.migrations.create_missing_indexes and measured again.
+
+Usage:
+    python -m benchmarks.index_benchmark --rows 1000000 --out benchmarks/results/indexes.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app.db import Base
+from app.migrations import create_missing_indexes
+import app.models  # noqa: F401
+
+QUERIES = {
+    "sender_recent_history": (
+        "SELECT timestamp FROM transactions WHERE from_account = :acc "
+        "ORDER BY timestamp DESC LIMIT 20"
+    ),
+    "account_transactions_page": (
+        "SELECT id FROM transactions WHERE from_account = :acc OR to_account = :acc "
+        "ORDER BY timestamp DESC LIMIT 10"
+    ),
+    "link_pair_lookup": (
+        "SELECT link_strength FROM account_links WHERE account_a = :acc AND account_b = :other"
+    ),
+    "alerts_by_transaction": "SELECT id FROM alerts WHERE transaction_id = :txn",
+    "alerts_recent": "SELECT id FROM alerts WHERE created_at >= :since ORDER BY created_at DESC LIMIT 50",
+    "risk_history": (
+        "SELECT new_score FROM risk_audits WHERE account_id = :acc ORDER BY timestamp DESC"
+    ),
+    "queue_claim_scan": (
+        "SELECT id FROM txn_queue WHERE status = 'pending' ORDER BY created_at LIMIT 100"
+    ),
+}
+
+
+def populate(engine, rows: int, accounts: int, seed: int = 7) -> dict:
+    """
+    Fills the DB with `rows` transactions plus links, alerts, audits and queue rows.
+    Returns sample keys used as query parameters.
+    """
+    rng = random.Random(seed)
+    account_ids = [str(uuid.uuid4()) for _ in range(accounts)]
+    start = datetime(2025, 1, 1)
+    chunk = 50000
+    sample_txns, pairs = [], set()
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO accounts (id, name, risk_score, created_at) VALUES (:id, :name, 0, :ts)"),
+            [{"id": a, "name": f"User-{a[:4]}", "ts": start} for a in account_ids],
+        )
+
+        for offset in range(0, rows, chunk):
+            batch, alerts, audits = [], [], []
+            for i in range(offset, min(offset + chunk, rows)):
+                a, b = rng.sample(account_ids, 2)
+                txn_id = str(uuid.uuid4())
+                ts = start + timedelta(seconds=i * 30)
+                batch.append({"id": txn_id, "a": a, "b": b, "amt": rng.uniform(1, 200000), "ts": ts})
+                pairs.add((a, b))
+                if rng.random() < 0.05:
+                    alerts.append({"id": str(uuid.uuid4()), "txn": txn_id, "ts": ts})
+                    audits.append({"id": str(uuid.uuid4()), "acc": a, "ts": ts})
+                if len(sample_txns) < 1000 and rng.random() < 0.01:
+                    sample_txns.append(txn_id)
+
+            conn.execute(text(
+                "INSERT INTO transactions (id, from_account, to_account, amount, timestamp, status) "
+                "VALUES (:id, :a, :b, :amt, :ts, 'processed')"
+            ), batch)
+            if alerts:
+                conn.execute(text(
+                    "INSERT INTO alerts (id, transaction_id, rule_triggered, severity, reason, created_at) "
+                    "VALUES (:id, :txn, 'Large Transaction Amount', 'HIGH', '', :ts)"
+                ), alerts)
+                conn.execute(text(
+                    "INSERT INTO risk_audits (id, account_id, old_score, new_score, reason, timestamp) "
+                    "VALUES (:id, :acc, 0, 30, '', :ts)"
+                ), audits)
+
+        conn.execute(
+            text("INSERT INTO account_links (id, account_a, account_b, link_strength) VALUES (:id, :a, :b, 1)"),
+            [{"id": str(uuid.uuid4()), "a": a, "b": b} for a, b in pairs],
+        )
+
+        queue_rows = min(rows // 10, 100000)
+        conn.execute(text(
+            "INSERT INTO txn_queue (id, txn_id, status, retries, created_at, updated_at) "
+            "VALUES (:id, :txn, :status, 0, :ts, :ts)"
+        ), [
+            {
+                "id": uuid.uuid4().hex,
+                "txn": uuid.uuid4().hex,
+                "status": "pending" if i >= queue_rows - 100 else "done",
+                "ts": start + timedelta(seconds=i),
+            }
+            for i in range(queue_rows)
+        ])
+
+    return {
+        "accounts": account_ids,
+        "pairs": rng.sample(sorted(pairs), min(1000, len(pairs))),
+        "txns": sample_txns or [str(uuid.uuid4())],
+        "since": start + timedelta(seconds=(rows - 1000) * 30),
+    }
+
+
+def measure(engine, samples: dict, repeats: int, seed: int = 11) -> dict:
+    rng = random.Random(seed)
+    results = {}
+
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            stmt = text(sql)
+            timings = []
+            for _ in range(repeats):
+                a, b = rng.choice(samples["pairs"])
+                params = {
+                    "acc": rng.choice([a, rng.choice(samples["accounts"])]),
+                    "other": b,
+                    "txn": rng.choice(samples["txns"]),
+                    "since": samples["since"],
+                }
+                if "account_b" in sql:
+                    params["acc"] = a
+                started = time.perf_counter()
+                conn.execute(stmt, params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+            }
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index before/after query latency benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=50_000)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--out", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="aml-index-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+
+    # Tables without secondary indexes = the pre-migration schema
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    started = time.perf_counter()
+    samples = populate(engine, args.rows, args.accounts)
+    print(f"Populated {args.rows} transactions in {time.perf_counter() - started:.1f}s")
+
+    before = measure(engine, samples, args.repeats)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        create_missing_indexes(conn)
+    index_build_sec = time.perf_counter() - started
+
+    after = measure(engine, samples, args.repeats)
+
+    report = {
+        "rows": args.rows,
+        "accounts": args.accounts,
+        "index_build_sec": round(index_build_sec, 2),
+        "queries": {
+            name: {"before": before[name], "after": after[name]} for name in QUERIES
+        },
+    }
+
+    print(f"{'query':<28}{'before p50 ms':>15}{'after p50 ms':>15}")
+    for name in QUERIES:
+        print(f"{name:<28}{before[name]['p50_ms']:>15.3f}{after[name]['p50_ms']:>15.3f}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+"""
+ingest_benchmark.py
+
+Throughput / latency benchmark for the ingest pipeline on synthetic traffic
+(benchmarks/synthetic.py) against a fresh local SQLite database.
+
+Targets:
+- single : POST /transactions handler (ingest_transaction) called directly
+- concurrent : the same handler from --clients threads, one commit per transaction
+- group  : --clients threads through GroupCommitter (one commit per group,
+           --group-window-ms)
+- batch  : ingest_service.ingest_batch in chunks of --batch-size
+- queue  : enqueue_transactions + worker pool draining txn_queue
+- sharded : ShardedIngest.ingest in chunks of --batch-size on --shards processes
+- rules  : evaluate_rules over in-memory AccountFeatures (no DB)
+- loops  : LinkGraph.add_edge + closes_loop (no DB)
+- layering : LinkGraph.add_edge with transfer history + layering.evaluate_graph_rules (no DB)
+- vector : vector_rules.evaluate_columnar over the whole stream (no DB)
+
+For each target the report has tx/s, p50 / p99 latency per operation
+(one transaction, or one batch for batch / queue) and peak RSS; DB-backed
+targets also report the number of commits. Every commit is an fsync with
+the default SQLITE_SYNCHRONOUS=FULL (durable per commit) and only at WAL
+checkpoints with the opt-in NORMAL, so compare concurrent / group under both. Results
+are written as JSON so runs can be compared:
+
+    python -m benchmarks.ingest_benchmark --transactions 100000 --out benchmarks/results/run.json
+    python -m benchmarks.ingest_benchmark --transactions 100000 --compare benchmarks/results/run.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.synthetic import SyntheticConfig, SyntheticTraffic
+
+TARGETS = ["rules", "loops", "layering", "vector", "single", "concurrent", "group", "batch", "queue", "sharded"]
+
+
+# ----------------------------
+# Measurement helpers
+# ----------------------------
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _summary(latencies_ms: list, count: int, seconds: float) -> dict:
+    latencies_ms = sorted(latencies_ms) or [0.0]
+    result = {
+        "transactions": count,
+        "seconds": round(seconds, 3),
+        "tx_per_sec": round(count / seconds, 1) if seconds else None,
+        "p50_ms": round(statistics.median(latencies_ms), 4),
+        "p99_ms": round(latencies_ms[max(int(len(latencies_ms) * 0.99) - 1, 0)], 4),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return result
+
+
+def _timed(items, fn):
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies, time.perf_counter() - started
+
+
+def _timed_concurrent(items, clients: int, make_fn):
+    """
+    Runs fn(item) for all items from `clients` threads. make_fn() is called
+    once per thread (e.g. to open its own session) and returns
+    (fn, close).
+    """
+    pending = iter(items)
+    pending_lock = threading.Lock()
+    latencies = []
+
+    def client():
+        fn, close = make_fn()
+        mine = []
+        try:
+            while True:
+                with pending_lock:
+                    item = next(pending, None)
+                if item is None:
+                    break
+                t0 = time.perf_counter()
+                fn(item)
+                mine.append((time.perf_counter() - t0) * 1000)
+        finally:
+            close()
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - started
+
+
+class _CommitCounter:
+    """Counts commits on the app engine while active."""
+
+    def __init__(self):
+        self.commits = 0
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        from app.db import engine
+
+        event.listen(engine, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        from app.db import engine
+
+        event.remove(engine, "commit", self._on_commit)
+        return False
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _reset_memory_state():
+    from app.services.account_resolver import account_resolver
+    from app.services.graph_service import link_graph
+    from app.services.feature_store import feature_store
+
+    link_graph.invalidate()
+    feature_store.invalidate()
+    account_resolver.clear()
+
+
+def _reset_db():
+    from app.db import Base, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    _reset_memory_state()
+
+
+# ----------------------------
+# Targets
+# ----------------------------
+def bench_rules(txns, args):
+    from app.services.feature_store import AccountFeatures
+    from app.services.rule_engine import evaluate_rules
+
+    features = {}
+
+    def run(t):
+        f = features.setdefault(t["from_account"], AccountFeatures())
+        f.observe(t["to_account"], t["amount"], t["timestamp"])
+        evaluate_rules(t["amount"], None, txn_pair=(t["from_account"], t["to_account"]), features=f)
+
+    latencies, seconds = _timed(txns, run)
+    return _summary(latencies, len(txns), seconds)
+
+
+def bench_loops(txns, args):
+    from app.services.graph_service import LinkGraph
+
+    graph = LinkGraph()
+    graph.load([])
+
+    def run(t):
+        graph.add_edge(t["from_account"], t["to_account"])
+        graph.closes_loop(t["from_account"], t["to_account"])
+
+    latencies, seconds = _timed(txns, run)
+    return _summary(latencies, len(txns), seconds)
+
+
+def bench_layering(txns, args):
+    from app.services.graph_service import LinkGraph
+    from app.services.layering import evaluate_graph_rules
+
+    graph = LinkGraph()
+    graph.load([])
+
+    def run(t):
+        a, b = t["from_account"], t["to_account"]
+        new_counterparties = graph.add_edge(a, b, t["timestamp"], t["amount"])
+        evaluate_graph_rules(graph, a, b, t["amount"], t["timestamp"], new_counterparties)
+
+    latencies, seconds = _timed(txns, run)
+    return _summary(latencies, len(txns), seconds)
+
+
+def bench_vector(txns, args):
+    import numpy as np
+    from app.services.vector_rules import evaluate_columnar
+
+    started = time.perf_counter()
+    evaluate_columnar(
+        np.array([t["from_account"] for t in txns], dtype=object),
+        np.array([t["to_account"] for t in txns], dtype=object),
+        np.array([t["amount"] for t in txns], dtype=np.float64),
+        np.array([t["timestamp"] for t in txns], dtype="datetime64[us]"),
+    )
+    seconds = time.perf_counter() - started
+    return _summary([seconds * 1000], len(txns), seconds)
+
+
+def bench_single(txns, args):
+    from app.api.transactions import ingest_transaction
+    from app.db import SessionLocal
+    from app.schemas import TransactionCreate
+
+    _reset_db()
+    payloads = [TransactionCreate(**{k: t[k] for k in ("from_account", "to_account", "amount")}) for t in txns]
+    db = SessionLocal()
+    try:
+        with _CommitCounter() as counter:
+            latencies, seconds = _timed(payloads, lambda p: ingest_transaction(p, db=db))
+    finally:
+        db.close()
+    return {**_summary(latencies, len(txns), seconds), "commits": counter.commits}
+
+
+def bench_concurrent(txns, args):
+    from app.api.transactions import ingest_transaction
+    from app.db import SessionLocal
+    from app.schemas import TransactionCreate
+
+    _reset_db()
+    payloads = [TransactionCreate(**{k: t[k] for k in ("from_account", "to_account", "amount")}) for t in txns]
+
+    def make_client():
+        db = SessionLocal()
+        return (lambda p: ingest_transaction(p, db=db)), db.close
+
+    with _CommitCounter() as counter:
+        latencies, seconds = _timed_concurrent(payloads, args.clients, make_client)
+    return {**_summary(latencies, len(txns), seconds), "commits": counter.commits}
+
+
+def bench_group(txns, args):
+    from app.schemas import TransactionCreate
+    from app.services.group_commit import GroupCommitter
+
+    _reset_db()
+    payloads = [TransactionCreate(**{k: t[k] for k in ("from_account", "to_account", "amount")}) for t in txns]
+    committer = GroupCommitter(window_ms=args.group_window_ms)
+    committer.start()
+
+    with _CommitCounter() as counter:
+        latencies, seconds = _timed_concurrent(payloads, args.clients, lambda: (committer.submit, lambda: None))
+    committer.stop()
+    return {**_summary(latencies, len(txns), seconds), "commits": counter.commits}
+
+
+def bench_batch(txns, args):
+    from app.db import SessionLocal
+    from app.schemas import TransactionCreate
+    from app.services.ingest_service import ingest_batch
+
+    _reset_db()
+    payloads = [TransactionCreate(**{k: t[k] for k in ("from_account", "to_account", "amount")}) for t in txns]
+    db = SessionLocal()
+    try:
+        with _CommitCounter() as counter:
+            latencies, seconds = _timed(list(_chunks(payloads, args.batch_size)), lambda b: ingest_batch(db, b))
+    finally:
+        db.close()
+    return {**_summary(latencies, len(txns), seconds), "commits": counter.commits}
+
+
+def bench_queue(txns, args):
+    from app.db import SessionLocal
+    from app.models import TransactionQueue
+    from app.schemas import TransactionCreate
+    from app.services.ingest_service import enqueue_transactions
+    from worker.transaction_worker import WorkerPool
+
+    _reset_db()
+    payloads = [TransactionCreate(**{k: t[k] for k in ("from_account", "to_account", "amount")}) for t in txns]
+    db = SessionLocal()
+    try:
+        for chunk in _chunks(payloads, 5000):
+            enqueue_transactions(db, chunk)
+
+        pool = WorkerPool(args.workers, args.batch_size)
+        started = time.perf_counter()
+        pool.start()
+        while db.query(TransactionQueue).filter(TransactionQueue.status.in_(["pending", "processing"])).count():
+            time.sleep(0.05)
+        seconds = time.perf_counter() - started
+        pool.stop()
+    finally:
+        db.close()
+
+    # Per-batch latency is not observable from outside the workers
+    batches = sum(s["batches"] for s in pool.stats()) or 1
+    return _summary([seconds * 1000 / batches], len(txns), seconds)
+
+
+def bench_sharded(txns, args):
+    from app.db import SessionLocal
+    from app.schemas import TransactionCreate
+    from app.services.sharded_ingest import ShardedIngest
+
+    _reset_db()
+    payloads = [TransactionCreate(**{k: t[k] for k in ("from_account", "to_account", "amount")}) for t in txns]
+    db = SessionLocal()
+    try:
+        with ShardedIngest(args.shards) as sharded:
+            # Warm up the shard processes (imports, graph load) outside the timing
+            sharded.score([])
+            latencies, seconds = _timed(list(_chunks(payloads, args.batch_size)), lambda b: sharded.ingest(db, b))
+    finally:
+        db.close()
+    return _summary(latencies, len(txns), seconds)
+
+
+BENCHMARKS = {
+    "rules": bench_rules,
+    "loops": bench_loops,
+    "layering": bench_layering,
+    "vector": bench_vector,
+    "single": bench_single,
+    "concurrent": bench_concurrent,
+    "group": bench_group,
+    "batch": bench_batch,
+    "queue": bench_queue,
+    "sharded": bench_sharded,
+}
+
+
+# ----------------------------
+# Reporting
+# ----------------------------
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\n{'target':<10}{'tx/s':>12}{'baseline':>12}{'change':>10}{'p99 ms':>12}{'baseline':>12}")
+    for name, result in current["targets"].items():
+        base = baseline.get("targets", {}).get(name)
+        if not base:
+            continue
+        change = (result["tx_per_sec"] / base["tx_per_sec"] - 1) * 100 if base["tx_per_sec"] else 0
+        print(
+            f"{name:<10}{result['tx_per_sec']:>12}{base['tx_per_sec']:>12}{change:>9.1f}%"
+            f"{result['p99_ms']:>12}{base['p99_ms']:>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AML ingest pipeline benchmark")
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--accounts", type=int, default=None, help="Default: transactions / 5")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma list of {TARGETS}")
+    parser.add_argument("--db-targets-limit", type=int, default=100_000,
+                        help="Cap on transactions sent through DB-backed targets")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=16, help="Threads for concurrent / group")
+    parser.add_argument("--group-window-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tracemalloc", action="store_true", help="Also trace Python allocations (slower)")
+    parser.add_argument("--db", default=None, help="SQLite file to use (default: temp file)")
+    parser.add_argument("--out", default=None, help="Write JSON results to this path")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against")
+    args = parser.parse_args()
+
+    # Must be set before app.db is imported
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="aml-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    config = SyntheticConfig(
+        transactions=args.transactions,
+        accounts=args.accounts or max(args.transactions // 5, 100),
+        seed=args.seed,
+    )
+    started = time.perf_counter()
+    txns = list(SyntheticTraffic(config))
+    print(f"Generated {len(txns)} transactions in {time.perf_counter() - started:.1f}s")
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "transactions": args.transactions,
+            "accounts": config.accounts,
+            "seed": args.seed,
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "shards": args.shards,
+            "clients": args.clients,
+            "group_window_ms": args.group_window_ms,
+            "sqlite_synchronous": os.getenv("SQLITE_SYNCHRONOUS", "FULL"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "targets": {},
+    }
+
+    for name in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        subset = txns if name in ("rules", "loops", "layering", "vector") else txns[:args.db_targets_limit]
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        result = BENCHMARKS[name](subset, args)
+        if args.tracemalloc:
+            result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+
+        report["targets"][name] = result
+        print(
+            f"{name:<8} {result['transactions']:>9} tx  {result['tx_per_sec']:>10} tx/s  "
+            f"p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms  rss {result['peak_rss_mb']} MB"
+            + (f"  commits {result['commits']}" if "commits" in result else "")
+        )
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
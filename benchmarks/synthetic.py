@@ -0,0 +1,148 @@
+"""
+synthetic.py
+
+Synthetic transaction traffic for benchmarks and replays.
+
+Background traffic follows a power law: a few accounts send / receive most
+transactions (Zipf-like weights over account rank). On top of it the
+generator plants the patterns the rule engine is meant to catch:
+- money loops     : A -> B -> C (-> D ...) -> A within a few minutes
+- smurfing bursts : many small transfers between the same pair
+- mule accounts   : a fresh account receives funds and forwards them at once
+
+Transactions are yielded in timestamp order as plain dicts, so the
+generator streams at any scale (10k - 10M+) in constant memory. Planted
+transactions carry a "pattern" label for ground-truth checks.
+"""
+
+import bisect
+import heapq
+import itertools
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass
+class SyntheticConfig:
+    transactions: int = 10_000
+    accounts: int = 2_000
+    zipf_alpha: float = 1.1           # activity skew across accounts
+    mean_gap_sec: float = 2.0         # mean time between background transactions
+    loop_rate: float = 0.002          # planted loops per background transaction
+    smurf_rate: float = 0.002         # planted smurfing bursts per background transaction
+    mule_rate: float = 0.001          # planted mule chains per background transaction
+    large_amount_rate: float = 0.01   # share of background amounts above the large threshold
+    seed: int = 42
+    start: datetime = datetime(2026, 1, 1)
+
+
+class SyntheticTraffic:
+    def __init__(self, config: SyntheticConfig = None):
+        self.config = config or SyntheticConfig()
+        self.rng = random.Random(self.config.seed)
+        self.account_ids = [f"acc-{i:07d}" for i in range(self.config.accounts)]
+
+        weights = [1 / (rank + 1) ** self.config.zipf_alpha for rank in range(self.config.accounts)]
+        self._cum_weights = list(itertools.accumulate(weights))
+
+    # ----------------------------
+    # Helpers
+    # ----------------------------
+    def _pick_account(self) -> str:
+        x = self.rng.random() * self._cum_weights[-1]
+        return self.account_ids[bisect.bisect_left(self._cum_weights, x)]
+
+    def _pick_pair(self):
+        a = self._pick_account()
+        b = self._pick_account()
+        while b == a:
+            b = self.rng.choice(self.account_ids)
+        return a, b
+
+    def _amount(self) -> float:
+        if self.rng.random() < self.config.large_amount_rate:
+            return round(self.rng.uniform(100_000, 1_000_000), 2)
+        # Log-normal retail amounts, median ~2k
+        return round(min(self.rng.lognormvariate(7.6, 1.2), 99_999), 2)
+
+    @staticmethod
+    def _txn(a, b, amount, ts, pattern=None) -> dict:
+        return {
+            "from_account": a,
+            "to_account": b,
+            "amount": amount,
+            "timestamp": ts,
+            "pattern": pattern,
+        }
+
+    # ----------------------------
+    # Planted patterns
+    # ----------------------------
+    def _loop(self, ts):
+        size = self.rng.randint(3, 5)
+        members = self.rng.sample(self.account_ids, size)
+        amount = round(self.rng.uniform(20_000, 90_000), 2)
+        for i in range(size):
+            ts += timedelta(seconds=self.rng.uniform(30, 300))
+            amount = round(amount * self.rng.uniform(0.95, 0.99), 2)
+            yield self._txn(members[i], members[(i + 1) % size], amount, ts, "loop")
+
+    def _smurfing(self, ts):
+        a, b = self._pick_pair()
+        for _ in range(self.rng.randint(6, 12)):
+            ts += timedelta(seconds=self.rng.uniform(5, 120))
+            yield self._txn(a, b, round(self.rng.uniform(1_000, 9_900), 2), ts, "smurfing")
+
+    def _mule(self, ts):
+        mule = f"mule-{uuid.UUID(int=self.rng.getrandbits(128)).hex[:12]}"
+        source, sink = self._pick_pair()
+        amount = round(self.rng.uniform(10_000, 80_000), 2)
+        ts += timedelta(seconds=self.rng.uniform(1, 60))
+        yield self._txn(source, mule, amount, ts, "mule")
+        ts += timedelta(seconds=self.rng.uniform(10, 600))
+        yield self._txn(mule, sink, round(amount * 0.98, 2), ts, "mule")
+
+    # ----------------------------
+    # Stream
+    # ----------------------------
+    def __iter__(self):
+        """
+        Yields exactly `transactions` dicts in timestamp order.
+        """
+        cfg = self.config
+        ts = cfg.start
+        pending = []   # heap of planted transactions not yet due
+        seq = itertools.count()
+        emitted = 0
+
+        while emitted < cfg.transactions:
+            ts += timedelta(seconds=self.rng.expovariate(1 / cfg.mean_gap_sec))
+
+            r = self.rng.random()
+            planted = ()
+            if r < cfg.loop_rate:
+                planted = self._loop(ts)
+            elif r < cfg.loop_rate + cfg.smurf_rate:
+                planted = self._smurfing(ts)
+            elif r < cfg.loop_rate + cfg.smurf_rate + cfg.mule_rate:
+                planted = self._mule(ts)
+            for txn in planted:
+                heapq.heappush(pending, (txn["timestamp"], next(seq), txn))
+
+            while pending and pending[0][0] <= ts and emitted < cfg.transactions:
+                yield heapq.heappop(pending)[2]
+                emitted += 1
+
+            if emitted < cfg.transactions:
+                a, b = self._pick_pair()
+                yield self._txn(a, b, self._amount(), ts)
+                emitted += 1
+
+
+def generate(transactions: int = 10_000, **kwargs):
+    """
+    Shortcut: generate(100_000, accounts=20_000, seed=1) -> iterator of dicts.
+    """
+    return iter(SyntheticTraffic(SyntheticConfig(transactions=transactions, **kwargs)))
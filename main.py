@@ -2,19 +2,63 @@
 FastAPI entry point for AML System
 """
 
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from app.api.transactions import router as transaction_router
 from app.api.alerts import router as alerts_router
 from app.api.accounts import router as accounts_router
 from app.api.ai import router as ai_router  # <-- Import AI router
+from app.api.admin import router as admin_router
+from app.db import engine
+from app.services.ingest_pipeline import ingest_pipeline
+from app.services.group_commit import group_committer
+from app.services import metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Drain accepted async submissions before exiting
+    ingest_pipeline.stop(timeout=30)
+    group_committer.stop(timeout=30)
+
+
+app = FastAPI(title="Real-Time AML & Fraud Detection System", lifespan=lifespan)
+
+# Per-request latency and DB statement counts for GET /metrics
+metrics.instrument_engine(engine)
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    if not metrics.METRICS_ENABLED:
+        return await call_next(request)
+
+    token = metrics.start_request()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        # Route template, not the raw path, keeps label cardinality bounded
+        route = request.scope.get("route")
+        queries = metrics.finish_request(
+            token,
+            request.method,
+            getattr(route, "path", "unmatched"),
+            time.perf_counter() - started,
+        )
+    response.headers["X-DB-Queries"] = str(queries)
+    return response
 
-app = FastAPI(title="Real-Time AML & Fraud Detection System")
 
 # Include all routers
 app.include_router(transaction_router)
 app.include_router(alerts_router)
 app.include_router(accounts_router)
 app.include_router(ai_router)  # <-- Add AI router
+app.include_router(admin_router)
 
 # Health check
 @app.get("/")
@@ -0,0 +1,14 @@
+# migrate.py
+from app.migrations import upgrade
+
+print("Upgrading database schema...")
+result = upgrade()
+for name in result["added_columns"]:
+    print(f"Added column: {name}")
+print(f"Merged duplicate link pairs: {result['merged_link_pairs']}")
+for name in result["created_indexes"]:
+    print(f"Created index: {name}")
+print(f"Backfilled account stats rows: {result['backfilled_account_stats']}")
+print(f"Backfilled alert accounts: {result['backfilled_alert_accounts']}")
+print(f"Backfilled alert summary rows: {result['backfilled_alert_summary']}")
+print("Database is up to date.")
@@ -0,0 +1,183 @@
+# test_graph.py
+import random
+from datetime import datetime, timedelta
+
+from app.services.feature_store import AccountFeatures, FeatureStore
+from app.services.graph_service import CompactAdjacency, LinkGraph
+
+random.seed(7)
+
+accounts = [f"acc-{i}" for i in range(60)]
+start = datetime(2024, 1, 1)
+
+
+def random_transfers(count, offset=0):
+    return [
+        (
+            random.choice(accounts),
+            random.choice(accounts),
+            start + timedelta(seconds=offset + i),
+            random.choice([500, 9000, 15000, 40000]),
+        )
+        for i in range(count)
+    ]
+
+
+def adjacency_state(adjacency: CompactAdjacency) -> dict:
+    return {
+        (a, b): adjacency.strength(a, b)
+        for a in accounts
+        for b in adjacency.neighbors(a)
+    }
+
+
+def graph_state(graph: LinkGraph) -> tuple:
+    transfers = {
+        (a, b): list(history)
+        for a in accounts
+        for b, history in graph.recent_transfers(a).items()
+    }
+    windows = {a: (graph.fan_out(a), graph.fan_in(a)) for a in accounts}
+    loops = {(a, b): graph.closes_loop(a, b) for a in accounts[:15] for b in accounts[:15]}
+    return adjacency_state(graph._adjacency), transfers, windows, loops
+
+
+# ---------------------------------------
+# Step 1: Incremental edges vs one rebuild
+# ---------------------------------------
+# A tiny delta buffer forces many compactions on the way, half of them
+# built from a snapshot while more edges (and removals) come in
+links = [(a, b) for a, b, _, _ in random_transfers(3000)]
+
+incremental = CompactAdjacency(min_delta=16, delta_ratio=0.05)
+snapshot = None
+for a, b in links:
+    incremental.add_edge(a, b)
+    if snapshot is not None:
+        incremental.add_edge(b, a)
+        incremental.remove_edge(b, a)
+        staged = incremental.build_compaction(snapshot)
+        staged.replay(incremental.take_changes())
+        incremental.add_edge(a, b)
+        incremental.remove_edge(a, b)
+        incremental.finish_compaction(staged)
+        snapshot = None
+    elif incremental.needs_compaction:
+        if incremental.compactions % 2:
+            snapshot = incremental.begin_compaction()
+        else:
+            incremental.compact()
+incremental.compact()
+rebuilt = CompactAdjacency.from_links(links)
+
+assert incremental.compactions > 10
+assert adjacency_state(incremental) == adjacency_state(rebuilt)
+assert incremental.edge_count == rebuilt.edge_count
+for a in accounts:
+    assert sorted(incremental.neighbors(a)) == sorted(rebuilt.neighbors(a))
+
+print("incremental == rebuild:", rebuilt.edge_count, "edges,", incremental.compactions, "compactions")
+
+# ---------------------------------------
+# Step 2: Rolling back one unit keeps the others
+# ---------------------------------------
+# Committed history, then a unit that is rolled back interleaved with
+# one that commits; the result must equal a graph that never saw the
+# rolled-back unit.
+committed = random_transfers(400)
+rolled_back = random_transfers(150, offset=1000)
+concurrent = random_transfers(150, offset=1000)
+
+graph = LinkGraph(edge_history=3)
+graph._adjacency = CompactAdjacency(min_delta=8, delta_ratio=0.05)
+expected = LinkGraph(edge_history=3)
+
+for a, b, ts, amount in committed:
+    graph.add_edge(a, b, ts, amount)
+    expected.add_edge(a, b, ts, amount)
+
+journal = []
+for mine, other in zip(rolled_back, concurrent):
+    graph.add_edge(*mine, journal=journal)
+    graph.add_edge(*other)
+    expected.add_edge(*other)
+
+assert len(journal) == 2 * len(rolled_back)
+graph.revert(journal)
+assert journal == []
+if graph._compactor is not None:
+    graph._compactor.join()
+
+graph_adjacency, graph_transfers, graph_windows, graph_loops = graph_state(graph)
+expected_adjacency, expected_transfers, expected_windows, expected_loops = graph_state(expected)
+assert graph_adjacency == expected_adjacency
+assert graph_windows == expected_windows
+assert graph_loops == expected_loops
+assert graph_transfers == expected_transfers
+
+print("rollback kept", len(graph_adjacency), "edges of the other units")
+
+# ---------------------------------------
+# Step 3: Rolling back an edge that was compacted meanwhile
+# ---------------------------------------
+adjacency = CompactAdjacency(min_delta=1, delta_ratio=0)
+adjacency.add_edge("x", "y")
+adjacency.add_edge("y", "z")
+assert adjacency.needs_compaction
+adjacency.compact()
+assert adjacency.strength("x", "y") == 1 and not adjacency._delta
+
+# Removed without compacting: the dead edge is skipped until the next one
+adjacency.remove_edge("x", "y")
+assert not adjacency.has_edge("x", "y")
+assert adjacency.neighbors("x") == []
+assert adjacency.neighbors("y") == ["z"]
+assert adjacency.edge_count == 1
+assert adjacency.compactions == 1 and adjacency.needs_compaction
+adjacency.compact()
+assert adjacency.edge_count == 1 and len(adjacency._targets) == 1
+
+graph = LinkGraph()
+graph.add_edge("x", "y", start, 20000)
+journal = []
+graph.add_edge("y", "x", start + timedelta(seconds=1), 20000, journal)
+assert graph.closes_loop("x", "y")
+graph.revert(journal)
+assert not graph.closes_loop("x", "y")
+assert graph.fan_in("x") == 0 and graph.recent_transfers("y") == {}
+
+print("compacted edge removed, loop gone")
+
+# A loop longer than the depth cap, or beyond the step budget, is not searched
+graph = LinkGraph()
+chain = [f"c{i}" for i in range(8)]
+for a, b in zip(chain, chain[1:]):
+    graph.add_edge(a, b, start, 20000)
+assert not graph.closes_loop("c7", "c0")
+assert graph.closes_loop("c7", "c0", max_depth=7)
+assert not graph.closes_loop("c7", "c0", max_depth=7, max_steps=3)
+
+print("loop search bounded")
+
+# ---------------------------------------
+# Step 4: Sender features
+# ---------------------------------------
+store = FeatureStore()
+features = AccountFeatures(window=3)
+reference = AccountFeatures(window=3)
+for i, amount in enumerate([100, 200, 300]):
+    store.observe(features, "bob", amount, start + timedelta(seconds=i))
+    reference.observe("bob", amount, start + timedelta(seconds=i))
+
+journal = []
+store.observe(features, "bob", 400, start + timedelta(seconds=10), journal)
+store.observe(features, "carol", 500, start + timedelta(seconds=11), journal)
+store.revert(journal)
+
+assert list(features.recent_times) == list(reference.recent_times)
+assert features.tx_count == reference.tx_count
+assert features.first_seen == reference.first_seen
+assert features.small_counts == reference.small_counts
+assert features.small_sums == reference.small_sums
+
+print("features restored:", features.tx_count, "transactions,", features.small_counts)
@@ -1,38 +1,424 @@
 # worker/transaction_worker.py
+"""
+Queue consumer for txn_queue.
+
+Runs N worker threads, each with its own DB session. A worker claims a
+batch of pending rows in one statement, runs the ingest pipeline stages
+for the referenced transactions (ingest_service.score_transactions, then
+persist_scored) and marks the rows done with a single commit.
+
+Worker threads score in parallel, like concurrent ingest_batch calls:
+rules only read the DB, and each batch logs its link graph / feature
+updates in a MemoryJournal so a rollback takes back only its own.
+write_lock is held from the first write to the commit. A row that keeps
+failing is marked "failed" after MAX_RETRIES, and so is its transaction.
+A batch that fails even row by row is logged and its claimed rows are
+put back to pending.
+
+With --shards N a single claiming thread hands each batch to N scoring
+processes partitioned by sender (app/services/sharded_ingest.py) instead
+of scoring in-process; --workers is then ignored.
+
+Claiming:
+- PostgreSQL: UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)
+- SQLite: same UPDATE without row locks; SQLite serializes writers, so
+  the "status = pending" guard makes each row claimable exactly once
+
+Usage:
+    python -m worker.transaction_worker --workers 4 --batch-size 100
+    python -m worker.transaction_worker --shards 4 --batch-size 1000
+"""
+
+import argparse
+import logging
+import signal
+import threading
 import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func
 from sqlalchemy.orm import Session
-from app.db import SessionLocal
+
+from app.db import SessionLocal, write_lock
+from app.models import Transaction
+from app.models.transaction import STATUS_FAILED
 from app.models.txn_queue import TransactionQueue
-from app.api.transactions import ingest_transaction  # Ensure processing logic is in a reusable service
-
-def process_transaction_queue():
-    db: Session = SessionLocal()
-    while True:
-        # Fetch one pending transaction safely
-        pending = (
-            db.query(TransactionQueue)
-            .filter(TransactionQueue.status == "pending")
-            .order_by(TransactionQueue.created_at.asc())
-            .with_for_update(skip_locked=True)
-            .first()
+from app.services.ingest_service import (
+    MemoryJournal,
+    discard_memory_state,
+    invalidate_account_views,
+    persist_scored,
+    score_transactions,
+    transaction_record,
+)
+from app.services.network_risk import network_scores
+from app.services.sharded_ingest import ShardedIngest
+
+logger = logging.getLogger("transaction_worker")
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BATCH_SIZE = 100          # queue rows claimed per round trip
+MAX_RETRIES = 3           # attempts before a row is marked failed
+MIN_POLL_SEC = 0.01       # poll interval right after finding work
+MAX_POLL_SEC = 1.0        # poll interval cap while the queue stays empty
+STALE_CLAIM_SEC = 300     # "processing" rows older than this are re-queued
+REPORT_INTERVAL_SEC = 30  # throughput log interval
+
+
+# -----------------------------
+# Claiming
+# -----------------------------
+def claim_batch(db: Session, batch_size: int = BATCH_SIZE) -> list:
+    """
+    Atomically moves up to batch_size pending rows to "processing"
+    and returns their ids (oldest first).
+    """
+    candidates = (
+        select(TransactionQueue.id)
+        .where(TransactionQueue.status == "pending")
+        .order_by(TransactionQueue.created_at.asc())
+        .limit(batch_size)
+    )
+
+    if db.bind.dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    with write_lock(db):
+        claimed = db.execute(
+            update(TransactionQueue)
+            .where(
+                TransactionQueue.id.in_(candidates),
+                TransactionQueue.status == "pending",
+            )
+            .values(status="processing", updated_at=func.now())
+            .returning(TransactionQueue.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.commit()
+    return claimed
+
+
+def requeue_stale_claims(db: Session, older_than_sec: int = STALE_CLAIM_SEC) -> int:
+    """
+    Returns rows left in "processing" by a crashed worker to the queue.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than_sec)
+    with write_lock(db):
+        result = db.execute(
+            update(TransactionQueue)
+            .where(
+                TransactionQueue.status == "processing",
+                TransactionQueue.updated_at < cutoff,
+            )
+            .values(status="pending")
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    return result.rowcount
+
+
+def release_claims(db: Session, queue_ids) -> int:
+    """
+    Puts rows this worker claimed but could not finish back to pending.
+    """
+    with write_lock(db):
+        result = db.execute(
+            update(TransactionQueue)
+            .where(
+                TransactionQueue.id.in_(queue_ids),
+                TransactionQueue.status == "processing",
+            )
+            .values(status="pending")
+            .execution_options(synchronize_session=False)
         )
+        db.commit()
+    return result.rowcount
+
+
+# -----------------------------
+# Processing
+# -----------------------------
+def _process_rows(db: Session, rows, sharded: ShardedIngest = None) -> tuple[int, int]:
+    """
+    Runs the pipeline for claimed queue rows in one unit of work, on the
+    shard processes when `sharded` is given. Returns (processed, failed).
+    """
+    txn_ids = [str(r.txn_id) for r in rows]
+    transactions = {
+        t.id: t
+        for t in db.query(Transaction).filter(Transaction.id.in_(txn_ids))
+    }
+
+    runnable = []
+    failed = 0
+    for row in rows:
+        if str(row.txn_id) in transactions:
+            runnable.append(row)
+        else:
+            row.status = "failed"
+            failed += 1
 
-        if pending:
+    ordered = sorted(
+        (transactions[str(r.txn_id)] for r in runnable),
+        key=lambda t: t.timestamp,
+    )
+
+    journal = MemoryJournal()
+    try:
+        # Rules over in-memory state only read, so other worker threads
+        # and API writers are not held up while they run. The sharded
+        # path has a single claiming thread and scores under the lock.
+        scored = None
+        if sharded is None and ordered:
+            scored = score_transactions(
+                db, [transaction_record(t) for t in ordered], journal=journal, network=network_scores
+            )
+
+        with write_lock(db):
             try:
-                pending.status = "processing"
+                if sharded is not None:
+                    sharded.process(db, ordered, path="worker", journal=journal)
+                elif ordered:
+                    persist_scored(db, ordered, scored, path="worker")
+                for row in runnable:
+                    row.status = "done"
                 db.commit()
+            except Exception:
+                # Roll back before another writer gets the lock
+                db.rollback()
+                raise
+    except Exception:
+        db.rollback()
+        discard_memory_state(journal)
+        if sharded is not None:
+            sharded.discard()
+        raise
 
-                # Process transaction using existing logic
-                ingest_transaction(pending.txn_id, db=db)
+    invalidate_account_views(ordered)
+    return len(runnable), failed
+
+
+def _record_failure(db: Session, queue_id) -> bool:
+    """
+    Counts one failed attempt of a queue row. After MAX_RETRIES the row
+    and its transaction are marked failed; before that the row goes back
+    to pending. Returns True if the failure is final.
+    """
+    with write_lock(db):
+        try:
+            row = db.get(TransactionQueue, queue_id)
+            row.retries = (row.retries or 0) + 1
+            final = row.retries > MAX_RETRIES
+            if final:
+                row.status = "failed"
+                # Leaves "queued" so the month can still be archived
+                db.execute(
+                    update(Transaction)
+                    .where(Transaction.id == str(row.txn_id))
+                    .values(status=STATUS_FAILED)
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                row.status = "pending"
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return final
+
+
+def process_claimed(db: Session, queue_ids, sharded: ShardedIngest = None) -> tuple[int, int]:
+    """
+    Processes a claimed batch. If the batch fails as a whole, rows are
+    retried one by one so a single bad row cannot block the others.
+    Returns (processed, failed); rows put back for a retry count as neither.
+    """
+    rows = db.query(TransactionQueue).filter(TransactionQueue.id.in_(queue_ids)).all()
+
+    try:
+        return _process_rows(db, rows, sharded)
+    except Exception:
+        logger.exception("Batch of %d failed, retrying rows individually", len(rows))
+
+    processed = failed = 0
+    for queue_id in queue_ids:
+        row = db.get(TransactionQueue, queue_id)
+        try:
+            done, bad = _process_rows(db, [row], sharded)
+            processed += done
+            failed += bad
+        except Exception:
+            if _record_failure(db, queue_id):
+                failed += 1
+
+    return processed, failed
+
+
+# -----------------------------
+# Worker runtime
+# -----------------------------
+class WorkerStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.batches = 0
+        self.started = time.monotonic()
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "worker": self.name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "tx_per_sec": round(self.throughput, 2),
+        }
+
+
+class QueueWorker(threading.Thread):
+    """
+    One consumer thread with its own session and adaptive poll interval.
+    """
+
+    def __init__(self, name: str, stop_event: threading.Event, batch_size: int = BATCH_SIZE,
+                 min_poll: float = MIN_POLL_SEC, max_poll: float = MAX_POLL_SEC,
+                 sharded: ShardedIngest = None):
+        super().__init__(name=name, daemon=True)
+        self.stop_event = stop_event
+        self.sharded = sharded
+        self.batch_size = batch_size
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.stats = WorkerStats(name)
+
+    def run(self):
+        db = SessionLocal()
+        poll = self.min_poll
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    claimed = claim_batch(db, self.batch_size)
+                except Exception:
+                    db.rollback()
+                    logger.exception("%s: claim failed", self.name)
+                    claimed = []
+
+                if not claimed:
+                    # Back off while idle, wake up early on shutdown
+                    self.stop_event.wait(poll)
+                    poll = min(poll * 2, self.max_poll)
+                    continue
+
+                poll = self.min_poll
+                try:
+                    processed, failed = process_claimed(db, claimed, self.sharded)
+                except Exception:
+                    # Keep the thread alive; the rows go back to the queue
+                    # (or to requeue_stale_claims if the DB is unreachable)
+                    logger.exception("%s: batch of %d failed", self.name, len(claimed))
+                    db.rollback()
+                    try:
+                        release_claims(db, claimed)
+                    except Exception:
+                        db.rollback()
+                        logger.exception("%s: could not release claimed rows", self.name)
+                    continue
+                self.stats.processed += processed
+                self.stats.failed += failed
+                self.stats.batches += 1
+        finally:
+            db.close()
+
+
+class WorkerPool:
+    """
+    Runs N QueueWorker threads until stop() (or SIGINT/SIGTERM).
+
+    With shards > 0, one QueueWorker feeds a ShardedIngest of that many
+    processes: shard graph replicas must see every batch in claim order,
+    which a second claiming thread would break.
+    """
+
+    def __init__(self, workers: int = 1, batch_size: int = BATCH_SIZE,
+                 min_poll: float = MIN_POLL_SEC, max_poll: float = MAX_POLL_SEC,
+                 shards: int = 0):
+        self.stop_event = threading.Event()
+        self.sharded = ShardedIngest(shards) if shards else None
+        if self.sharded is not None:
+            workers = 1
+        self.workers = [
+            QueueWorker(f"worker-{i + 1}", self.stop_event, batch_size, min_poll, max_poll, self.sharded)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        db = SessionLocal()
+        try:
+            requeued = requeue_stale_claims(db)
+            if requeued:
+                logger.info("Re-queued %d stale claims", requeued)
+        finally:
+            db.close()
+
+        if self.sharded is not None:
+            self.sharded.start()
+        for w in self.workers:
+            w.start()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Signals workers to stop after their current batch and waits for them.
+        """
+        self.stop_event.set()
+        for w in self.workers:
+            w.join(timeout)
+        if self.sharded is not None:
+            self.sharded.stop()
+
+    def stats(self) -> list[dict]:
+        return [w.stats.as_dict() for w in self.workers]
+
+    def run_forever(self, report_interval: float = REPORT_INTERVAL_SEC):
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.stop_event.set())
+
+        self.start()
+        while not self.stop_event.wait(report_interval):
+            for s in self.stats():
+                logger.info("%(worker)s: %(processed)d done, %(failed)d failed, %(tx_per_sec).2f tx/s", s)
+
+        self.stop()
+        for s in self.stats():
+            logger.info("%(worker)s stopped: %(processed)d done, %(failed)d failed, %(tx_per_sec).2f tx/s", s)
+
+
+def process_transaction_queue(workers: int = 1, batch_size: int = BATCH_SIZE, shards: int = 0):
+    WorkerPool(workers, batch_size, shards=shards).run_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consume txn_queue")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--min-poll", type=float, default=MIN_POLL_SEC)
+    parser.add_argument("--max-poll", type=float, default=MAX_POLL_SEC)
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL_SEC)
+    parser.add_argument("--shards", type=int, default=0,
+                        help="score batches on N processes partitioned by sender (0: in-process)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    WorkerPool(
+        args.workers, args.batch_size, args.min_poll, args.max_poll, shards=args.shards
+    ).run_forever(args.report_interval)
 
-                pending.status = "done"
-            except Exception as e:
-                pending.retries += 1
-                pending.status = "failed" if pending.retries > 3 else "pending"
-            finally:
-                db.commit()
-        else:
-            time.sleep(1)  # No pending txn, wait
 
 if __name__ == "__main__":
-    process_transaction_queue()
\ No newline at end of file
+    main()